@@ -20,12 +20,13 @@ Request Parameters (JSON):
 
 3. Text-to-Speech (TTS)
 Endpoint: POST /tts
-Function: Generate speech and return it as an audio/wav stream.
+Function: Generate speech and return it as an audio stream (32 kHz, mono, 16-bit).
 Request Parameters (JSON):
     - character_name (string): Character name to use.
     - text (string): Text to convert to speech.
     - split_sentence (boolean, optional): Whether to auto-split sentences, default is false.
     - save_path (string, optional): Full path to save audio on the server.
+    - format (string, optional): "wav" (default), "pcm", "opus" or "mp3".
 
 4. Unload Character Model
 Endpoint: POST /unload_character
@@ -113,7 +114,8 @@ def main_client():
     tts_payload = {
         "character_name": "misono_mika",  # Use the same character name
         "text": "どうしようかな……やっぱりやりたいかも……！",  # Replace with the text you want to synthesize
-        "split_sentence": True
+        "split_sentence": True,
+        "format": "pcm"  # Raw PCM is written straight to PyAudio below
     }
 
     p = pyaudio.PyAudio()
@@ -2,13 +2,29 @@ from os import PathLike
 from typing import AsyncIterator
 
 
-def load_character(character_name: str, onnx_model_dir: str | PathLike) -> None:
+def load_character(character_name: str, onnx_model_dir: str | PathLike, precision: str | None = None,
+                   pinned: bool = False) -> None:
     """
     Loads a character model from an ONNX model directory.
 
     Args:
         character_name (str): The name to assign to the loaded character.
         onnx_model_dir (str | PathLike): The directory path containing the ONNX model files.
+        precision (str | None): 'fp32' or 'int8'. Defaults to the 'Model_Precision' environment variable (fp32).
+            Falls back to FP32 if the directory has no INT8 models.
+        pinned (bool): Keep the character in memory even when the 'Max_Character_Models_MB' budget
+            or the 'Max_Cached_Character_Models' limit is exceeded.
+    """
+    pass
+
+
+def pin_character(character_name: str, pinned: bool = True) -> None:
+    """
+    Pins a loaded character so that it is never evicted from memory, or unpins it.
+
+    Args:
+        character_name (str): The name of a previously loaded character.
+        pinned (bool): True to pin, False to make the character evictable again.
     """
     pass
 
@@ -84,7 +100,7 @@ def stop() -> None:
 
 
 def convert_to_onnx(torch_ckpt_path: str | PathLike, torch_pth_path: str | PathLike,
-                    output_dir: str | PathLike) -> None:
+                    output_dir: str | PathLike, quantize: bool = False) -> None:
     """
     Converts PyTorch model checkpoints to the ONNX format.
 
@@ -92,6 +108,8 @@ def convert_to_onnx(torch_ckpt_path: str | PathLike, torch_pth_path: str | PathL
         torch_ckpt_path (str | PathLike): The path to the T2S model (.ckpt) file.
         torch_pth_path (str | PathLike): The path to the VITS model (.pth) file.
         output_dir (str | PathLike): The directory where the ONNX models will be saved.
+        quantize (bool): Also generate dynamic INT8 variants of the T2S decoders and VITS,
+            loadable with load_character(..., precision='int8').
     """
     pass
 
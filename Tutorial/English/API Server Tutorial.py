@@ -9,6 +9,7 @@ Function: Load a character model into the server.
 Request Parameters (JSON):
     - character_name (string): Unique name of the character.
     - onnx_model_dir (string): Path to the model folder on the server.
+    - pinned (boolean, optional): Never evict this character from memory, default is false.
 
 2. Set Reference Audio
 Endpoint: POST /set_reference_audio
@@ -20,12 +21,19 @@ Request Parameters (JSON):
 
 3. Text-to-Speech (TTS)
 Endpoint: POST /tts
-Function: Generate speech and return it as an audio/wav stream.
+Function: Generate speech and return it as an audio stream (32 kHz, mono, 16-bit).
 Request Parameters (JSON):
     - character_name (string): Character name to use.
     - text (string): Text to convert to speech.
     - split_sentence (boolean, optional): Whether to auto-split sentences, default is false.
     - save_path (string, optional): Full path to save audio on the server.
+    - request_id (string, optional): Client-chosen request ID. If omitted, the server generates one.
+    - format (string, optional): Output format, one of "wav" (default, streaming WAV header), "pcm" (raw PCM),
+      "opus" (Ogg/Opus) or "mp3". "opus" and "mp3" require PyAV (`pip install av`) on the server.
+Response Headers:
+    - X-Request-ID: ID of this request, usable with /cancel/{request_id}.
+    - X-Sample-Rate / X-Channels: Sample rate and channel count of the audio.
+Note: Closing the connection mid-stream cancels the synthesis of that request.
 
 4. Unload Character Model
 Endpoint: POST /unload_character
@@ -42,6 +50,53 @@ Request Parameters: None.
 Endpoint: POST /clear_reference_audio_cache
 Function: Clear the loaded reference audio cache on the server.
 Request Parameters: None.
+
+7. Cancel a Single TTS Request
+Endpoint: POST /cancel/{request_id}
+Function: Cancel one ongoing or queued /tts request without affecting other requests.
+Request Parameters: None (the request ID is part of the URL).
+
+8. Bidirectional Streaming over WebSocket
+Endpoint: WebSocket /ws/tts
+Function: Stream text in (e.g. tokens from an LLM) and receive audio chunks back on the same connection.
+Client Messages (JSON text frames):
+    - {"type": "start", "character_name": ..., "language": ..., "format": ..., "request_id": ...}
+      Starts an utterance. "language", "format" (default "pcm") and "request_id" are optional.
+    - {"type": "text", "text": ...}: Incremental text. Synthesis starts as soon as a sentence is complete.
+    - {"type": "flush"}: Synthesize the buffered text now, even if the sentence is not finished.
+    - {"type": "end"}: Finish the current utterance.
+    - {"type": "cancel"}: Cancel the current utterance and drop audio that has not been sent yet.
+Server Messages:
+    - Binary frames: Audio data in the requested format.
+    - JSON text frames with "type" set to "started", "done", "cancelled" or "error".
+After "done" or "cancelled", a new utterance can be started on the same connection.
+
+9. Register Many Reference Audios
+Endpoint: POST /register_reference_audios
+Function: Pre-process a whole set of reference audios (e.g. all emotion prompts of a character) in one call.
+          Audio is decoded in parallel and HuBERT runs in batches; later /set_reference_audio calls for these
+          clips are served from the cache. Raise 'Max_Cached_Reference_Audio' if you register more clips than it allows.
+Request Parameters (JSON):
+    - clips (list): Items of the form {"audio_path": ..., "audio_text": ..., "audio_language": ...}
+      ("audio_language" is optional).
+    - decode_workers (integer, optional): Number of decoding threads, default is min(8, CPU cores).
+Response: {"status": "success", "registered": <count>, "failed": <count>}
+
+10. Pin a Character
+Endpoint: POST /pin_character
+Function: Keep a loaded character in memory, or make it evictable again. Characters are otherwise evicted
+          least-recently-used first once 'Max_Character_Models_MB' or 'Max_Cached_Character_Models' is exceeded,
+          and reloaded from disk on their next request.
+Request Parameters (JSON):
+    - character_name (string): Name of a loaded character.
+    - pinned (boolean, optional): Default is true; false unpins.
+
+11. Model Residency
+Endpoint: GET /models
+Function: Report the estimated memory use of the loaded characters.
+Response: {"budget_mb", "resident_mb", "max_characters", "hits", "misses", "evictions", "characters": [...]}.
+          Each character lists "resident", "pinned", "precision", "size_mb", "load_seconds", "loads" and "hits".
+          A "loads" count that keeps growing means the character is being evicted and reloaded.
 """
 
 import os
@@ -113,7 +168,8 @@ def main_client():
     tts_payload = {
         "character_name": "<CHARACTER_NAME>",  # Use the same character name
         "text": "<TEXT_TO_SYNTHESIZE>",  # Replace with the text you want to synthesize
-        "split_sentence": True
+        "split_sentence": True,
+        "format": "pcm"  # Raw PCM is written straight to PyAudio below
     }
 
     p = pyaudio.PyAudio()
@@ -4,5 +4,6 @@ import lunavox_tts as lunavox
 lunavox.convert_to_onnx(
     torch_pth_path=r"<PATH_TO_TORCH_PTH_FILE>",  # Replace with the path to your .pth model file
     torch_ckpt_path=r"<PATH_TO_TORCH_CKPT_FILE>",  # Replace with the path to your .ckpt checkpoint file
-    output_dir=r"<OUTPUT_DIRECTORY>"  # Replace with the directory where the ONNX model should be saved
+    output_dir=r"<OUTPUT_DIRECTORY>",  # Replace with the directory where the ONNX model should be saved
+    quantize=False,  # Set to True to also generate INT8 models (load them with precision="int8")
 )
@@ -12,7 +12,42 @@ os.environ['OPEN_JTALK_DICT_DIR'] = r"C:\path\to\open_jtalk_dic_utf_8-1.11"
 
 # (Optional) You can set the number of cached character models and reference audios.
 os.environ['Max_Cached_Character_Models'] = '3'
-os.environ['Max_Cached_Reference_Audio'] = '10'
+# Character models can instead be capped by their estimated memory use (0 = no limit). If this is set and
+# 'Max_Cached_Character_Models' is not, the number of characters is limited only by this budget.
+os.environ['Max_Character_Models_MB'] = '0'
+# Each character is counted as the size of its model files times this factor, covering ONNX Runtime's own copies
+# of the weights and internal buffers. A lower value (e.g. 1.0) suits servers that share weights between workers.
+os.environ['Model_Memory_Overhead_Factor'] = '1.25'
+os.environ['Max_Cached_Reference_Audio'] = '10'  # Audio features (HuBERT), keyed by file content
+os.environ['Max_Cached_Reference_Text'] = '32'  # Transcript features (phonemes, BERT), keyed by text and language
+# Reference caches can additionally be capped by memory (0 = no limit). Long clips and transcripts take more space.
+os.environ['Max_Cached_Reference_Audio_MB'] = '0'
+os.environ['Max_Cached_Reference_Text_MB'] = '0'
+
+# (Optional) Maximum number of audio chunks buffered ahead of a slow consumer (playback or streaming client).
+# Synthesis pauses once this many chunks are waiting, so memory stays flat for long texts.
+os.environ['Max_Queued_Audio_Chunks'] = '8'
+
+# (Optional) Cache synthesized sentences, keyed by character model, reference audio, text and language.
+# Repeated prompts are then returned without running the model. Both tiers are disabled by default.
+os.environ['Result_Cache_Memory_MB'] = '256'  # In-memory LRU budget
+os.environ['Result_Cache_Dir'] = r"C:\path\to\tts_cache"  # On-disk tier (FLAC), shared across processes and restarts
+os.environ['Result_Cache_Disk_MB'] = '1024'  # On-disk budget; least recently used files are deleted first (0 = no limit)
+
+# (Optional) Number of cached semantic token sequences (the output of the autoregressive T2S stage).
+# Calls with `reuse_semantic_tokens=True` or `timbre_character` (see lunavox.tts) store their tokens, and later such
+# calls for the same text only re-run the vocoder and keep the same prosody. Other calls always sample a new take
+# and never touch this cache. Set to '0' to disable.
+os.environ['Max_Cached_Semantic_Tokens'] = '256'
+
+# (Optional) How the autoregressive T2S stage is decoded. 'python' (default) runs the stage decoder once per token;
+# 'loop' runs the whole decode inside a single ONNX Loop graph, avoiding per-token Python overhead.
+os.environ['T2S_Decode_Mode'] = 'python'
+
+# (Optional) Run the text frontend (G2P) in this many worker processes. G2P is mostly pure Python and holds the GIL,
+# so concurrent requests only use all cores when it runs out of process. Workers are started with 'spawn':
+# keep the entry point of your script under `if __name__ == "__main__":`. '0' (default) runs G2P in-process.
+os.environ['Frontend_Workers'] = '0'
 
 # Make sure to set environment variables before importing LunaVox.
 import lunavox_tts as lunavox
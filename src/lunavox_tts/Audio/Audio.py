@@ -1,9 +1,11 @@
 import os
+import threading
+import wave
 import soundfile as sf
 import soxr
 import numpy as np
 import logging
-from typing import Optional
+from typing import Optional, Union
 
 logger = logging.getLogger(__name__)
 
@@ -16,36 +18,138 @@ SILENCE_TO_APPEND_S = 0.3
 TARGET_SAMPLING_RATE = 16000
 
 
+# 每个线程缓存自己的 soxr 重采样计划，按 (输入采样率, 输出采样率) 复用，避免每次重新设计滤波器。
+_resample_plans = threading.local()
+
+
+def _resample(wav: np.ndarray, in_rate: int, out_rate: int) -> np.ndarray:
+    if in_rate == out_rate:
+        return wav
+    plans: dict[tuple[int, int], soxr.ResampleStream] = getattr(_resample_plans, 'plans', None)
+    if plans is None:
+        plans = _resample_plans.plans = {}
+    stream = plans.get((in_rate, out_rate))
+    if stream is None:
+        stream = plans[(in_rate, out_rate)] = soxr.ResampleStream(in_rate, out_rate, 1, dtype='float32', quality='HQ')
+    stream.clear()
+    return stream.resample_chunk(np.ascontiguousarray(wav), last=True)
+
+
+def _decode_mono(audio_path: str) -> tuple[np.ndarray, int]:
+    wav, original_sr = sf.read(audio_path, dtype='float32')
+    if wav.ndim > 1:
+        # 多声道转单声道：一次矩阵乘法直接得到均值，不像 np.mean 那样按轴逐元素归约。
+        channels = wav.shape[1]
+        wav = wav @ np.full(channels, 1.0 / channels, dtype=np.float32)
+    return wav, original_sr
+
+
+def _check_duration(audio_path: str, num_samples: int, sampling_rate: int) -> None:
+    # 检查音频长度是否在建议范围之外
+    duration = num_samples / sampling_rate
+    if not (MIN_DURATION_S <= duration <= MAX_DURATION_S):
+        logger.warning(
+            f"The reference audio '{os.path.basename(audio_path)}' has a duration of {duration:.2f} seconds, "
+            f"which is outside the recommended range of {MIN_DURATION_S} to {MAX_DURATION_S} seconds!"
+        )
+
+
+def _append_silence(wav: np.ndarray, sampling_rate: int) -> np.ndarray:
+    # 创建并拼接静音
+    silence_samples = int(SILENCE_TO_APPEND_S * sampling_rate)
+    wav_processed = np.zeros(wav.shape[0] + silence_samples, dtype=np.float32)
+    wav_processed[:wav.shape[0]] = wav
+    return wav_processed
+
+
 def load_audio(
         audio_path: str,
         target_sampling_rate: int = TARGET_SAMPLING_RATE
 ) -> Optional[np.ndarray]:
     try:
-        wav, original_sr = sf.read(audio_path, dtype='float32')
-        if wav.ndim > 1:
-            wav = np.mean(wav, axis=1)  # 多声道转单声道。
-        if original_sr != target_sampling_rate:
-            wav = soxr.resample(wav, original_sr, target_sampling_rate, quality='hq')  # 重采样。
+        wav, original_sr = _decode_mono(audio_path)
+        wav = _resample(wav, original_sr, target_sampling_rate)  # 重采样。
+    except Exception as e:
+        logger.error(f"Failed to load reference audio: {audio_path}. Error: {e}")
+        return None
+
+    _check_duration(audio_path, wav.shape[0], target_sampling_rate)
+    return _append_silence(wav, target_sampling_rate)
 
+
+def load_reference_audio(audio_path: str) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """
+    解码一次参考音频，并从原始采样率直接得到 (32 kHz, 16 kHz) 两路信号（均已追加静音）。
+
+    32 kHz 供声码器使用，16 kHz 供 HuBERT 使用；不再先重采样到 32 kHz、拼接静音后再二次重采样。
+    """
+    try:
+        wav, original_sr = _decode_mono(audio_path)
+        wav_32k = _resample(wav, original_sr, 32000)
+        wav_16k = _resample(wav, original_sr, 16000)
     except Exception as e:
         logger.error(f"Failed to load reference audio: {audio_path}. Error: {e}")
         return None
 
-    # 检查音频长度是否在建议范围之外
-    min_samples = int(MIN_DURATION_S * target_sampling_rate)
-    max_samples = int(MAX_DURATION_S * target_sampling_rate)
-    if not (min_samples <= wav.shape[0] <= max_samples):
-        duration = len(wav) / target_sampling_rate
-        logger.warning(
-            f"The reference audio '{os.path.basename(audio_path)}' has a duration of {duration:.2f} seconds, "
-            f"which is outside the recommended range of {MIN_DURATION_S} to {MAX_DURATION_S} seconds!"
-        )
+    _check_duration(audio_path, wav.shape[0], original_sr)
+    return _append_silence(wav_32k, 32000), _append_silence(wav_16k, 16000)
 
-    # 创建并拼接静音
-    silence_samples = int(SILENCE_TO_APPEND_S * target_sampling_rate)
-    silence_array = np.zeros(silence_samples, dtype=np.float32)
-    wav_processed = np.concatenate([wav, silence_array])
 
-    # 为模型输入增加批次维度
-    # wav_processed = np.expand_dims(wav_processed, axis=0)
-    return wav_processed
+class PCMConverter:
+    """
+    把模型输出的 float 音频转换为 16-bit PCM。
+
+    先裁剪到 [-1, 1]（超出范围的值直接 astype 会回绕成爆音），再就地写入预先分配、按需扩容的缓冲区，
+    每个块只做一次转换，不产生额外的临时数组。
+    返回的 memoryview 指向内部缓冲区，在下一次 convert() 之前有效；需要跨线程保存时请自行 bytes() 一份。
+    """
+
+    def __init__(self, initial_samples: int = 32000):
+        self._scratch: np.ndarray = np.empty(initial_samples, dtype=np.float32)
+        self._pcm: np.ndarray = np.empty(initial_samples, dtype=np.int16)
+
+    def convert(self, audio_float: np.ndarray) -> memoryview:
+        samples = audio_float.reshape(-1)  # 连续数组时只是视图，不会复制
+        n = samples.size
+        if n > self._pcm.size:
+            self._scratch = np.empty(n, dtype=np.float32)
+            self._pcm = np.empty(n, dtype=np.int16)
+        scratch = self._scratch[:n]
+        np.clip(samples, -1.0, 1.0, out=scratch)
+        np.multiply(scratch, 32767, out=scratch)
+        pcm = self._pcm[:n]
+        np.copyto(pcm, scratch, casting='unsafe')  # 与 astype(np.int16) 相同，向零取整
+        return memoryview(pcm).cast('B')
+
+
+class StreamingWavWriter:
+    """
+    以追加方式把 16-bit PCM 分块写入 WAV 文件。
+
+    每次写入后 wave 模块都会回填文件头中的长度字段，因此文件在任意时刻都是合法的 WAV，
+    而内存占用只与单个块的大小有关，与整段音频的长度无关。
+    """
+
+    def __init__(self, path: str, sample_rate: int = 32000, channels: int = 1, sample_width: int = 2):
+        self.path: str = path
+        self.frames_written: int = 0
+        self._frame_size: int = channels * sample_width
+        self._wav = wave.open(path, 'wb')
+        self._wav.setnchannels(channels)
+        self._wav.setsampwidth(sample_width)
+        self._wav.setframerate(sample_rate)
+
+    def write(self, pcm: Union[bytes, memoryview]) -> None:
+        self._wav.writeframes(pcm)
+        self.frames_written += memoryview(pcm).nbytes // self._frame_size
+
+    def close(self) -> None:
+        if self._wav is not None:
+            self._wav.close()
+            self._wav = None
+
+    def __enter__(self) -> "StreamingWavWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
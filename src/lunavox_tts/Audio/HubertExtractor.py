@@ -0,0 +1,37 @@
+import logging
+from typing import Optional
+
+import numpy as np
+
+from ..ModelManager import model_manager
+
+logger = logging.getLogger(__name__)
+
+
+class HubertFeatureExtractor:
+    """
+    逐条提取 HuBERT (SSL) 特征。
+
+    不做批处理：补零会改变特征（第一层卷积的 GroupNorm 在整条时间轴上归一化，不受 attention_mask 约束），
+    而参考音频缓存要求同一段音频无论经由哪条路径注册都得到相同的 ssl_content。
+    """
+
+    @staticmethod
+    def _session():
+        if not model_manager.cn_hubert:
+            model_manager.load_cn_hubert()
+        return model_manager.cn_hubert
+
+    def extract(self, audio_16k: np.ndarray) -> np.ndarray:
+        """对一条 16 kHz 单声道音频运行 HuBERT，返回形状为 (1, dim, frames) 的 ssl_content。"""
+        session = self._session()
+        inputs = session.get_inputs()
+        mask_name: Optional[str] = next((i.name for i in inputs if i.name == 'attention_mask'), None)
+        batch = np.expand_dims(audio_16k, axis=0).astype(np.float32, copy=False)
+        feed = {inputs[0].name: batch}
+        if mask_name:
+            feed[mask_name] = np.ones(batch.shape, dtype=np.int64)
+        return session.run(None, feed)[0]
+
+
+hubert_extractor: HubertFeatureExtractor = HubertFeatureExtractor()
@@ -1,88 +1,256 @@
+import hashlib
+import logging
 import os
-from typing import Optional
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
 
 import numpy as np
-import soxr
 
-from ..Audio.Audio import load_audio
-from ..Chinese.ChineseG2P import chinese_clean_g2p_and_norm
+from ..Audio.Audio import load_reference_audio
+from ..Audio.HubertExtractor import hubert_extractor
 from ..Chinese.ZhBert import compute_bert_phone_features
-from ..English.EnglishG2P import english_to_phones
-from ..Japanese.JapaneseG2P import japanese_to_phones
+from ..Core.Frontend import text_to_phonemes
 from ..ModelManager import model_manager
 from ..Utils.Constants import BERT_FEATURE_DIM
+from ..Utils.Cache import LRUCache
 from ..Utils.Shared import context
-from ..Utils.Utils import LRUCacheDict
 
+logger = logging.getLogger(__name__)
 
-class ReferenceAudio:
-    _prompt_cache: dict[tuple[str, str], "ReferenceAudio"] = LRUCacheDict(
-        capacity=int(os.getenv("Max_Cached_Reference_Audio", "10"))
-    )
 
-    def __new__(cls, prompt_wav: str, prompt_text: str, language: str = "auto"):
-        key = (prompt_wav, (language or "auto"))
-        if key in cls._prompt_cache:
-            instance = cls._prompt_cache[key]
-            if instance.text != prompt_text or instance.language != key[1]:
-                instance.set_text(prompt_text, language)
-            return instance
+@dataclass(frozen=True, eq=False)
+class _AudioFeatures:
+    """参考音频一侧的特征，只取决于音频内容，不同参考文本共用。"""
+    audio_32k: np.ndarray
+    # 按解码后的音频内容（而不是路径）计算哈希，不同路径下的同一段音频可以共享合成结果缓存。
+    audio_hash: str
+    ssl_content: np.ndarray
+    # 会话 -> 该会话对本参考音频的输出：prompt_encoder 的 prompts (参考音频的语义 token)、
+    # VITS 参考编码器的音色条件。这些都取决于各角色的模型权重，因此按会话分别缓存；会话被释放后条目自动消失。
+    session_outputs: weakref.WeakKeyDictionary = field(default_factory=weakref.WeakKeyDictionary)
 
-        instance = super().__new__(cls)
-        cls._prompt_cache[key] = instance
-        return instance
+    @classmethod
+    def build(cls, audio_32k: np.ndarray, ssl_content: np.ndarray) -> "_AudioFeatures":
+        return cls(
+            audio_32k=_read_only(audio_32k),
+            audio_hash=hashlib.sha256(audio_32k.tobytes()).hexdigest(),
+            ssl_content=_read_only(ssl_content),
+        )
 
-    def __init__(self, prompt_wav: str, prompt_text: str, language: str = "auto"):
-        if hasattr(self, "_initialized"):
-            return
-
-        self.text: str = prompt_text
-        self.language: str = language or "auto"
-        self.phonemes_seq: Optional[np.ndarray] = None
-        self.text_bert: Optional[np.ndarray] = None
-        self.set_text(prompt_text, language)
-
-        self.audio_32k: Optional[np.ndarray] = load_audio(
-            audio_path=prompt_wav,
-            target_sampling_rate=32000,
+    @property
+    def nbytes(self) -> int:
+        return self.audio_32k.nbytes + self.ssl_content.nbytes
+
+
+@dataclass(frozen=True, eq=False)
+class _TextFeatures:
+    """参考文本一侧的特征，只取决于文本与语言。"""
+    text: str
+    language: str
+    phonemes_seq: np.ndarray
+    text_bert: np.ndarray
+
+    @classmethod
+    def build(cls, text: str, language: str) -> "_TextFeatures":
+        ids, word2ph, norm_text = text_to_phonemes(text, language)
+        return cls(
+            text=text,
+            language=language,
+            phonemes_seq=_read_only(np.expand_dims(ids, axis=0)),
+            text_bert=_read_only(_compute_reference_bert(language, norm_text, word2ph, len(ids))),
         )
-        audio_16k: np.ndarray = soxr.resample(self.audio_32k, 32000, 16000, quality="hq")
-        audio_16k = np.expand_dims(audio_16k, axis=0)
 
-        if not model_manager.cn_hubert:
-            model_manager.load_cn_hubert()
-        self.ssl_content: Optional[np.ndarray] = model_manager.cn_hubert.run(
-            None, {"input_values": audio_16k}
-        )[0]
+    @property
+    def nbytes(self) -> int:
+        return self.phonemes_seq.nbytes + self.text_bert.nbytes
+
 
-        self._initialized = True
+class ReferenceAudio:
+    """
+    参考音频与参考文本。实例在构建后不可修改，两侧的特征分别缓存：
+        - 音频特征 (波形、HuBERT 的 ssl_content) 按文件内容哈希缓存，更换参考文本不会重新提取；
+        - 文本特征 (音素、BERT) 按 (文本, 语言) 缓存。
+    同一段音频配不同的文本得到的是不同的实例，并发的请求之间互不影响。
+    """
+    # 条目数与字节数上限同时生效，字节数上限为 0 表示不限制。音频特征的大小与参考音频时长成正比。
+    _audio_cache: LRUCache[str, _AudioFeatures] = LRUCache(
+        capacity=int(os.getenv("Max_Cached_Reference_Audio", "10")),
+        max_bytes=int(float(os.getenv("Max_Cached_Reference_Audio_MB", "0")) * (1 << 20)),
+        sizer=lambda features: features.nbytes,
+        name="Reference audio cache",
+    )
+    _text_cache: LRUCache[tuple[str, str], _TextFeatures] = LRUCache(
+        capacity=int(os.getenv("Max_Cached_Reference_Text", "32")),
+        max_bytes=int(float(os.getenv("Max_Cached_Reference_Text_MB", "0")) * (1 << 20)),
+        sizer=lambda features: features.nbytes,
+        name="Reference text cache",
+    )
+    # (路径, 文件大小, 修改时间) -> 文件内容哈希，避免每次构建实例都重新读取文件。
+    _content_hashes: LRUCache[tuple[str, int, int], str] = LRUCache(capacity=256, name="Reference hash cache")
+
+    def __init__(self, prompt_wav: str, prompt_text: str, language: str = "auto"):
+        content_hash = self._content_hash(prompt_wav)
+        audio = self._audio_cache.get(content_hash)
+        if audio is None:
+            # 只解码一次，从原始采样率分别得到声码器用的 32 kHz 与 HuBERT 用的 16 kHz 信号。
+            audios = load_reference_audio(prompt_wav)
+            if audios is None:
+                raise ValueError(f"Failed to load reference audio: {prompt_wav}")
+            audio_32k, audio_16k = audios
+            audio = _AudioFeatures.build(audio_32k, hubert_extractor.extract(audio_16k))
+            audio = self._audio_cache.setdefault(content_hash, audio)
+        self._init(audio, prompt_text, language)
 
-    def set_text(self, prompt_text: str, language: str = "auto") -> None:
-        self.text = prompt_text
+    def _init(self, audio: _AudioFeatures, prompt_text: str, language: str) -> None:
         lang = _decide_language(prompt_text, language)
-        self.language = lang
-
-        if lang == "en":
-            ids = english_to_phones(prompt_text)
-            word2ph: list[int] = []
-            norm_text = ""
-        elif lang == "zh":
-            ids, word2ph, norm_text = chinese_clean_g2p_and_norm(prompt_text)
-        else:
-            ids = japanese_to_phones(prompt_text)
-            word2ph = []
-            norm_text = ""
-
-        self.phonemes_seq = np.array([ids], dtype=np.int64)
-        bert_matrix = _compute_reference_bert(lang, norm_text, word2ph, len(ids))
-        self.text_bert = bert_matrix
+        text = self._text_cache.get((prompt_text, lang))
+        if text is None:
+            text = self._text_cache.setdefault((prompt_text, lang), _TextFeatures.build(prompt_text, lang))
+        object.__setattr__(self, "_audio", audio)
+        object.__setattr__(self, "_text", text)
 
         if lang in {"ja", "en", "zh"}:
             context.current_language = lang
 
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable; create a new instance instead.")
+
+    @classmethod
+    def _content_hash(cls, prompt_wav: str) -> str:
+        try:
+            stat = os.stat(prompt_wav)
+        except OSError:
+            raise ValueError(f"Failed to load reference audio: {prompt_wav}")
+        key = (os.path.abspath(prompt_wav), stat.st_size, stat.st_mtime_ns)
+        content_hash = cls._content_hashes.get(key)
+        if content_hash is None:
+            digest = hashlib.sha256()
+            with open(prompt_wav, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            content_hash = cls._content_hashes.setdefault(key, digest.hexdigest())
+        return content_hash
+
+    @classmethod
+    def register_many(
+            cls,
+            clips: Iterable[tuple[str, str, str]],
+            decode_workers: int = 0,
+    ) -> list["ReferenceAudio"]:
+        """
+        批量注册参考音频 [(prompt_wav, prompt_text, language), ...]，结果写入参考音频缓存，并按输入顺序返回。
+
+        音频解码与重采样在线程池中并行进行（soundfile / soxr 会释放 GIL），
+        HuBERT 由 hubert_extractor 逐条提取。同一段音频只解码与提取一次。
+        无法读取或解码失败的条目会被跳过并记录日志。
+        """
+        clips = [(prompt_wav, prompt_text, language or "auto") for prompt_wav, prompt_text, language in clips]
+        content_hashes: list[Optional[str]] = []
+        for prompt_wav, _, _ in clips:
+            try:
+                content_hashes.append(cls._content_hash(prompt_wav))
+            except ValueError as e:
+                logger.error(f"Skipping reference audio: {e}")
+                content_hashes.append(None)
+
+        # 每段未缓存的音频 (按内容去重) 只解码一次。
+        pending: dict[str, str] = {}
+        for (prompt_wav, _, _), content_hash in zip(clips, content_hashes):
+            if content_hash is not None and content_hash not in pending \
+                    and content_hash not in cls._audio_cache:
+                pending[content_hash] = prompt_wav
+        if 0 < cls._audio_cache.capacity < len(pending):
+            logger.warning(f"Registering {len(pending)} reference audios, but only "
+                           f"{cls._audio_cache.capacity} can be cached. Increase 'Max_Cached_Reference_Audio'.")
+
+        workers = decode_workers if decode_workers > 0 else min(8, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="reference-decode") as pool:
+            decoded = list(pool.map(load_reference_audio, pending.values()))
+
+        loaded: list[tuple[str, np.ndarray, np.ndarray]] = []
+        for (content_hash, prompt_wav), audios in zip(pending.items(), decoded):
+            if audios is None:
+                logger.error(f"Skipping reference audio that failed to load: {prompt_wav}")
+                continue
+            loaded.append((content_hash, audios[0], audios[1]))
+
+        # 新提取的特征先保存在本地：音频数超过缓存容量时，早注册的条目可能已被淘汰。
+        features: dict[str, _AudioFeatures] = {}
+        for content_hash, audio_32k, audio_16k in loaded:
+            features[content_hash] = cls._audio_cache.setdefault(
+                content_hash, _AudioFeatures.build(audio_32k, hubert_extractor.extract(audio_16k)))
+
+        instances: list[ReferenceAudio] = []
+        for (_, prompt_text, language), content_hash in zip(clips, content_hashes):
+            audio = features.get(content_hash) if content_hash is not None else None
+            if audio is None and content_hash is not None:
+                audio = cls._audio_cache.get(content_hash)
+            if audio is None:
+                continue
+            instance = cls.__new__(cls)
+            instance._init(audio, prompt_text, language)
+            instances.append(instance)
+        return instances
+
+    @property
+    def text(self) -> str:
+        return self._text.text
+
+    @property
+    def language(self) -> str:
+        return self._text.language
+
+    @property
+    def phonemes_seq(self) -> np.ndarray:
+        return self._text.phonemes_seq
+
+    @property
+    def text_bert(self) -> np.ndarray:
+        return self._text.text_bert
+
+    @property
+    def audio_32k(self) -> np.ndarray:
+        return self._audio.audio_32k
+
+    @property
+    def audio_hash(self) -> str:
+        return self._audio.audio_hash
+
+    @property
+    def ssl_content(self) -> np.ndarray:
+        return self._audio.ssl_content
+
+    def get_prompts(self, prompt_encoder) -> np.ndarray:
+        """返回由 prompt_encoder 计算的 prompts，每个会话只计算一次。"""
+        prompts = self._audio.session_outputs.get(prompt_encoder)
+        if prompts is None:
+            prompts = prompt_encoder.run(None, {"ssl_content": self.ssl_content})[0]
+            self._audio.session_outputs[prompt_encoder] = prompts
+        return prompts
+
+    def get_vits_reference(self, ref_encoder) -> dict[str, np.ndarray]:
+        """返回 VITS 参考编码器的输出 {张量名: 值}，作为拆分后 VITS 解码器的输入；每个会话只计算一次。"""
+        features = self._audio.session_outputs.get(ref_encoder)
+        if features is None:
+            names = [output.name for output in ref_encoder.get_outputs()]
+            values = ref_encoder.run(None, {"ref_audio": np.expand_dims(self.audio_32k, axis=0)})
+            features = dict(zip(names, values))
+            self._audio.session_outputs[ref_encoder] = features
+        return features
+
+    @property
+    def fingerprint(self) -> str:
+        """参考音频内容、参考文本与语言的指纹，任一变化都会影响合成结果。"""
+        raw = '\x1f'.join((self.audio_hash, self.text, self.language))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
     @classmethod
     def clear_cache(cls) -> None:
-        cls._prompt_cache.clear()
+        cls._audio_cache.clear()
+        cls._text_cache.clear()
+        cls._content_hashes.clear()
 
 
 def _decide_language(text: str, language: Optional[str]) -> str:
@@ -108,6 +276,11 @@ def _compute_reference_bert(
     return np.zeros((phone_len, BERT_FEATURE_DIM), dtype=np.float32)
 
 
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
 def _looks_english(text: str) -> bool:
     ascii_letters = sum(ch.isascii() and ch.isalpha() for ch in text)
     non_ascii = sum(not ch.isascii() and not ch.isspace() for ch in text)
@@ -116,5 +289,3 @@ def _looks_english(text: str) -> bool:
 
 def _looks_chinese(text: str) -> bool:
     return any("\u4e00" <= ch <= "\u9fff" for ch in text)
-
-
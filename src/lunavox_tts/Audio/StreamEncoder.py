@@ -0,0 +1,225 @@
+import os
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+try:
+    import av
+except Exception:  # optional dependency for Opus / MP3 encoding
+    av = None
+
+SUPPORTED_STREAM_FORMATS = ('pcm', 'wav', 'opus', 'mp3')
+# Opus 只支持 8/12/16/24/48 kHz，32 kHz 的模型输出需要重采样到 48 kHz。
+OPUS_SAMPLE_RATE = 48000
+OPUS_BIT_RATE = int(os.getenv('Opus_Bit_Rate', '32000'))
+MP3_BIT_RATE = int(os.getenv('MP3_Bit_Rate', '64000'))
+# Ogg 页面时长 (微秒)。默认的 1 秒会让首包明显变慢。
+OGG_PAGE_DURATION_US = 100000
+
+# 有损编码在线程池中进行（PyAV 编码时会释放 GIL），不阻塞事件循环。
+encoder_pool: ThreadPoolExecutor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('Stream_Encoder_Workers', '2')),
+    thread_name_prefix='stream-encoder',
+)
+
+
+class StreamEncoder:
+    """
+    把 16-bit 单声道 PCM 块逐块编码为某种容器格式的字节流。
+
+    每个实例只服务一条音频流，encode() 必须按顺序调用，最后调用一次 flush()。
+    流提前结束 (取消、客户端断开) 时不调用 flush()，改为调用 close() 释放资源；close() 可以重复调用。
+    """
+    media_type: str = 'application/octet-stream'
+    needs_worker: bool = False  # 为 True 时应放到 encoder_pool 中执行
+
+    def __init__(self, sample_rate: int = 32000, channels: int = 1):
+        self.sample_rate: int = sample_rate  # 输入 PCM 的采样率
+        self.output_sample_rate: int = sample_rate  # 编码后音频的采样率，编码器内部重采样时与输入不同
+        self.channels: int = channels
+
+    def encode(self, pcm: bytes) -> bytes:
+        raise NotImplementedError
+
+    def flush(self) -> bytes:
+        return b''
+
+    def close(self) -> None:
+        pass
+
+
+class PCMStreamEncoder(StreamEncoder):
+    """原样输出裸 PCM（与旧版 /tts 的输出一致）。"""
+
+    def __init__(self, sample_rate: int = 32000, channels: int = 1):
+        super().__init__(sample_rate, channels)
+        self.media_type = f'audio/L16; rate={sample_rate}; channels={channels}'
+
+    def encode(self, pcm: bytes) -> bytes:
+        return pcm
+
+
+class WavStreamEncoder(StreamEncoder):
+    """
+    在第一个块前输出 WAV 文件头。
+
+    流式输出时总长度未知，因此 RIFF 与 data 的长度字段都写为 0xFFFFFFFF，
+    主流播放器与解码器会把它当作“读到流结束为止”。
+    """
+    media_type = 'audio/wav'
+
+    def __init__(self, sample_rate: int = 32000, channels: int = 1, sample_width: int = 2):
+        super().__init__(sample_rate, channels)
+        self.sample_width: int = sample_width
+        self._header_sent: bool = False
+
+    def _header(self) -> bytes:
+        byte_rate = self.sample_rate * self.channels * self.sample_width
+        block_align = self.channels * self.sample_width
+        return (
+                b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE'
+                + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, self.channels, self.sample_rate,
+                                        byte_rate, block_align, self.sample_width * 8)
+                + b'data' + struct.pack('<I', 0xFFFFFFFF)
+        )
+
+    def encode(self, pcm: bytes) -> bytes:
+        if self._header_sent:
+            return pcm
+        self._header_sent = True
+        return self._header() + pcm
+
+    def flush(self) -> bytes:
+        # 即使一个音频块都没有产生，也返回一个合法的（空）WAV。
+        return self.encode(b'')
+
+
+class _ChunkSink:
+    """不可 seek 的内存输出，迫使封装器按流式方式写出数据。"""
+
+    def __init__(self):
+        self._parts: list[bytes] = []
+
+    def write(self, data) -> int:
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+class _AVStreamEncoder(StreamEncoder):
+    needs_worker = True
+
+    def __init__(self,
+                 container_format: str,
+                 codec: str,
+                 codec_sample_rate: int,
+                 bit_rate: int,
+                 sample_rate: int = 32000,
+                 channels: int = 1,
+                 container_options: Optional[dict[str, str]] = None,
+                 ):
+        super().__init__(sample_rate, channels)
+        self.output_sample_rate = codec_sample_rate
+        if av is None:
+            raise RuntimeError(
+                f"Encoding to '{container_format}' requires PyAV. Please run `pip install av` first.")
+        self._layout: str = 'mono' if channels == 1 else 'stereo'
+        self._sink = _ChunkSink()
+        self._container = av.open(self._sink, mode='w', format=container_format,
+                                  options=container_options or {})
+        self._stream = self._container.add_stream(codec, rate=codec_sample_rate, layout=self._layout)
+        self._stream.bit_rate = bit_rate
+        # 同时处理采样率与采样格式的转换（例如 libmp3lame 需要 s32p）。
+        self._resampler = av.AudioResampler(
+            format=self._stream.codec_context.format.name,
+            layout=self._layout,
+            rate=codec_sample_rate,
+        )
+        self._closed: bool = False
+        # encode / flush 在 encoder_pool 中执行，close 可能在事件循环线程中同时被调用。
+        self._lock: threading.Lock = threading.Lock()
+
+    def _encode_frames(self, frame) -> None:
+        for resampled in self._resampler.resample(frame):
+            for packet in self._stream.encode(resampled):
+                self._container.mux(packet)
+
+    def encode(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        if samples.size == 0:
+            return b''
+        frame = av.AudioFrame.from_ndarray(samples.reshape(1, -1), format='s16', layout=self._layout)
+        frame.sample_rate = self.sample_rate
+        with self._lock:
+            if self._closed:
+                return b''
+            self._encode_frames(frame)
+            return self._sink.drain()
+
+    def flush(self) -> bytes:
+        with self._lock:
+            if self._closed:
+                return b''
+            self._closed = True
+            self._encode_frames(None)
+            for packet in self._stream.encode(None):
+                self._container.mux(packet)
+            self._container.close()
+            return self._sink.drain()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._container.close()
+            self._sink.drain()
+
+
+class OggOpusStreamEncoder(_AVStreamEncoder):
+    media_type = 'audio/ogg'
+
+    def __init__(self, sample_rate: int = 32000, channels: int = 1):
+        super().__init__(
+            container_format='ogg',
+            codec='libopus',
+            codec_sample_rate=OPUS_SAMPLE_RATE,
+            bit_rate=OPUS_BIT_RATE,
+            sample_rate=sample_rate,
+            channels=channels,
+            container_options={'page_duration': str(OGG_PAGE_DURATION_US)},
+        )
+
+
+class MP3StreamEncoder(_AVStreamEncoder):
+    media_type = 'audio/mpeg'
+
+    def __init__(self, sample_rate: int = 32000, channels: int = 1):
+        super().__init__(
+            container_format='mp3',
+            codec='libmp3lame',
+            codec_sample_rate=sample_rate,
+            bit_rate=MP3_BIT_RATE,
+            sample_rate=sample_rate,
+            channels=channels,
+        )
+
+
+def create_stream_encoder(audio_format: str, sample_rate: int = 32000, channels: int = 1) -> StreamEncoder:
+    audio_format = (audio_format or 'wav').lower()
+    if audio_format == 'pcm':
+        return PCMStreamEncoder(sample_rate, channels)
+    if audio_format == 'wav':
+        return WavStreamEncoder(sample_rate, channels)
+    if audio_format == 'opus':
+        return OggOpusStreamEncoder(sample_rate, channels)
+    if audio_format == 'mp3':
+        return MP3StreamEncoder(sample_rate, channels)
+    raise ValueError(f"Audio format '{audio_format}' is not supported. Supported formats: {SUPPORTED_STREAM_FORMATS}")
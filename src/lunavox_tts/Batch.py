@@ -0,0 +1,293 @@
+"""
+离线批量合成：把一个清单 (JSONL) 中的长文本切成句子，分发到多个进程并行合成，再按顺序拼回每个条目的音频文件。
+
+清单每行一个 JSON 对象：
+    {"id": "chapter_01", "character": "misono_mika", "text": "...", "lang": "ja"}
+可选字段 "reuse_semantic_tokens": true 使该条目复用 (并缓存) 本进程中同一句子已生成的语义 token，只重新运行声码器。
+
+角色配置 (JSON)：
+    {"misono_mika": {"model_dir": "...", "audio_path": "...", "audio_text": "...", "audio_lang": "ja"}}
+
+命令行用法：
+    python -m lunavox_tts.Batch manifest.jsonl -o output_dir --characters characters.json --workers 4
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import shutil
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field
+from typing import Optional, Union
+
+import numpy as np
+
+from .Audio.Audio import PCMConverter, StreamingWavWriter
+from .Core.TextSplitter import split_sentences
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE: int = 32000
+CHECKPOINT_FILENAME: str = 'checkpoint.jsonl'
+SENTENCE_CACHE_DIRNAME: str = '.sentence_cache'
+_UNSAFE_FILENAME_RE = re.compile(r'[\\/:*?"<>|\s]+')
+
+# 工作进程内的状态，由 _init_worker 设置。
+_worker_characters: dict[str, dict] = {}
+
+
+@dataclass
+class _BatchItem:
+    item_id: str
+    character: str
+    language: str
+    sentences: list[str]
+    output_path: str
+    reuse_semantic_tokens: bool = False
+    audio: dict[int, np.ndarray] = field(default_factory=dict)
+    failed: bool = False
+
+
+def _init_worker(characters: dict[str, dict], intra_op_num_threads: int, sentence_cache_dir: str) -> None:
+    from .Audio.ReferenceAudio import ReferenceAudio
+    from .Core.ResultCache import result_cache
+    from .ModelManager import model_manager
+
+    _worker_characters.update(characters)
+    # 每个进程只使用分到的线程数，避免 N 个进程各自占满所有核心。
+    model_manager.configure_sessions(intra_op_num_threads=intra_op_num_threads)
+    # 句子级结果写入磁盘缓存：任务中断后重新运行时，已合成的句子直接读取，不再推理。
+    result_cache.cache_dir = sentence_cache_dir
+    result_cache.disk_budget_bytes = 0  # 续跑依赖这些句子，不能按预算删除；任务成功结束后整个目录会被删除
+    # 一次性提取所有角色参考音频的 HuBERT 特征。
+    ReferenceAudio.register_many([(config['audio_path'], config['audio_text'], config.get('audio_lang') or 'auto')
+                                  for config in characters.values()])
+
+
+def _synthesize_sentence(character: str, language: str, text: str,
+                         reuse_semantic_tokens: bool = False) -> Optional[np.ndarray]:
+    from .Audio.ReferenceAudio import ReferenceAudio
+    from .Core.Inference import tts_client
+    from .ModelManager import model_manager
+
+    config = _worker_characters[character]
+    gsv_model = model_manager.get(character.lower())
+    if gsv_model is None:
+        if not model_manager.load_character(character, config['model_dir']):
+            raise RuntimeError(f"Failed to load character '{character}' from {config['model_dir']}.")
+        gsv_model = model_manager.get(character.lower())
+    prompt_audio = ReferenceAudio(
+        prompt_wav=config['audio_path'],
+        prompt_text=config['audio_text'],
+        language=config.get('audio_lang') or 'auto',
+    )
+    audio = tts_client.tts(
+        text=text,
+        prompt_audio=prompt_audio,
+        encoder=gsv_model.T2S_ENCODER,
+        first_stage_decoder=gsv_model.T2S_FIRST_STAGE_DECODER,
+        stage_decoder=gsv_model.T2S_STAGE_DECODER,
+        vocoder=gsv_model.VITS,
+        language=language,
+        model_fingerprint=gsv_model.FINGERPRINT,
+        t2s_fingerprint=gsv_model.T2S_FINGERPRINT,
+        prompt_encoder=gsv_model.T2S_PROMPT_ENCODER,
+        text_encoder=gsv_model.T2S_TEXT_ENCODER,
+        vocoder_ref_encoder=gsv_model.VITS_REF_ENCODER,
+        vocoder_decoder=gsv_model.VITS_DECODER,
+        stage_decoder_loop=gsv_model.T2S_STAGE_DECODER_LOOP,
+        reuse_semantic_tokens=reuse_semantic_tokens,
+    )
+    if audio is None:
+        return None
+    return np.asarray(audio, dtype=np.float32).reshape(-1)
+
+
+def _load_checkpoint(checkpoint_path: str) -> set[str]:
+    done: set[str] = set()
+    if not os.path.exists(checkpoint_path):
+        return done
+    with open(checkpoint_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # 中断时写了一半的最后一行
+            if os.path.exists(record.get('path', '')):
+                done.add(record['id'])
+    return done
+
+
+def _read_manifest(manifest_path: str) -> list[dict]:
+    entries: list[dict] = []
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            entry = json.loads(line)
+            for key in ('id', 'character', 'text'):
+                if key not in entry:
+                    raise ValueError(f"Manifest line {line_no} is missing the '{key}' field.")
+            entries.append(entry)
+    return entries
+
+
+def _write_item(item: _BatchItem) -> None:
+    tmp_path = item.output_path + '.part'
+    converter = PCMConverter()
+    with StreamingWavWriter(tmp_path, sample_rate=SAMPLE_RATE) as writer:
+        for index in range(len(item.sentences)):
+            writer.write(converter.convert(item.audio[index]))
+    os.replace(tmp_path, item.output_path)
+
+
+def run_batch(
+        manifest_path: Union[str, os.PathLike],
+        output_dir: Union[str, os.PathLike],
+        characters: dict[str, dict],
+        workers: int = 0,
+        intra_op_num_threads: int = 0,
+        checkpoint_path: Union[str, os.PathLike, None] = None,
+) -> dict[str, int]:
+    """
+    Synthesizes every item of a JSONL manifest into '<output_dir>/<id>.wav' using a process pool.
+
+    Args:
+        manifest_path (str | PathLike): JSONL file, one {"id", "character", "text", "lang"} object per line.
+            An optional "reuse_semantic_tokens": true reuses the semantic tokens a worker already generated for the
+            same sentence, so only the vocoder runs again.
+        output_dir (str | PathLike): Directory for the generated WAV files.
+        characters (dict[str, dict]): {character_name: {"model_dir", "audio_path", "audio_text", "audio_lang"}}.
+        workers (int): Number of worker processes. Defaults to the number of CPU cores.
+        intra_op_num_threads (int): ONNX Runtime threads per worker. Defaults to cores / workers.
+        checkpoint_path (str | PathLike | None): Progress file. Defaults to '<output_dir>/checkpoint.jsonl'.
+            Items recorded there are skipped when the job is run again; sentences finished before an
+            interruption are reused from '<output_dir>/.sentence_cache'.
+
+    Returns:
+        dict[str, int]: Number of 'completed', 'skipped' and 'failed' items.
+    """
+    manifest_path = os.fspath(manifest_path)
+    output_dir = os.fspath(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    checkpoint_path = os.fspath(checkpoint_path) if checkpoint_path else os.path.join(output_dir, CHECKPOINT_FILENAME)
+    sentence_cache_dir = os.path.join(output_dir, SENTENCE_CACHE_DIRNAME)
+
+    cpu_count = os.cpu_count() or 1
+    workers = workers if workers > 0 else cpu_count
+    intra_op_num_threads = intra_op_num_threads if intra_op_num_threads > 0 else max(1, cpu_count // workers)
+
+    done_ids = _load_checkpoint(checkpoint_path)
+    stats: dict[str, int] = {'completed': 0, 'skipped': 0, 'failed': 0}
+    items: list[_BatchItem] = []
+    for entry in _read_manifest(manifest_path):
+        item_id = str(entry['id'])
+        if item_id in done_ids:
+            stats['skipped'] += 1
+            continue
+        if entry['character'] not in characters:
+            raise ValueError(f"Character '{entry['character']}' of item '{item_id}' is not configured.")
+        language = entry.get('lang') or 'ja'
+        items.append(_BatchItem(
+            item_id=item_id,
+            character=entry['character'],
+            language=language,
+            sentences=split_sentences(entry['text'], language) or [entry['text']],
+            output_path=os.path.join(output_dir, _UNSAFE_FILENAME_RE.sub('_', item_id) + '.wav'),
+            reuse_semantic_tokens=bool(entry.get('reuse_semantic_tokens', False)),
+        ))
+    if stats['skipped']:
+        logger.info(f"Resuming from checkpoint: {stats['skipped']} item(s) already done.")
+
+    # 按清单顺序提交句子，同时只保留有限个在途任务，使已完成的条目能尽快写出并释放内存。
+    jobs = deque((item, index) for item in items for index in range(len(item.sentences)))
+    remaining: dict[str, int] = {item.item_id: len(item.sentences) for item in items}
+    max_in_flight = workers * 4
+    in_flight: dict[Future, tuple[_BatchItem, int]] = {}
+
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_worker,
+                             initargs=(characters, intra_op_num_threads, sentence_cache_dir)) as pool, \
+            open(checkpoint_path, 'a', encoding='utf-8') as checkpoint:
+        while jobs or in_flight:
+            while jobs and len(in_flight) < max_in_flight:
+                item, index = jobs.popleft()
+                if item.failed:
+                    continue
+                future = pool.submit(_synthesize_sentence, item.character, item.language, item.sentences[index],
+                                     item.reuse_semantic_tokens)
+                in_flight[future] = (item, index)
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                item, index = in_flight.pop(future)
+                try:
+                    audio = future.result()
+                    if audio is None:
+                        raise RuntimeError('no audio was produced')
+                except Exception as e:
+                    logger.error(f"Item '{item.item_id}', sentence {index} failed: {e}")
+                    if not item.failed:
+                        item.failed = True
+                        item.audio.clear()
+                        stats['failed'] += 1
+                    continue
+                if item.failed:
+                    continue
+
+                item.audio[index] = audio
+                remaining[item.item_id] -= 1
+                if remaining[item.item_id] == 0:
+                    _write_item(item)
+                    item.audio.clear()
+                    checkpoint.write(json.dumps({'id': item.item_id, 'path': item.output_path},
+                                                ensure_ascii=False) + '\n')
+                    checkpoint.flush()
+                    stats['completed'] += 1
+                    logger.info(f"[{stats['completed']}/{len(items)}] Saved {item.output_path}")
+
+    if stats['failed'] == 0 and os.path.isdir(sentence_cache_dir):
+        shutil.rmtree(sentence_cache_dir, ignore_errors=True)
+    logger.info(f"Batch finished: {stats['completed']} completed, {stats['skipped']} skipped, "
+                f"{stats['failed']} failed.")
+    return stats
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m lunavox_tts.Batch',
+                                     description='Offline batch synthesis of a JSONL manifest.')
+    parser.add_argument('manifest', help='JSONL manifest with id / character / text / lang fields.')
+    parser.add_argument('-o', '--output', required=True, help='Output directory for the WAV files.')
+    parser.add_argument('--characters', required=True,
+                        help='JSON file: {name: {model_dir, audio_path, audio_text, audio_lang}}.')
+    parser.add_argument('--workers', type=int, default=0, help='Number of worker processes. (Default: all cores)')
+    parser.add_argument('--threads-per-worker', type=int, default=0,
+                        help='ONNX Runtime threads per worker. (Default: cores / workers)')
+    parser.add_argument('--checkpoint', default=None,
+                        help='Checkpoint file. (Default: <output>/checkpoint.jsonl)')
+    args = parser.parse_args(argv)
+
+    with open(args.characters, 'r', encoding='utf-8') as f:
+        characters: dict[str, dict] = json.load(f)
+    stats = run_batch(
+        manifest_path=args.manifest,
+        output_dir=args.output,
+        characters=characters,
+        workers=args.workers,
+        intra_op_num_threads=args.threads_per_worker,
+        checkpoint_path=args.checkpoint,
+    )
+    if stats['failed']:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s', datefmt='[%X]')
+    main()
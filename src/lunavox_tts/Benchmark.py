@@ -0,0 +1,341 @@
+"""
+对比同一角色不同精度模型 (FP32 / INT8) 的速度与音质，或对比 T2S 自回归解码的两种实现。
+
+速度以 RTF (合成耗时 / 音频时长) 衡量。音质以相对 FP32 输出的频谱距离衡量：
+    - vocoder_lsd_db：用同一组 FP32 语义 token 驱动各精度的声码器，逐帧计算对数谱距离 (LSD)。
+      两者长度一致，可以直接反映声码器量化带来的误差。
+    - ltas_db：端到端输出的长时平均谱距离。T2S 是随机采样的，不同次运行的长度和内容都会不同，
+      因此只比较整体频谱包络；FP32 一行（repeats >= 2 时）给出的是同精度两次运行之间的噪声底。
+
+解码对比 (--mode decode)：同一输入分别用 Python 循环 (每步一次 stage decoder run) 与单图 ONNX Loop
+解码，按句子报告每个语义 token 的耗时。文本文件中放入长短不同的句子即可观察长度的影响。
+
+命令行用法：
+    python -m lunavox_tts.Benchmark model_dir --audio-path ref.wav --audio-text "..." --texts texts.txt
+    python -m lunavox_tts.Benchmark model_dir --audio-path ref.wav --audio-text "..." --texts texts.txt --mode decode
+"""
+
+import argparse
+import logging
+import os
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE: int = 32000
+# 让各精度共享 FP32 生成的语义 token（见 LunaVoxEngine 的语义 token 缓存）。
+_SHARED_T2S_FINGERPRINT: str = 'benchmark-fp32-tokens'
+
+
+def _log_power_spectrogram(audio: np.ndarray, n_fft: int = 1024, hop_length: int = 256) -> np.ndarray:
+    audio = np.asarray(audio, dtype=np.float64).reshape(-1)
+    if audio.shape[0] < n_fft:
+        audio = np.pad(audio, (0, n_fft - audio.shape[0]))
+    frames = np.lib.stride_tricks.sliding_window_view(audio, n_fft)[::hop_length] * np.hanning(n_fft)
+    power = np.abs(np.fft.rfft(frames, axis=-1)) ** 2
+    return 10.0 * np.log10(power + 1e-10)
+
+
+def log_spectral_distance(reference: np.ndarray, estimate: np.ndarray) -> float:
+    """逐帧对数谱距离 (dB)，两段音频按较短者截断对齐。"""
+    reference = np.asarray(reference).reshape(-1)
+    estimate = np.asarray(estimate).reshape(-1)
+    length = min(reference.shape[0], estimate.shape[0])
+    diff = _log_power_spectrogram(reference[:length]) - _log_power_spectrogram(estimate[:length])
+    return float(np.mean(np.sqrt(np.mean(diff ** 2, axis=-1))))
+
+
+def long_term_spectral_distance(reference: np.ndarray, estimate: np.ndarray) -> float:
+    """长时平均谱之间的距离 (dB)，与音频长度无关。"""
+    def _ltas(audio: np.ndarray) -> np.ndarray:
+        power = 10.0 ** (_log_power_spectrogram(audio) / 10.0)
+        return 10.0 * np.log10(np.mean(power, axis=0) + 1e-10)
+
+    return float(np.sqrt(np.mean((_ltas(reference) - _ltas(estimate)) ** 2)))
+
+
+def run_benchmark(
+        model_dir: str,
+        audio_path: str,
+        audio_text: str,
+        texts: Sequence[str],
+        audio_lang: str = 'auto',
+        language: str = 'ja',
+        precisions: Sequence[str] = ('fp32', 'int8'),
+        repeats: int = 2,
+) -> dict[str, dict[str, float]]:
+    """
+    Measures RTF and spectral distance to FP32 for each precision of one character model.
+
+    Args:
+        model_dir (str): Converted ONNX model directory (with *_int8.onnx for the INT8 row).
+        audio_path (str): Reference audio used for every sentence.
+        audio_text (str): Transcript of the reference audio.
+        texts (Sequence[str]): Sentences to synthesize.
+        audio_lang (str): Language of the reference transcript.
+        language (str): Language of the sentences.
+        precisions (Sequence[str]): Precisions to compare. FP32 is always included as the baseline.
+        repeats (int): Timed runs per sentence and precision.
+
+    Returns:
+        dict[str, dict[str, float]]: {precision: {'rtf', 'vocoder_lsd_db', 'ltas_db'}}.
+    """
+    from .Audio.ReferenceAudio import ReferenceAudio
+    from .Core.Inference import MAX_CACHED_SEMANTIC_TOKENS, tts_client
+    from .ModelManager import model_manager
+
+    precisions = ['fp32'] + [p.lower() for p in precisions if p.lower() != 'fp32']
+    repeats = max(1, repeats)
+    prompt_audio = ReferenceAudio(prompt_wav=audio_path, prompt_text=audio_text, language=audio_lang)
+
+    models = {}
+    for precision in precisions:
+        name = f'benchmark_{precision}'
+        if not model_manager.load_character(name, model_dir, precision):
+            raise RuntimeError(f"Failed to load {precision} models from {model_dir}.")
+        if model_manager.character_precisions[name] != precision:
+            logger.warning(f"Skipping {precision}: models are not available in {model_dir}.")
+            model_manager.remove_character(name)
+            continue
+        models[precision] = model_manager.get(name)
+
+    def _synthesize(precision: str, text: str, t2s_fingerprint: Optional[str] = None) -> np.ndarray:
+        gsv_model = models[precision]
+        audio = tts_client.tts(
+            text=text,
+            prompt_audio=prompt_audio,
+            encoder=gsv_model.T2S_ENCODER,
+            first_stage_decoder=gsv_model.T2S_FIRST_STAGE_DECODER,
+            stage_decoder=gsv_model.T2S_STAGE_DECODER,
+            vocoder=gsv_model.VITS,
+            language=language,
+            t2s_fingerprint=t2s_fingerprint,
+            prompt_encoder=gsv_model.T2S_PROMPT_ENCODER,
+            text_encoder=gsv_model.T2S_TEXT_ENCODER,
+            vocoder_ref_encoder=gsv_model.VITS_REF_ENCODER,
+            vocoder_decoder=gsv_model.VITS_DECODER,
+            stage_decoder_loop=gsv_model.T2S_STAGE_DECODER_LOOP,
+            reuse_semantic_tokens=t2s_fingerprint is not None,
+        )
+        if audio is None:
+            raise RuntimeError(f"{precision} synthesis produced no audio for: {text}")
+        return np.asarray(audio, dtype=np.float32).reshape(-1)
+
+    # 端到端计时：不传指纹，结果缓存与语义 token 缓存都不会命中。
+    timed_outputs: dict[str, list[list[np.ndarray]]] = {}
+    results: dict[str, dict[str, float]] = {}
+    for precision in models:
+        _synthesize(precision, texts[0])  # 预热：首次运行包含内存规划等一次性开销
+        elapsed = 0.0
+        duration = 0.0
+        outputs: list[list[np.ndarray]] = []
+        for text in texts:
+            runs: list[np.ndarray] = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                audio = _synthesize(precision, text)
+                elapsed += time.perf_counter() - start
+                duration += audio.shape[0] / SAMPLE_RATE
+                runs.append(audio)
+            outputs.append(runs)
+        timed_outputs[precision] = outputs
+        results[precision] = {'rtf': elapsed / max(duration, 1e-9)}
+
+    # 声码器对比：FP32 先生成并缓存语义 token，其余精度共用同一份 token，只运行各自的声码器。
+    vocoder_reference: list[np.ndarray] = []
+    if MAX_CACHED_SEMANTIC_TOKENS > 0:
+        vocoder_reference = [_synthesize('fp32', text, _SHARED_T2S_FINGERPRINT) for text in texts]
+    else:
+        logger.warning("Semantic token cache is disabled (Max_Cached_Semantic_Tokens=0); skipping vocoder LSD.")
+
+    for precision, outputs in timed_outputs.items():
+        reference_runs = timed_outputs['fp32']
+        # FP32 自身与第二次运行比较 (噪声底)；只运行一次时没有可比较的对象。
+        run_index = 1 if precision == 'fp32' else 0
+        if run_index < repeats:
+            results[precision]['ltas_db'] = float(np.mean([
+                long_term_spectral_distance(reference_runs[i][0], outputs[i][run_index])
+                for i in range(len(texts))
+            ]))
+        if vocoder_reference:
+            results[precision]['vocoder_lsd_db'] = float(np.mean([
+                log_spectral_distance(vocoder_reference[i], _synthesize(precision, text, _SHARED_T2S_FINGERPRINT))
+                for i, text in enumerate(texts)
+            ]))
+
+    tts_client.clear_semantic_cache()
+    for precision in models:
+        model_manager.remove_character(f'benchmark_{precision}')
+    return results
+
+
+def run_decode_benchmark(
+        model_dir: str,
+        audio_path: str,
+        audio_text: str,
+        texts: Sequence[str],
+        audio_lang: str = 'auto',
+        language: str = 'ja',
+        repeats: int = 3,
+) -> list[dict[str, float]]:
+    """
+    Compares the per-step Python decoding loop with the single-graph ONNX Loop decoder.
+
+    Args:
+        model_dir (str): Converted ONNX model directory (FP32).
+        audio_path (str): Reference audio used for every sentence.
+        audio_text (str): Transcript of the reference audio.
+        texts (Sequence[str]): Sentences to decode, ideally of different lengths.
+        audio_lang (str): Language of the reference transcript.
+        language (str): Language of the sentences.
+        repeats (int): Timed decodes per sentence and mode.
+
+    Returns:
+        list[dict[str, float]]: One row per sentence with 'phonemes', 'tokens',
+            'python_ms_per_token', 'loop_ms_per_token' and 'speedup'.
+    """
+    import onnxruntime
+
+    from .Audio.ReferenceAudio import ReferenceAudio
+    from .Core.Inference import tts_client
+    from .Converter.v2.GraphSurgery import build_stage_decoder_loop
+    from .ModelManager import _GSVModelFile, model_manager
+    from .Utils.Constants import BERT_FEATURE_DIM
+
+    if not build_stage_decoder_loop(os.path.join(model_dir, _GSVModelFile.T2S_STAGE_DECODER),
+                                    os.path.join(model_dir, _GSVModelFile.T2S_STAGE_DECODER_LOOP)):
+        raise RuntimeError(f"Failed to build the loop decoder in {model_dir}.")
+    name = 'benchmark_decode'
+    if not model_manager.load_character(name, model_dir, 'fp32'):
+        raise RuntimeError(f"Failed to load models from {model_dir}.")
+    gsv_model = model_manager.get(name)
+
+    # 两种解码器都直接创建，与环境变量 T2S_Decode_Mode 无关。
+    def _session(filename: str) -> onnxruntime.InferenceSession:
+        return onnxruntime.InferenceSession(os.path.join(model_dir, filename),
+                                            providers=model_manager.providers,
+                                            sess_options=model_manager.sess_options)
+
+    stage_decoder = gsv_model.T2S_STAGE_DECODER or _session(_GSVModelFile.T2S_STAGE_DECODER)
+    stage_decoder_loop = gsv_model.T2S_STAGE_DECODER_LOOP or _session(_GSVModelFile.T2S_STAGE_DECODER_LOOP)
+    prompt_audio = ReferenceAudio(prompt_wav=audio_path, prompt_text=audio_text, language=audio_lang)
+    ref_seq = prompt_audio.phonemes_seq
+    ref_bert = prompt_audio.text_bert
+    if ref_bert is None or ref_bert.shape[0] != ref_seq.shape[1]:
+        ref_bert = np.zeros((ref_seq.shape[1], BERT_FEATURE_DIM), dtype=np.float32)
+    prompts: Optional[np.ndarray] = None
+    if gsv_model.T2S_PROMPT_ENCODER is not None and gsv_model.T2S_TEXT_ENCODER is not None:
+        prompts = prompt_audio.get_prompts(gsv_model.T2S_PROMPT_ENCODER)
+
+    def _decode(text_seq: np.ndarray, text_bert: np.ndarray, loop: bool) -> tuple[float, int]:
+        start = time.perf_counter()
+        tokens = tts_client.t2s_cpu(
+            ref_seq=ref_seq,
+            ref_bert=ref_bert,
+            text_seq=text_seq,
+            text_bert=text_bert,
+            ssl_content=prompt_audio.ssl_content,
+            encoder=gsv_model.T2S_ENCODER,
+            first_stage_decoder=gsv_model.T2S_FIRST_STAGE_DECODER,
+            stage_decoder=None if loop else stage_decoder,
+            prompts=prompts,
+            text_encoder=gsv_model.T2S_TEXT_ENCODER,
+            stage_decoder_loop=stage_decoder_loop if loop else None,
+        )
+        elapsed = time.perf_counter() - start
+        if tokens is None:
+            raise RuntimeError("Decoding was interrupted.")
+        return elapsed, int(tokens.shape[-1])
+
+    rows: list[dict[str, float]] = []
+    try:
+        for text in texts:
+            text_seq, text_bert = tts_client.text_features(text, language)
+            row: dict[str, float] = {'phonemes': float(text_seq.shape[1])}
+            token_counts: list[int] = []
+            for mode, loop in (('python', False), ('loop', True)):
+                _decode(text_seq, text_bert, loop)  # 预热
+                # 采样是随机的，两种模式生成的长度不同，因此按每个 token 的耗时比较。
+                elapsed, tokens = 0.0, 0
+                for _ in range(max(1, repeats)):
+                    run_elapsed, run_tokens = _decode(text_seq, text_bert, loop)
+                    elapsed += run_elapsed
+                    tokens += run_tokens
+                token_counts.append(tokens)
+                row[f'{mode}_ms_per_token'] = 1000.0 * elapsed / max(tokens, 1)
+            row['tokens'] = sum(token_counts) / (2 * max(1, repeats))
+            row['speedup'] = row['python_ms_per_token'] / max(row['loop_ms_per_token'], 1e-9)
+            rows.append(row)
+    finally:
+        model_manager.remove_character(name)
+    return rows
+
+
+def _format_decode_results(rows: list[dict[str, float]]) -> str:
+    columns = ('phonemes', 'tokens', 'python_ms_per_token', 'loop_ms_per_token', 'speedup')
+    lines = [f"{'#':<4}" + ''.join(f'{column:>21}' for column in columns)]
+    for index, row in enumerate(rows):
+        lines.append(f'{index:<4}' + ''.join(f'{row[c]:>21.2f}' for c in columns))
+    return '\n'.join(lines)
+
+
+def _format_results(results: dict[str, dict[str, float]]) -> str:
+    columns = ('rtf', 'vocoder_lsd_db', 'ltas_db')
+    lines = [f"{'precision':<10}" + ''.join(f'{column:>16}' for column in columns)]
+    for precision, metrics in results.items():
+        cells = ''.join(f'{metrics[c]:>16.4f}' if c in metrics else f"{'-':>16}" for c in columns)
+        lines.append(f'{precision:<10}{cells}')
+    return '\n'.join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog='python -m lunavox_tts.Benchmark',
+                                     description='Compare speed and quality of FP32 and INT8 models, '
+                                                 'or the Python and ONNX Loop decoders.')
+    parser.add_argument('model_dir', help='Converted ONNX model directory.')
+    parser.add_argument('--audio-path', required=True, help='Reference audio.')
+    parser.add_argument('--audio-text', required=True, help='Transcript of the reference audio.')
+    parser.add_argument('--audio-lang', default='auto', help='Language of the reference transcript.')
+    parser.add_argument('--texts', required=True, help='Text file with one sentence per line.')
+    parser.add_argument('--lang', default='ja', help='Language of the sentences. (Default: ja)')
+    parser.add_argument('--precisions', nargs='+', default=['fp32', 'int8'], help='Precisions to compare.')
+    parser.add_argument('--repeats', type=int, default=2, help='Timed runs per sentence. (Default: 2)')
+    parser.add_argument('--mode', choices=('precision', 'decode'), default='precision',
+                        help="'precision': FP32 vs INT8. 'decode': Python loop vs ONNX Loop. (Default: precision)")
+    args = parser.parse_args(argv)
+
+    with open(args.texts, 'r', encoding='utf-8') as f:
+        texts = [line.strip() for line in f if line.strip()]
+    if not texts:
+        raise SystemExit(f"No sentences found in {args.texts}.")
+    if args.mode == 'decode':
+        rows = run_decode_benchmark(
+            model_dir=args.model_dir,
+            audio_path=args.audio_path,
+            audio_text=args.audio_text,
+            texts=texts,
+            audio_lang=args.audio_lang,
+            language=args.lang,
+            repeats=args.repeats,
+        )
+        print(_format_decode_results(rows))
+        return
+    results = run_benchmark(
+        model_dir=args.model_dir,
+        audio_path=args.audio_path,
+        audio_text=args.audio_text,
+        texts=texts,
+        audio_lang=args.audio_lang,
+        language=args.lang,
+        precisions=args.precisions,
+        repeats=args.repeats,
+    )
+    print(_format_results(results))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s', datefmt='[%X]')
+    main()
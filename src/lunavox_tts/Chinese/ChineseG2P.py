@@ -4,7 +4,9 @@ from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple
 
-from ..Japanese.SymbolsV2 import symbols_v2  # noqa: F401  # Ensure symbols_v2 is initialized
+import numpy as np
+
+from ..Japanese.SymbolsV2 import symbols_to_ids
 from ..Utils.GPTSoVITS import ensure_default_bert_env, ensure_text_on_path, find_repo_root, use_repo_cwd
 
 ensure_text_on_path()
@@ -38,30 +40,29 @@ def _load_cleaner():
         onnx_api.download_and_decompress = _download_and_decompress  # type: ignore
 
         from text.cleaner import clean_text as _clean_text  # type: ignore
-        from text import cleaned_text_to_sequence as _cleaned_text_to_sequence  # type: ignore
-    return _clean_text, _cleaned_text_to_sequence
+    return _clean_text
 
 
 def _run_cleaner(text: str):
-    clean_text_fn, sequence_fn = _load_cleaner()
+    clean_text_fn = _load_cleaner()
     with use_repo_cwd():
         phones, word2ph, norm_text = clean_text_fn(text, "zh", "v2")
     word2ph = list(map(int, word2ph or []))
-    ids = list(map(int, sequence_fn(phones, "v2")))
+    ids = symbols_to_ids(phones)
     return phones, ids, word2ph, norm_text
 
 
-def chinese_clean_and_g2p(text: str) -> Tuple[List[str], List[int], str]:
+def chinese_clean_and_g2p(text: str) -> Tuple[List[str], np.ndarray, str]:
     phones, ids, _, norm_text = _run_cleaner(text)
     return phones, ids, norm_text
 
 
-def chinese_to_phones_and_word2ph(text: str) -> Tuple[List[int], List[int]]:
+def chinese_to_phones_and_word2ph(text: str) -> Tuple[np.ndarray, List[int]]:
     _, ids, word2ph, _ = _run_cleaner(text)
     return ids, word2ph
 
 
-def chinese_clean_g2p_and_norm(text: str) -> Tuple[List[int], List[int], str]:
+def chinese_clean_g2p_and_norm(text: str) -> Tuple[np.ndarray, List[int], str]:
     _, ids, word2ph, norm_text = _run_cleaner(text)
     return ids, word2ph, norm_text
 
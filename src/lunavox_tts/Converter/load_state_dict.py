@@ -3,24 +3,70 @@ import os
 
 sys.path.append(os.path.dirname(__file__))
 
+import io
+import inspect
 import torch
-from io import BytesIO
 import utils
 
+# torch >= 2.1 支持 mmap 方式加载：张量直接映射自 checkpoint 文件，按需读入，不在内存中额外复制一份。
+_TORCH_LOAD_SUPPORTS_MMAP: bool = 'mmap' in inspect.signature(torch.load).parameters
 
-def load_sovits_model(pth_path: str, device: str = 'cpu'):
-    f = open(pth_path, "rb")
-    meta = f.read(2)
+
+class _PatchedHeaderReader(io.RawIOBase):
+    """
+    把文件开头被改写的 2 字节还原为 zip 魔数 b"PK" 的只读文件包装。
+
+    部分 .pth 的文件头被替换过，以前的做法是把整个文件读入内存再拼接一份副本；
+    这里按需从原文件读取，torch.load 解析时不需要整份文件常驻内存。
+    """
+    _MAGIC: bytes = b"PK"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._file = open(path, 'rb')
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def readinto(self, buffer) -> int:
+        position = self._file.tell()
+        n = self._file.readinto(buffer)
+        if position < len(self._MAGIC) and n:
+            patch = self._MAGIC[position:position + n]
+            memoryview(buffer)[:len(patch)] = patch
+        return n
+
+    def close(self) -> None:
+        self._file.close()
+        super().close()
+
+
+def _torch_load(f, device: str, weights_only: bool, mmap: bool):
+    if mmap and _TORCH_LOAD_SUPPORTS_MMAP and isinstance(f, str):
+        try:
+            return torch.load(f, map_location=device, weights_only=weights_only, mmap=True)
+        except RuntimeError:
+            pass  # 旧的非 zip 格式不支持 mmap，退回普通加载
+    return torch.load(f, map_location=device, weights_only=weights_only)
+
+
+def load_sovits_model(pth_path: str, device: str = 'cpu', mmap: bool = False):
+    with open(pth_path, "rb") as f:
+        meta = f.read(2)
     if meta != b"PK":
-        # noinspection PyTypeChecker
-        data = b"PK" + f.read()
-        bio = BytesIO()
-        # noinspection PyTypeChecker
-        bio.write(data)
-        bio.seek(0)
-        return torch.load(bio, map_location=device, weights_only=False)
-    return torch.load(pth_path, map_location=device, weights_only=False)
-
-
-def load_gpt_model(ckpt_path: str, device: str = 'cpu'):
-    return torch.load(ckpt_path, map_location=device, weights_only=True)
+        with io.BufferedReader(_PatchedHeaderReader(pth_path)) as reader:
+            return torch.load(reader, map_location=device, weights_only=False)
+    return _torch_load(pth_path, device, weights_only=False, mmap=mmap)
+
+
+def load_gpt_model(ckpt_path: str, device: str = 'cpu', mmap: bool = False):
+    return _torch_load(ckpt_path, device, weights_only=True, mmap=mmap)
@@ -1,6 +1,8 @@
 from .VITSConverter import VITSConverter
 from .T2SConverter import T2SModelConverter
 from .EncoderConverter import EncoderConverter
+from .Quantizer import quantize_model_dir
+from ..load_state_dict import load_gpt_model, load_sovits_model
 from ...Utils.Constants import PACKAGE_NAME
 
 import logging
@@ -47,7 +49,8 @@ def remove_folder(folder: str) -> None:
 
 def convert(torch_ckpt_path: str,
             torch_pth_path: str,
-            output_dir: str):
+            output_dir: str,
+            quantize: bool = False):
     # 确保缓存和输出目录存在
     os.makedirs(CACHE_DIR, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
@@ -68,32 +71,44 @@ def convert(torch_ckpt_path: str,
             t2s_keys_path = stack.enter_context(importlib.resources.as_file(files.joinpath(_T2S_KEYS_RESOURCE_PATH)))
             vits_keys_path = stack.enter_context(importlib.resources.as_file(files.joinpath(_VITS_KEYS_RESOURCE_PATH)))
 
-            converter_1 = T2SModelConverter(
-                torch_ckpt_path=torch_ckpt_path,
-                stage_decoder_onnx_path=str(stage_decoder_path),
-                first_stage_decoder_onnx_path=str(first_stage_decoder_path),
-                key_list_file=str(t2s_keys_path),
-                output_dir=output_dir,
-                cache_dir=CACHE_DIR,
-            )
-            converter_2 = VITSConverter(
-                torch_pth_path=torch_pth_path,
-                vits_onnx_path=str(vits_onnx_path),
-                key_list_file=str(vits_keys_path),
-                output_dir=output_dir,
-                cache_dir=CACHE_DIR,
-            )
-            converter_3 = EncoderConverter(
-                ckpt_path=torch_ckpt_path,
-                pth_path=torch_pth_path,
-                onnx_input_path=str(encoder_onnx_path),
-                output_dir=output_dir,
-            )
-
             try:
+                # 每个 checkpoint 只解析一次，三个转换器共用。支持时以 mmap 方式加载，张量按需从文件读入。
+                ckpt_data = load_gpt_model(torch_ckpt_path, mmap=True)
+                pth_data = load_sovits_model(torch_pth_path, mmap=True)
+
+                converter_1 = T2SModelConverter(
+                    torch_ckpt_path=torch_ckpt_path,
+                    stage_decoder_onnx_path=str(stage_decoder_path),
+                    first_stage_decoder_onnx_path=str(first_stage_decoder_path),
+                    key_list_file=str(t2s_keys_path),
+                    output_dir=output_dir,
+                    cache_dir=CACHE_DIR,
+                    ckpt_data=ckpt_data,
+                )
+                converter_2 = VITSConverter(
+                    torch_pth_path=torch_pth_path,
+                    vits_onnx_path=str(vits_onnx_path),
+                    key_list_file=str(vits_keys_path),
+                    output_dir=output_dir,
+                    cache_dir=CACHE_DIR,
+                    pth_data=pth_data,
+                )
+                converter_3 = EncoderConverter(
+                    ckpt_path=torch_ckpt_path,
+                    pth_path=torch_pth_path,
+                    onnx_input_path=str(encoder_onnx_path),
+                    output_dir=output_dir,
+                    ckpt_data=ckpt_data,
+                    pth_data=pth_data,
+                )
+
                 converter_1.run_full_process()
                 converter_2.run_full_process()
                 converter_3.convert()
+                # 量化前释放 checkpoint，避免与量化时载入的 fp32 模型同时占用内存。
+                del converter_1, converter_2, converter_3, ckpt_data, pth_data
+                if quantize:
+                    quantize_model_dir(output_dir)
                 logger.info(f"🎉 Conversion successful! Saved to: {os.path.abspath(output_dir)}\n")
             except Exception:
                 logger.error(f"❌ A critical error occurred during the conversion process")
@@ -1,7 +1,10 @@
 import torch
 import onnx
 import os
+import numpy as np
+from typing import Optional
 
+from .GraphSurgery import split_t2s_encoder
 from ..load_state_dict import load_gpt_model, load_sovits_model
 
 
@@ -10,6 +13,7 @@ class EncoderConverter:
     一个转换器，用于为 t2s_encoder 模型创建：
     1. 一个从 .ckpt 和 .pth 文件中合并而来的全精度 (fp32) .bin 权重文件。
     2. 一个链接到该 .bin 文件的 ONNX 模型。
+    3. 由该模型拆出的 prompt_encoder 与 text_encoder，同样链接到该 .bin 文件。
     """
 
     def __init__(self,
@@ -17,8 +21,13 @@ class EncoderConverter:
                  pth_path: str,
                  onnx_input_path: str,
                  output_dir: str,
+                 ckpt_data: Optional[dict] = None,
+                 pth_data: Optional[dict] = None,
                  ):
+        """ckpt_data / pth_data 为已加载的 checkpoint 内容；未提供时才从文件加载。"""
         self.ckpt_path: str = ckpt_path
+        self.ckpt_data: Optional[dict] = ckpt_data
+        self.pth_data: Optional[dict] = pth_data
         self.pth_path: str = pth_path
         self.onnx_input_path: str = onnx_input_path
         self.output_dir: str = output_dir
@@ -26,6 +35,8 @@ class EncoderConverter:
         # 定义最终输出文件的路径
         self.output_bin_path: str = os.path.join(self.output_dir, "t2s_encoder_fp32.bin")
         self.output_onnx_path: str = os.path.join(self.output_dir, "t2s_encoder_fp32.onnx")
+        self.prompt_encoder_onnx_path: str = os.path.join(self.output_dir, "t2s_prompt_encoder_fp32.onnx")
+        self.text_encoder_onnx_path: str = os.path.join(self.output_dir, "t2s_text_encoder_fp32.onnx")
 
         # 确保输出目录存在
         os.makedirs(self.output_dir, exist_ok=True)
@@ -48,8 +59,10 @@ class EncoderConverter:
         ]
 
         # 2. 加载所有必要的模型和权重
-        ckpt_state_dict = load_gpt_model(self.ckpt_path)['weight']
-        pth_state_dict = load_sovits_model(self.pth_path)['weight']
+        ckpt_data = self.ckpt_data if self.ckpt_data is not None else load_gpt_model(self.ckpt_path, mmap=True)
+        pth_data = self.pth_data if self.pth_data is not None else load_sovits_model(self.pth_path, mmap=True)
+        ckpt_state_dict = ckpt_data['weight']
+        pth_state_dict = pth_data['weight']
         model = onnx.load(self.onnx_input_path, load_external_data=False)
         initializer_map = {init.name: init for init in model.graph.initializer}
         current_offset = 0
@@ -78,10 +91,9 @@ class EncoderConverter:
                         f"❌ Critical error: Key '{source_key}' (corresponding to ONNX key '{onnx_key}') not found in the source file.")
 
                 # 转换为 fp32 numpy 数组并获取字节
-                numpy_array_fp32 = tensor.to(torch.float32).cpu().numpy()
-                tensor_bytes = numpy_array_fp32.tobytes()
-                tensor_length = len(tensor_bytes)
-                f_bin.write(tensor_bytes)
+                numpy_array_fp32 = np.ascontiguousarray(tensor.to(torch.float32).cpu().numpy())
+                tensor_length = numpy_array_fp32.nbytes
+                f_bin.write(memoryview(numpy_array_fp32).cast('B'))
 
                 # 在 ONNX 模型中找到对应的 initializer 并修改它
                 if onnx_key in initializer_map:
@@ -104,3 +116,6 @@ class EncoderConverter:
 
         # 4. 保存修改后的 ONNX 模型
         onnx.save(model, self.output_onnx_path)
+
+        # 5. 拆出参考音频一侧与文本一侧的子图；失败时只记录日志，加载时继续使用完整的编码器
+        split_t2s_encoder(self.output_onnx_path, self.prompt_encoder_onnx_path, self.text_encoder_onnx_path)
@@ -0,0 +1,448 @@
+"""
+转换与加载时对 ONNX 图做的结构变换：从原模型派生出可以单独缓存或一次运行完成的子图。
+
+只依赖 onnx (不依赖 torch)，转换器在转换时调用；ModelManager 加载旧版本转换器生成的模型目录时，
+也会用同样的函数补齐缺少的派生模型。派生模型中的权重继续链接原来的外部权重文件，不会复制一份。
+"""
+
+import logging
+import os
+from typing import Optional
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+logger = logging.getLogger(__name__)
+
+
+def is_up_to_date(path: str, source_path: str) -> bool:
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source_path)
+
+
+def _outer_scope_inputs(node: onnx.NodeProto) -> set[str]:
+    """节点的全部输入，包括其子图 (If / Loop / Scan) 中引用的外层张量。"""
+    names = {name for name in node.input if name}
+    for attribute in node.attribute:
+        subgraphs = [attribute.g] if attribute.type == onnx.AttributeProto.GRAPH else list(attribute.graphs)
+        for subgraph in subgraphs:
+            local = {value.name for value in subgraph.input} | {tensor.name for tensor in subgraph.initializer}
+            for sub_node in subgraph.node:
+                names |= _outer_scope_inputs(sub_node) - local
+                local.update(sub_node.output)
+    return names
+
+
+def _reference_boundary(graph: onnx.GraphProto, reference_input: str) -> list[str]:
+    """
+    找出只依赖 reference_input 的子图与图中其余部分之间的边界张量。
+    图的节点按拓扑序排列，逐个传播每个张量依赖的图输入集合即可。
+    """
+    dependencies: dict[str, frozenset[str]] = {value.name: frozenset((value.name,)) for value in graph.input}
+    reference_only = frozenset((reference_input,))
+    boundary: list[str] = []
+    for node in graph.node:
+        inputs = _outer_scope_inputs(node)
+        node_dependencies = frozenset().union(*(dependencies.get(name, frozenset()) for name in inputs))
+        for output in node.output:
+            dependencies[output] = node_dependencies
+        if node_dependencies != reference_only:
+            boundary.extend(name for name in sorted(inputs)
+                            if dependencies.get(name) == reference_only and name not in boundary)
+    boundary.extend(output.name for output in graph.output
+                    if dependencies.get(output.name) == reference_only and output.name not in boundary)
+    return boundary
+
+
+def split_t2s_encoder(encoder_path: str, prompt_encoder_path: str, text_encoder_path: str) -> bool:
+    """
+    把 t2s_encoder 拆成两个互不依赖的子图：
+        - t2s_prompt_encoder：ssl_content -> prompts（ssl_proj 投影与码本量化），只取决于参考音频；
+        - t2s_text_encoder：ref_seq / text_seq / ref_bert / text_bert -> x。
+    同一参考音频的每一句都可以复用 prompts，逐句只需运行很轻的 text_encoder。
+    两个子图继续链接原来的外部权重文件。已是最新则跳过；无法拆分时返回 False，调用方继续使用完整的编码器。
+    """
+    try:
+        if is_up_to_date(prompt_encoder_path, encoder_path) and is_up_to_date(text_encoder_path, encoder_path):
+            return True
+        # 与 split_vits 相同，不载入外部权重，子图中的权重仍指向 t2s_encoder 的 .bin。
+        model = onnx.shape_inference.infer_shapes(onnx.load(encoder_path, load_external_data=False))
+        extractor = onnx.utils.Extractor(model)
+        targets = (
+            (prompt_encoder_path, ['ssl_content'], ['prompts']),
+            (text_encoder_path, ['ref_seq', 'text_seq', 'ref_bert', 'text_bert'], ['x']),
+        )
+        for path, input_names, output_names in targets:
+            # 先写临时文件再替换，多个工作进程同时加载同一目录时不会读到写了一半的模型。
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            onnx.save(extractor.extract_model(input_names, output_names), tmp_path)
+            os.replace(tmp_path, path)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not split {encoder_path}; using the combined encoder. Details: {e}")
+        return False
+
+
+def split_vits(vits_path: str, ref_encoder_path: str, decoder_path: str) -> bool:
+    """
+    把 VITS 拆成参考编码器与解码器：
+        - vits_ref_encoder：ref_audio -> 音色条件（频谱与 ref_enc 的输出 ge 等，只取决于参考音频）；
+        - vits_decoder：text_seq / pred_semantic / 音色条件 -> 音频。
+    边界由图的依赖关系自动求出，不依赖导出时的张量命名；解码器继续链接原来的外部权重文件。
+    已是最新则跳过；无法拆分时返回 False，调用方继续使用完整的 VITS。
+    """
+    try:
+        if is_up_to_date(ref_encoder_path, vits_path) and is_up_to_date(decoder_path, vits_path):
+            return True
+        # 不载入外部权重：拆出的子图中的权重仍指向同一个 .bin，多进程共享页缓存的特性得以保留。
+        model = onnx.shape_inference.infer_shapes(onnx.load(vits_path, load_external_data=False))
+        graph_inputs = [value.name for value in model.graph.input]
+        if 'ref_audio' not in graph_inputs:
+            raise ValueError("the model has no 'ref_audio' input")
+        boundary = _reference_boundary(model.graph, 'ref_audio')
+        if not boundary:
+            raise ValueError("no reference-only subgraph was found")
+        extractor = onnx.utils.Extractor(model)
+        other_inputs = [name for name in graph_inputs if name != 'ref_audio']
+        outputs = [value.name for value in model.graph.output]
+        for path, split_model in ((ref_encoder_path, extractor.extract_model(['ref_audio'], boundary)),
+                                  (decoder_path, extractor.extract_model(other_inputs + boundary, outputs))):
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            onnx.save(split_model, tmp_path)
+            os.replace(tmp_path, path)
+        logger.info(f"Split {os.path.basename(vits_path)} into a reference encoder ({', '.join(boundary)}) "
+                    f"and a decoder.")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not split {vits_path}; using the full vocoder. Details: {e}")
+        return False
+
+
+def _loop_state_pairs(input_names: list[str], output_names: list[str]) -> list[tuple[str, str]]:
+    """stage decoder 中逐步传递的 (输入, 输出) 对：iy -> y、ik -> k、past_k_layer_0 -> present_k_layer_0 等。"""
+    pairs: list[tuple[str, str]] = []
+    for name in input_names:
+        if name.startswith('past_') and 'present_' + name[len('past_'):] in output_names:
+            pairs.append((name, 'present_' + name[len('past_'):]))
+        elif name.startswith('i') and name[1:] in output_names:
+            pairs.append((name, name[1:]))
+    return pairs
+
+
+def build_stage_decoder_loop(stage_path: str, loop_path: str) -> bool:
+    """
+    把 stage decoder 包装成一个 ONNX Loop：整段自回归解码在一次 run 中完成，省去每一步的
+    Python 调度、feed 构造、run 调用与输出物化。
+
+    新图的输入与 stage decoder 相同，另加标量 max_steps；y / y_emb / KV 缓存作为循环变量，
+    其余输入 (如 ix_example) 与全部权重留在外层图中由循环体引用，权重仍链接原来的外部文件。
+    循环体在采样到 EOS (samples，或 y 的最后一个 token >= 1024) 后终止，与 Python 循环的判定一致。
+    已是最新则跳过；无法构建时返回 False。
+    """
+    try:
+        if is_up_to_date(loop_path, stage_path):
+            return True
+        model = onnx.load(stage_path, load_external_data=False)
+        graph = model.graph
+        input_names = [value.name for value in graph.input]
+        output_names = [value.name for value in graph.output]
+        pairs = _loop_state_pairs(input_names, output_names)
+        if 'y' not in output_names or not any(output == 'y' for _, output in pairs):
+            raise ValueError(f"unsupported stage decoder interface: {input_names} -> {output_names}")
+        stop_source = 'samples' if 'samples' in output_names else 'y'
+
+        # 循环体内的张量统一加前缀，避免与外层图同名；权重与非循环输入保持原名，从外层作用域引用。
+        prefix = 'step/'
+        renamed: dict[str, str] = {input_name: prefix + input_name for input_name, _ in pairs}
+        for node in graph.node:
+            for output in node.output:
+                if output:
+                    renamed[output] = prefix + output
+        body_nodes = []
+        for node in graph.node:
+            body_node = onnx.NodeProto()
+            body_node.CopyFrom(node)
+            body_node.input[:] = [renamed.get(name, name) for name in node.input]
+            body_node.output[:] = [renamed.get(name, name) for name in node.output]
+            body_nodes.append(body_node)
+
+        # 终止条件：cond = 最新 token < 1024
+        body_nodes += [
+            helper.make_node('Reshape', [renamed[stop_source], 'loop/flat_shape'], ['loop/flat_tokens']),
+            helper.make_node('Gather', ['loop/flat_tokens', 'loop/last_index'], ['loop/last_token'], axis=0),
+            helper.make_node('Cast', ['loop/last_token'], ['loop/last_token_i64'], to=TensorProto.INT64),
+            helper.make_node('Less', ['loop/last_token_i64', 'loop/eos_threshold'], ['loop/cond_out']),
+        ]
+        value_types = {value.name: value.type.tensor_type.elem_type for value in list(graph.input) + list(graph.output)}
+        body = helper.make_graph(
+            body_nodes, 'stage_decoder_step',
+            [helper.make_tensor_value_info('loop/iteration', TensorProto.INT64, []),
+             helper.make_tensor_value_info('loop/cond_in', TensorProto.BOOL, [])]
+            + [helper.make_tensor_value_info(prefix + input_name, value_types[input_name], None)
+               for input_name, _ in pairs],
+            [helper.make_tensor_value_info('loop/cond_out', TensorProto.BOOL, [])]
+            + [helper.make_tensor_value_info(renamed[output], value_types[output], None) for _, output in pairs],
+        )
+
+        loop_outputs = [output for _, output in pairs]
+        loop_node = helper.make_node('Loop', ['max_steps', 'loop/cond_init'] + [i for i, _ in pairs], loop_outputs,
+                                     body=body)
+        initializers = list(graph.initializer) + [
+            helper.make_tensor('loop/cond_init', TensorProto.BOOL, [], [True]),
+            helper.make_tensor('loop/flat_shape', TensorProto.INT64, [1], [-1]),
+            helper.make_tensor('loop/last_index', TensorProto.INT64, [], [-1]),
+            helper.make_tensor('loop/eos_threshold', TensorProto.INT64, [], [1024]),
+        ]
+        loop_graph = helper.make_graph(
+            [loop_node], 'stage_decoder_loop',
+            list(graph.input) + [helper.make_tensor_value_info('max_steps', TensorProto.INT64, [])],
+            [helper.make_tensor_value_info(output, value_types[output], None) for output in loop_outputs],
+            initializers,
+        )
+        loop_model = helper.make_model(loop_graph, opset_imports=model.opset_import)
+        loop_model.ir_version = model.ir_version
+        loop_model.functions.extend(model.functions)
+        tmp_path = f'{loop_path}.{os.getpid()}.tmp'
+        onnx.save(loop_model, tmp_path)
+        os.replace(tmp_path, loop_path)
+        logger.info(f"Built single-graph decoder {os.path.basename(loop_path)} ({len(pairs)} loop-carried tensors).")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not build the ONNX Loop decoder from {stage_path}. Details: {e}")
+        return False
+
+
+KV_POSITION_INPUT: str = 'kv_pos'
+KV_CAPACITY_DIM: str = 'kv_capacity'
+
+
+def _constant_ints(graph: onnx.GraphProto, name: str) -> Optional[list[int]]:
+    for tensor in graph.initializer:
+        if tensor.name == name:
+            return [int(value) for value in numpy_helper.to_array(tensor).reshape(-1)]
+    for node in graph.node:
+        if node.op_type == 'Constant' and node.output[0] == name:
+            return [int(value) for value in numpy_helper.to_array(node.attribute[0].t).reshape(-1)]
+    return None
+
+
+def _layer_of(graph: onnx.GraphProto, chain: list[onnx.NodeProto], tensor: str) -> int:
+    """
+    聚合的 KV 缓存 (ik / iv，第 0 维为层) 经 chain 得到 tensor 时，返回 tensor 对应的层号。
+    只支持 Gather(常量下标, axis=0)，以及 Split(axis=0) 的第 l 个输出 (其后可以跟 Squeeze(axes=[0]))。
+    """
+    chain = [node for node in chain if node.op_type != 'Identity']
+    if len(chain) == 2 and chain[0].op_type == 'Split' and chain[1].op_type == 'Squeeze':
+        axes = next((list(a.ints) for a in chain[1].attribute if a.name == 'axes'), None)
+        if axes is None and len(chain[1].input) > 1:
+            axes = _constant_ints(graph, chain[1].input[1])
+        if axes != [0]:
+            raise ValueError(f"unsupported view of the KV cache before {tensor}")
+        tensor = chain[1].input[0]
+        chain = chain[:1]
+    if len(chain) != 1 or chain[0].op_type not in ('Gather', 'Split'):
+        raise ValueError(f"unsupported view of the KV cache before {tensor}")
+    node = chain[0]
+    if next((a.i for a in node.attribute if a.name == 'axis'), 0) != 0:
+        raise ValueError(f"the KV cache before {tensor} is not indexed by layer")
+    if node.op_type == 'Split':
+        return list(node.output).index(tensor)
+    indices = _constant_ints(graph, node.input[1])
+    if indices is None or len(indices) != 1:
+        raise ValueError(f"{node.name or node.op_type}: only a constant scalar layer index is supported")
+    return indices[0]
+
+
+def _prune_dead_nodes(graph: onnx.GraphProto) -> None:
+    """删除输出既不是图输出、也不被其他节点使用的节点，以及不再被引用的权重。"""
+    while True:
+        used = {output.name for output in graph.output}
+        for node in graph.node:
+            used.update(_outer_scope_inputs(node))
+        alive = [node for node in graph.node if any(output in used for output in node.output)]
+        if len(alive) == len(graph.node):
+            break
+        del graph.node[:]
+        graph.node.extend(alive)
+    kept = [tensor for tensor in graph.initializer if tensor.name in used]
+    del graph.initializer[:]
+    graph.initializer.extend(kept)
+
+
+def build_static_kv_decoder(stage_path: str, static_path: str) -> bool:
+    """
+    由 stage decoder 派生固定容量 KV 缓存的版本：每一步不再把新的 K/V 拼接到缓存之后 (形状逐步增长、
+    整个缓存被复制到新分配的内存中)，而是写入预先分配的缓冲区的 kv_pos 处。
+
+    - 每层的 K / V 缓存是单独的输入 past_{k|v}_layer_{l}，序列维为 kv_capacity；对应的输出
+      present_{k|v}_layer_{l} 直接由写入节点 (ScatterElements) 产生。调用方把输出绑定到输入的同一块内存
+      (IOBinding) 时，写入就地完成，每步只写入一个位置，不再复制整个缓存；
+    - 新增标量输入 kv_pos (int64)：本步 K/V 的写入位置，即缓冲区中已有的有效长度；
+    - 每层注意力在 Softmax 之前加上掩码，kv_pos 之后尚未写入的位置不参与注意力。
+    缓冲区容量由调用方决定 (见 LunaVoxEngine.t2s_cpu)。权重仍链接原来的外部文件。
+    KV 缓存的用法不是 "按层取出 -> Concat(缓存, 新 K/V)" 时无法改写，返回 False，调用方继续使用原来的 stage decoder。
+    """
+    try:
+        if is_up_to_date(static_path, stage_path):
+            return True
+        model = onnx.shape_inference.infer_shapes(onnx.load(stage_path, load_external_data=False))
+        graph = model.graph
+        value_types = {value.name: value.type.tensor_type
+                       for value in list(graph.input) + list(graph.value_info) + list(graph.output)}
+        consumers: dict[str, list[onnx.NodeProto]] = {}
+        for node in graph.node:
+            for name in node.input:
+                consumers.setdefault(name, []).append(node)
+
+        def rank_of(name: str) -> int:
+            tensor_type = value_types.get(name)
+            if tensor_type is None or not tensor_type.HasField('shape'):
+                raise ValueError(f"the rank of {name} is unknown")
+            return len(tensor_type.shape.dim)
+
+        # 1. 找出每层 K / V 缓存与新 K/V 的 Concat。
+        input_names = [value.name for value in graph.input]
+        output_names = [value.name for value in graph.output]
+        cache_pairs = [(i, o) for i, o in _loop_state_pairs(input_names, output_names)
+                       if i in ('ik', 'iv') or i.startswith('past_k_') or i.startswith('past_v_')]
+        if not cache_pairs:
+            raise ValueError("the stage decoder has no KV cache inputs")
+        writes: dict[str, tuple[onnx.NodeProto, int, str]] = {}  # 新输入名 -> (Concat, 序列维, 缓存视图)
+        for cache_input, _ in cache_pairs:
+            kind = 'k' if cache_input == 'ik' or cache_input.startswith('past_k_') else 'v'
+            stack: list[tuple[str, list[onnx.NodeProto]]] = [(cache_input, [])]
+            while stack:
+                name, chain = stack.pop()
+                for node in consumers.get(name, []):
+                    if node.op_type in ('Identity', 'Gather', 'Split', 'Squeeze') and node.input[0] == name:
+                        stack.extend((output, chain + [node]) for output in node.output)
+                    elif node.op_type == 'Concat' and len(node.input) == 2 and node.input[0] == name:
+                        if cache_input in ('ik', 'iv'):
+                            layer = _layer_of(graph, chain, name)
+                        elif any(view.op_type != 'Identity' for view in chain):
+                            raise ValueError(f"unsupported view of {cache_input} before the Concat")
+                        else:
+                            layer = int(cache_input.rsplit('_', 1)[-1])
+                        new_input = f'past_{kind}_layer_{layer}'
+                        if new_input in writes:
+                            raise ValueError(f"layer {layer} writes its {kind.upper()} cache more than once")
+                        axis = next(a.i for a in node.attribute if a.name == 'axis') % rank_of(node.output[0])
+                        writes[new_input] = (node, axis, name)
+                    else:
+                        raise ValueError(f"{cache_input} is used by {node.op_type}, not only by a Concat")
+        layers = {name.rsplit('_', 1)[-1] for name in writes}
+        if len(writes) != 2 * len(layers):
+            raise ValueError("every layer must have both a K and a V cache")
+
+        # 2. Concat(缓存, 新 K/V) -> ScatterElements(缓冲区, kv_pos, 新 K/V)，输出即 present_{k|v}_layer_{l}。
+        replaced: dict[int, list[onnx.NodeProto]] = {}
+        renamed: dict[str, str] = {}
+        new_inputs: list[onnx.ValueInfoProto] = []
+        new_outputs: list[onnx.ValueInfoProto] = []
+        for index, (new_input, (node, axis, view)) in enumerate(sorted(writes.items())):
+            update = node.input[1]
+            present = 'present_' + new_input[len('past_'):]
+            prefix = f'static_kv/{index}/'
+            replaced[id(node)] = [
+                helper.make_node('Shape', [update], [prefix + 'update_shape']),
+                helper.make_node('Expand', [KV_POSITION_INPUT, prefix + 'update_shape'], [prefix + 'indices']),
+                helper.make_node('ScatterElements', [new_input, prefix + 'indices', update], [present], axis=axis),
+            ]
+            renamed[node.output[0]] = present
+            buffer_type = onnx.TypeProto()
+            buffer_type.tensor_type.CopyFrom(value_types[view])
+            buffer_type.tensor_type.shape.dim[axis].dim_param = KV_CAPACITY_DIM
+            new_inputs.append(helper.make_value_info(new_input, buffer_type))
+            new_outputs.append(helper.make_tensor_value_info(present, buffer_type.tensor_type.elem_type, None))
+
+        # 3. 每个 K 向下游找到的第一个 Softmax 即该层的注意力；在其输入上加掩码。
+        softmax_nodes: dict[int, onnx.NodeProto] = {}
+        for new_input, (node, _, _) in writes.items():
+            if not new_input.startswith('past_k_'):
+                continue
+            found: list[onnx.NodeProto] = []
+            frontier, seen = [node.output[0]], set()
+            while frontier:
+                name = frontier.pop()
+                for consumer in consumers.get(name, []):
+                    if id(consumer) in seen:
+                        continue
+                    seen.add(id(consumer))
+                    if consumer.op_type == 'Softmax':
+                        found.append(consumer)
+                    else:
+                        frontier.extend(consumer.output)
+            if len(found) != 1:
+                raise ValueError(f"expected one attention Softmax after {node.output[0]}, found {len(found)}")
+            softmax_nodes[id(found[0])] = found[0]
+
+        opset = next((o.version for o in model.opset_import if o.domain in ('', 'ai.onnx')), 0)
+        reference_input = sorted(writes)[0]
+        mask_nodes = [
+            helper.make_node('Shape', [reference_input], ['static_kv/buffer_shape']),
+            helper.make_node('Gather', ['static_kv/buffer_shape', 'static_kv/seq_axis'], ['static_kv/capacity']),
+            helper.make_node('Range', ['static_kv/zero', 'static_kv/capacity', 'static_kv/one'],
+                             ['static_kv/positions']),
+            helper.make_node('Greater', ['static_kv/positions', KV_POSITION_INPUT], ['static_kv/unwritten']),
+        ]
+        initializers = [
+            helper.make_tensor('static_kv/seq_axis', TensorProto.INT64, [], [writes[reference_input][1]]),
+            helper.make_tensor('static_kv/zero', TensorProto.INT64, [], [0]),
+            helper.make_tensor('static_kv/one', TensorProto.INT64, [], [1]),
+        ]
+        masks: dict[int, str] = {}  # 按数据类型各生成一份掩码
+        for node in softmax_nodes.values():
+            axis = next((a.i for a in node.attribute if a.name == 'axis'), -1 if opset >= 13 else 1)
+            scores = node.input[0]
+            if axis not in (-1, rank_of(scores) - 1):
+                raise ValueError(f"the attention Softmax normalizes over axis {axis}, not the key axis")
+            elem_type = value_types[scores].elem_type if scores in value_types else TensorProto.FLOAT
+            if elem_type not in (TensorProto.FLOAT, TensorProto.FLOAT16, TensorProto.DOUBLE):
+                raise ValueError(f"unsupported attention score type {TensorProto.DataType.Name(elem_type)}")
+            if elem_type not in masks:
+                masks[elem_type] = f'static_kv/mask_{elem_type}'
+                dtype = helper.tensor_dtype_to_np_dtype(elem_type)
+                initializers += [
+                    numpy_helper.from_array(np.array(-np.inf, dtype=dtype), f'static_kv/neg_inf_{elem_type}'),
+                    numpy_helper.from_array(np.array(0, dtype=dtype), f'static_kv/no_mask_{elem_type}'),
+                ]
+                mask_nodes.append(helper.make_node(
+                    'Where', ['static_kv/unwritten', f'static_kv/neg_inf_{elem_type}', f'static_kv/no_mask_{elem_type}'],
+                    [masks[elem_type]]))
+            masked = scores + '/static_kv_masked'
+            replaced[id(node)] = [helper.make_node('Add', [scores, masks[elem_type]], [masked]), node]
+            node.input[0] = masked
+
+        # 4. 重新组装：原来的 KV 缓存输入输出及只为它们服务的节点 (按层取出、按层拼回) 都被删除。
+        new_nodes: list[onnx.NodeProto] = list(mask_nodes)
+        for node in graph.node:
+            new_nodes.extend(replaced.get(id(node), [node]))
+        for node in new_nodes:
+            node.input[:] = [renamed.get(name, name) for name in node.input]
+        present_names = {value.name for value in new_outputs}
+        for node in new_nodes:  # 原图中同名的 present_* 输出 (如 Identity 产生的) 让位于写入节点的输出
+            if node.op_type != 'ScatterElements' or node.output[0] not in present_names:
+                node.output[:] = [name + '/replaced' if name in present_names else name for name in node.output]
+        del graph.node[:]
+        graph.node.extend(new_nodes)
+        graph.initializer.extend(initializers)
+        cache_names = {name for pair in cache_pairs for name in pair}
+        kept_inputs = [value for value in graph.input if value.name not in cache_names]
+        kept_outputs = [value for value in graph.output if value.name not in cache_names]
+        del graph.input[:], graph.output[:], graph.value_info[:]
+        graph.input.extend(kept_inputs + new_inputs
+                           + [helper.make_tensor_value_info(KV_POSITION_INPUT, TensorProto.INT64, [])])
+        graph.output.extend(kept_outputs + new_outputs)
+        for output in graph.output:
+            output.type.tensor_type.ClearField('shape')
+        _prune_dead_nodes(graph)
+
+        tmp_path = f'{static_path}.{os.getpid()}.tmp'
+        onnx.save(model, tmp_path)
+        os.replace(tmp_path, static_path)
+        logger.info(f"Built fixed-capacity KV decoder {os.path.basename(static_path)} "
+                    f"({len(layers)} layers, {len(softmax_nodes)} masked attentions).")
+        return True
+    except Exception as e:
+        logger.warning(f"Could not build the fixed-capacity KV decoder from {stage_path}. Details: {e}")
+        return False
@@ -0,0 +1,63 @@
+import logging
+import os
+
+import onnx
+
+from ...ModelManager import _GSVModelFile, convert_bins_to_fp32
+
+logger = logging.getLogger(__name__)
+
+# (FP32 模型, INT8 模型)。编码器只有 Embedding / Gather 和很小的投影，量化收益可以忽略，保持 FP32。
+QUANTIZED_MODEL_PAIRS: tuple[tuple[str, str], ...] = (
+    (_GSVModelFile.T2S_FIRST_STAGE_DECODER, _GSVModelFile.T2S_FIRST_STAGE_DECODER_INT8),
+    (_GSVModelFile.T2S_STAGE_DECODER, _GSVModelFile.T2S_STAGE_DECODER_INT8),
+    (_GSVModelFile.VITS, _GSVModelFile.VITS_INT8),
+)
+# 只量化带常量权重的 MatMul / Gemm。卷积 (HiFi-GAN 上采样部分) 保持 FP32，否则音质下降明显。
+_OP_TYPES_TO_QUANTIZE: list[str] = ['MatMul', 'Gemm']
+
+
+def quantize_model_dir(model_dir: str, per_channel: bool = False, overwrite: bool = False) -> list[str]:
+    """
+    对已转换好的模型目录做动态 INT8 量化，生成 *_int8.onnx（权重内嵌，不依赖 .bin 文件）。
+
+    权重按 int8 离线量化，激活值在运行时动态量化。注意力中两个输入都是激活值的 MatMul
+    (QK^T、AV) 不做量化 (MatMulConstBOnly)，只有线性层走整数乘法。
+    返回新生成的文件路径列表；已存在的 INT8 模型除非 overwrite 为 True 否则跳过。
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # 外部权重以 fp32 .bin 的布局链接，量化前需要先还原出来。
+    generated_bins: list[str] = [
+        os.path.join(model_dir, name)
+        for name in (_GSVModelFile.T2S_DECODER_WEIGHT_FP32, _GSVModelFile.VITS_WEIGHT_FP32)
+        if not os.path.exists(os.path.join(model_dir, name))
+    ]
+    convert_bins_to_fp32(model_dir)
+
+    created: list[str] = []
+    try:
+        for fp32_name, int8_name in QUANTIZED_MODEL_PAIRS:
+            fp32_path = os.path.join(model_dir, fp32_name)
+            int8_path = os.path.join(model_dir, int8_name)
+            if os.path.exists(int8_path) and not overwrite:
+                logger.info(f"INT8 model already exists, skipping: {int8_path}")
+                continue
+            model = onnx.load(fp32_path)  # 连同外部权重一起载入
+            quantize_dynamic(
+                model,
+                int8_path,
+                op_types_to_quantize=_OP_TYPES_TO_QUANTIZE,
+                per_channel=per_channel,
+                weight_type=QuantType.QInt8,
+                extra_options={'MatMulConstBOnly': True},
+            )
+            created.append(int8_path)
+            logger.info(f"Quantized {fp32_name} -> {int8_name} "
+                        f"({os.path.getsize(int8_path) / (1 << 20):.1f} MiB)")
+    finally:
+        # 只删除本函数临时还原的 fp32 权重，模型目录保持只分发 fp16 的状态。
+        for path in generated_bins:
+            if os.path.exists(path):
+                os.remove(path)
+    return created
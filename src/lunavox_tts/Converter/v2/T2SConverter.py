@@ -4,8 +4,11 @@ import numpy as np
 import json
 import os
 from collections import OrderedDict
+from typing import Optional
 
+from .GraphSurgery import build_stage_decoder_loop, build_static_kv_decoder
 from ..load_state_dict import load_gpt_model
+from ...ModelManager import convert_bin_to_fp32
 
 
 class T2SModelConverter:
@@ -23,8 +26,11 @@ class T2SModelConverter:
                  key_list_file: str,
                  output_dir: str,
                  cache_dir: str,
+                 ckpt_data: Optional[dict] = None,
                  ):
+        """ckpt_data 为已加载的 .ckpt 内容；由 Converter.convert 传入，与其它转换器共用同一份。"""
         self.torch_ckpt_path: str = torch_ckpt_path
+        self.ckpt_data: Optional[dict] = ckpt_data
         self.stage_decoder_onnx_path: str = stage_decoder_onnx_path
         self.first_stage_decoder_onnx_path: str = first_stage_decoder_onnx_path
         self.key_list_file: str = key_list_file
@@ -41,6 +47,8 @@ class T2SModelConverter:
         self.relinked_stage_decoder_path: str = os.path.join(self.output_dir, "t2s_stage_decoder_fp32.onnx")
         self.relinked_first_stage_decoder_path: str = os.path.join(self.output_dir, "t2s_first_stage_decoder_fp32.onnx")
         self.reconstructed_fp32_bin_path = os.path.join(self.output_dir, "t2s_shared_fp32.bin")
+        self.loop_decoder_path: str = os.path.join(self.output_dir, "t2s_stage_decoder_loop_fp32.onnx")
+        self.static_kv_decoder_path: str = os.path.join(self.output_dir, "t2s_stage_decoder_static_fp32.onnx")
 
     def step1_create_fp16_bin_with_key_mapping(self):
         """
@@ -54,7 +62,7 @@ class T2SModelConverter:
         with open(self.key_list_file, 'r') as f:
             onnx_keys = [line.strip() for line in f.readlines()]
 
-        ckpt_data = load_gpt_model(self.torch_ckpt_path)
+        ckpt_data = self.ckpt_data if self.ckpt_data is not None else load_gpt_model(self.torch_ckpt_path, mmap=True)
         if 'weight' not in ckpt_data:
             raise KeyError(
                 f"❌ Error: 'weight' key not found in the .ckpt file. Top-level keys in the file are: {list(ckpt_data.keys())}")
@@ -69,8 +77,11 @@ class T2SModelConverter:
                 transformed_onnx_key = onnx_key.replace('transformer_encoder', 'h')
                 torch_lookup_key = f"model.{transformed_onnx_key}"
                 torch_tensor = torch_state_dict.get(torch_lookup_key)
-                numpy_array_fp16 = torch_tensor.to(torch.float16).cpu().numpy()
-                f_bin.write(numpy_array_fp16.tobytes())
+                if torch_tensor is None:
+                    raise ValueError(f"❌ Critical error: Key '{torch_lookup_key}' not found in the PyTorch weights")
+                # 逐个张量转换并直接写出，内存中同一时间只多出一个张量的 fp16 副本。
+                numpy_array_fp16 = np.ascontiguousarray(torch_tensor.to(torch.float16).cpu().numpy())
+                f_bin.write(memoryview(numpy_array_fp16).cast('B'))
                 tensor_length_fp32 = numpy_array_fp16.nbytes * 2
                 index_table[onnx_key] = {'offset': current_fp32_offset, 'length': tensor_length_fp32}
                 current_fp32_offset += tensor_length_fp32
@@ -115,11 +126,25 @@ class T2SModelConverter:
         """
         (3) 静态工具函数：从半精度 .bin 文件还原出全精度 .bin 文件。
         """
-        fp16_array = np.fromfile(fp16_bin_path, dtype=np.float16)
-        fp32_array = fp16_array.astype(np.float32)
-        fp32_array.tofile(output_fp32_bin_path)
+        convert_bin_to_fp32(fp16_bin_path, output_fp32_bin_path)
+
+    def step4_build_loop_decoder(self):
+        """
+        (4) 把重链接后的 stage decoder 包进一个 ONNX Loop，生成单图自回归解码模型。
+            与 stage decoder 共用同一个 .bin，只额外写出很小的图文件。
+        """
+        build_stage_decoder_loop(self.relinked_stage_decoder_path, self.loop_decoder_path)
+
+    def step5_build_static_kv_decoder(self):
+        """
+        (5) 生成 KV 缓存写入固定容量缓冲区的 stage decoder (T2S_Decode_Mode=static 时使用)。
+            同样与 stage decoder 共用 .bin。
+        """
+        build_static_kv_decoder(self.relinked_stage_decoder_path, self.static_kv_decoder_path)
 
     def run_full_process(self):
         self.step1_create_fp16_bin_with_key_mapping()
         self.step2_relink_onnx_for_fp32(self.stage_decoder_onnx_path, self.relinked_stage_decoder_path)
         self.step2_relink_onnx_for_fp32(self.first_stage_decoder_onnx_path, self.relinked_first_stage_decoder_path)
+        self.step4_build_loop_decoder()
+        self.step5_build_static_kv_decoder()
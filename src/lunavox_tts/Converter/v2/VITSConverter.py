@@ -4,8 +4,11 @@ import numpy as np
 import json
 import os
 from collections import OrderedDict
+from typing import Optional
 
+from .GraphSurgery import split_vits
 from ..load_state_dict import load_sovits_model
+from ...ModelManager import convert_bin_to_fp32
 
 
 class VITSConverter:
@@ -14,6 +17,7 @@ class VITSConverter:
     1. 一个用于分发的半精度 (fp16) .bin 权重文件。
     2. 一个与全精度 (fp32) 布局兼容的 ONNX 模型。
     3. 一个可以将 fp16 .bin 文件还原为 fp32 .bin 的工具函数。
+    4. 由 fp32 ONNX 模型拆出的参考编码器与解码器，两者链接同一个 fp32 .bin 文件。
     """
 
     def __init__(self,
@@ -22,8 +26,11 @@ class VITSConverter:
                  key_list_file: str,
                  output_dir: str,
                  cache_dir: str,
+                 pth_data: Optional[dict] = None,
                  ):
+        """pth_data 为已加载的 .pth 内容；由 Converter.convert 传入，与其它转换器共用同一份。"""
         self.torch_pth_path: str = torch_pth_path
+        self.pth_data: Optional[dict] = pth_data
         self.vits_onnx_path: str = vits_onnx_path
         self.key_list_file: str = key_list_file
         self.output_dir: str = output_dir
@@ -33,6 +40,8 @@ class VITSConverter:
         self.index_table_path: str = os.path.join(self.cache_dir, "vits_weights_index_fp32.json")
         self.relinked_fp32_onnx_path: str = os.path.join(self.output_dir, "vits_fp32.onnx")
         self.reconstructed_fp32_bin_path: str = os.path.join(self.output_dir, "vits_fp32.bin")
+        self.ref_encoder_onnx_path: str = os.path.join(self.output_dir, "vits_ref_encoder_fp32.onnx")
+        self.decoder_onnx_path: str = os.path.join(self.output_dir, "vits_decoder_fp32.onnx")
 
         # 确保输出目录存在
         os.makedirs(self.cache_dir, exist_ok=True)
@@ -51,7 +60,8 @@ class VITSConverter:
             onnx_keys = [line.strip() for line in f.readlines()]
 
         # 加载 PyTorch 模型权重
-        torch_state_dict = load_sovits_model(self.torch_pth_path)['weight']
+        pth_data = self.pth_data if self.pth_data is not None else load_sovits_model(self.torch_pth_path, mmap=True)
+        torch_state_dict = pth_data['weight']
 
         index_table = OrderedDict()
         current_fp32_offset = 0
@@ -64,12 +74,10 @@ class VITSConverter:
                 if torch_tensor is None:
                     raise ValueError(f"❌ Critical error: Key '{torch_key}' not found in the PyTorch weights")
 
-                # 转换为 fp16 并写入文件
-                torch_tensor_fp16 = torch_tensor.to(torch.float16)
-                numpy_array_fp16 = torch_tensor_fp16.cpu().numpy()
-                tensor_bytes_fp16 = numpy_array_fp16.tobytes()
-                f_bin.write(tensor_bytes_fp16)
-                tensor_length_fp32 = len(tensor_bytes_fp16) * 2
+                # 转换为 fp16 并直接写入文件，不再经过 tobytes() 复制
+                numpy_array_fp16 = np.ascontiguousarray(torch_tensor.to(torch.float16).cpu().numpy())
+                f_bin.write(memoryview(numpy_array_fp16).cast('B'))
+                tensor_length_fp32 = numpy_array_fp16.nbytes * 2
                 index_table[onnx_key] = {
                     'offset': current_fp32_offset,
                     'length': tensor_length_fp32
@@ -120,10 +128,16 @@ class VITSConverter:
             fp16_bin_path (str): 输入的半精度 .bin 文件路径。
             output_fp32_bin_path (str): 输出的全精度 .bin 文件路径。
         """
-        fp16_array = np.fromfile(fp16_bin_path, dtype=np.float16)
-        fp32_array = fp16_array.astype(np.float32)
-        fp32_array.tofile(output_fp32_bin_path)
+        convert_bin_to_fp32(fp16_bin_path, output_fp32_bin_path)
+
+    def step4_split_ref_encoder(self):
+        """
+        (4) 把 fp32 ONNX 模型拆成参考编码器与解码器，使参考音频的音色条件可以单独计算并缓存。
+            无法拆分时只记录日志，加载时继续使用完整的模型。
+        """
+        split_vits(self.relinked_fp32_onnx_path, self.ref_encoder_onnx_path, self.decoder_onnx_path)
 
     def run_full_process(self):
         self.step1_create_fp16_bin_and_fp32_index()
         self.step2_relink_onnx_for_fp32()
+        self.step4_split_ref_encoder()
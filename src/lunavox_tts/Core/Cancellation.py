@@ -0,0 +1,41 @@
+import threading
+import uuid
+from typing import Callable, Optional
+
+
+class CancellationToken:
+    """
+    单个请求的取消令牌。
+
+    与全局的 tts_client.stop_event 不同，取消一个令牌只会中止持有它的请求，
+    推理循环与声码器阶段都会检查它。
+    """
+
+    def __init__(self, request_id: Optional[str] = None):
+        self.request_id: str = request_id or uuid.uuid4().hex
+        self._event: threading.Event = threading.Event()
+        self._lock: threading.Lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """注册取消时调用的回调（用于中止无法逐步检查令牌的单次长时间运行）。已取消时立即调用。"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
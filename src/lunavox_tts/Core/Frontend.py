@@ -0,0 +1,147 @@
+"""
+文本前端：(text, language) -> 音素 id、word2ph、规范化文本。
+
+G2P 大部分是纯 Python 代码 (jieba_fast 分词、ToneSandhi、en_normalization、g2p_en 查表、日文标签解析)，
+运行时一直持有 GIL，放在多个线程里并不会并行。设置环境变量 Frontend_Workers > 0 (或调用 frontend_pool.start())
+后，G2P 改在常驻的工作进程中运行：每个进程启动时预先加载各语言的词典与模型，结果写入共享内存返回
+(int64 音素 id、int32 word2ph、UTF-8 文本)，主进程只做一次拷贝。
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+
+from ..Chinese.ChineseG2P import chinese_clean_g2p_and_norm
+from ..English.EnglishG2P import english_to_phones
+from ..Japanese.JapaneseG2P import japanese_to_phones
+
+logger = logging.getLogger(__name__)
+
+# 前端工作进程数，0 表示在调用线程中直接运行 G2P。
+FRONTEND_WORKERS: int = int(os.getenv('Frontend_Workers', '0'))
+# 工作进程启动时各语言的预热文本：首次调用会加载词典 / 分词器 / 模型。
+_WARMUP_TEXTS: dict[str, str] = {
+    'ja': 'こんにちは。',
+    'en': 'Hello.',
+    'zh': '你好。',
+}
+
+
+def g2p(text: str, language: str) -> tuple[np.ndarray, list[int], str]:
+    """在当前进程中运行 G2P。返回 (int64 音素 id, word2ph, 规范化文本)；后两者只有中文才有。"""
+    if language == 'en':
+        return english_to_phones(text), [], ''
+    if language == 'zh':
+        ids, word2ph, norm_text = chinese_clean_g2p_and_norm(text)
+        return ids, list(word2ph), norm_text
+    return japanese_to_phones(text), [], ''
+
+
+def _init_worker(languages: tuple[str, ...]) -> None:
+    for language in languages:
+        try:
+            g2p(_WARMUP_TEXTS[language], language)
+        except Exception as e:
+            # 缺少某种语言的依赖时只影响该语言，实际请求会把错误带回主进程。
+            logger.warning(f"Frontend worker {os.getpid()} failed to preload '{language}': {e}")
+
+
+def _g2p_task(text: str, language: str) -> tuple[str, int, int, int]:
+    """在工作进程中运行 G2P，结果按 [ids int64][word2ph int32][文本 UTF-8] 写入一块新的共享内存。"""
+    ids, word2ph, norm_text = g2p(text, language)
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    text_bytes = norm_text.encode('utf-8')
+    word2ph_offset = ids.nbytes
+    text_offset = word2ph_offset + 4 * len(word2ph)
+    block = shared_memory.SharedMemory(create=True, size=max(1, text_offset + len(text_bytes)))
+    try:
+        np.ndarray(ids.shape, dtype=np.int64, buffer=block.buf)[:] = ids
+        np.ndarray((len(word2ph),), dtype=np.int32, buffer=block.buf, offset=word2ph_offset)[:] = word2ph
+        block.buf[text_offset:text_offset + len(text_bytes)] = text_bytes
+    finally:
+        block.close()  # 由主进程读取后 unlink
+    return block.name, ids.shape[0], len(word2ph), len(text_bytes)
+
+
+def _read_result(name: str, n_ids: int, n_word2ph: int, n_text_bytes: int) -> tuple[np.ndarray, list[int], str]:
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        word2ph_offset = 8 * n_ids
+        text_offset = word2ph_offset + 4 * n_word2ph
+        ids = np.ndarray((n_ids,), dtype=np.int64, buffer=block.buf).copy()
+        word2ph = np.ndarray((n_word2ph,), dtype=np.int32, buffer=block.buf, offset=word2ph_offset).tolist()
+        norm_text = bytes(block.buf[text_offset:text_offset + n_text_bytes]).decode('utf-8')
+    finally:
+        block.close()
+        block.unlink()
+    return ids, word2ph, norm_text
+
+
+class FrontendPool:
+    """
+    常驻的 G2P 进程池。工作进程以 spawn 方式启动，不继承主进程中的 ORT 会话与线程。
+    未启动时 run() 直接在调用线程中执行 G2P。
+    """
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._executor is not None
+
+    def start(self, workers: int = 0, languages: tuple[str, ...] = ('ja', 'en', 'zh')) -> None:
+        """
+        Starts the G2P worker processes. Each worker preloads the G2P state of the given languages.
+
+        Args:
+            workers (int): Number of processes. Defaults to the number of CPU cores.
+            languages (tuple[str, ...]): Languages to preload in every worker.
+        """
+        with self._lock:
+            if self._executor is not None:
+                return
+            workers = workers if workers > 0 else (os.cpu_count() or 1)
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(tuple(languages),),
+            )
+            # 立即拉起全部进程并完成预热，而不是等到第一批请求。
+            for future in [self._executor.submit(os.getpid) for _ in range(workers)]:
+                future.result()
+            logger.info(f"Text frontend pool started with {workers} worker processes.")
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def run(self, text: str, language: str) -> tuple[np.ndarray, list[int], str]:
+        """运行 G2P，返回 (int64 音素 id, word2ph, 规范化文本)。"""
+        executor = self._executor
+        if executor is None:
+            return g2p(text, language)
+        return _read_result(*executor.submit(_g2p_task, text, language).result())
+
+
+frontend_pool: FrontendPool = FrontendPool()
+
+
+def text_to_phonemes(text: str, language: str) -> tuple[np.ndarray, list[int], str]:
+    """
+    Frontend_Workers > 0 时在首次调用时启动进程池。
+    multiprocessing 的子进程 (Batch 的工作进程、前端工作进程本身) 不再启动进程池，避免进程数成倍增长。
+    """
+    if FRONTEND_WORKERS > 0 and not frontend_pool.running and multiprocessing.parent_process() is None:
+        frontend_pool.start(FRONTEND_WORKERS)
+    return frontend_pool.run(text, language)
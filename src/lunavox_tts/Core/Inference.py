@@ -1,46 +1,189 @@
+import hashlib
+import os
 import onnxruntime as ort
 import numpy as np
-from typing import List, Optional
+from typing import Optional
 import threading
+import weakref
 
 from ..Audio.ReferenceAudio import ReferenceAudio
-from ..Japanese.JapaneseG2P import japanese_to_phones
-from ..English.EnglishG2P import english_to_phones
-from ..Chinese.ChineseG2P import chinese_clean_g2p_and_norm
+from ..Core.Cancellation import CancellationToken
+from ..Core.ResultCache import result_cache
+from ..Core.Frontend import text_to_phonemes
 from ..Chinese.ZhBert import compute_bert_phone_features
+from ..Converter.v2.GraphSurgery import KV_CAPACITY_DIM, KV_POSITION_INPUT
 from ..Utils.Constants import BERT_FEATURE_DIM
+from ..Utils.Cache import LRUCache
+
+# 语义 token 缓存的条目数，0 表示关闭。每条只有几 KB。
+MAX_CACHED_SEMANTIC_TOKENS: int = int(os.getenv('Max_Cached_Semantic_Tokens', '256'))
+# 每句最多生成的语义 token 数。
+T2S_MAX_DECODE_STEPS: int = 500
+# 固定容量 KV 解码器 (T2S_Decode_Mode=static) 的缓冲区每次扩容的长度。越大扩容越少，但每步注意力中
+# 被掩码掉的空位置也越多。
+T2S_KV_BLOCK_SIZE: int = max(1, int(os.getenv('T2S_KV_Block_Size', '128')))
 
 
 class LunaVoxEngine:
     def __init__(self):
         self.stop_event: threading.Event = threading.Event()
+        # T2S 输入 -> pred_semantic。只换声码器参考音频或声码器模型时，可以跳过自回归解码。
+        self._semantic_cache: LRUCache[str, np.ndarray] = LRUCache(capacity=MAX_CACHED_SEMANTIC_TOKENS,
+                                                                   sizer=lambda tokens: tokens.nbytes,
+                                                                   name='Semantic token cache')
+        # 会话 -> (输入名, 输出名)。图结构在会话生命周期内不变，不必每句都查询。
+        self._io_names: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        # 正在进行的单次长时间 run (Loop 解码器)，stop() 时通过 RunOptions.terminate 中止。
+        self._active_runs: set[ort.RunOptions] = set()
+        self._active_runs_lock: threading.Lock = threading.Lock()
+
+    def stop(self) -> None:
+        """中止所有正在进行的合成。"""
+        self.stop_event.set()
+        with self._active_runs_lock:
+            for run_options in self._active_runs:
+                run_options.terminate = True
+
+    def _run_interruptible(
+            self,
+            session: ort.InferenceSession,
+            feed: dict[str, np.ndarray],
+            cancel_token: Optional[CancellationToken],
+    ) -> Optional[list[np.ndarray]]:
+        """运行一次会话，运行期间可被 stop() 或 cancel_token 中止；被中止时返回 None。"""
+        run_options = ort.RunOptions()
+        run_options.log_severity_level = 4  # 中止时 ORT 会打印 "terminate flag" 错误日志，属于正常流程
+
+        def _terminate() -> None:
+            run_options.terminate = True
+
+        with self._active_runs_lock:
+            self._active_runs.add(run_options)
+        if cancel_token is not None:
+            cancel_token.add_callback(_terminate)
+        try:
+            if self._should_stop(cancel_token):
+                return None
+            return session.run(None, feed, run_options)
+        except Exception:
+            if self._should_stop(cancel_token):
+                return None
+            raise
+        finally:
+            if cancel_token is not None:
+                cancel_token.remove_callback(_terminate)
+            with self._active_runs_lock:
+                self._active_runs.discard(run_options)
+
+    def _session_io_names(self, session: ort.InferenceSession) -> tuple[tuple[str, ...], tuple[str, ...]]:
+        names = self._io_names.get(session)
+        if names is None:
+            names = (tuple(i.name for i in session.get_inputs()), tuple(o.name for o in session.get_outputs()))
+            self._io_names[session] = names
+        return names
+
+    @staticmethod
+    def _semantic_cache_key(t2s_fingerprint: str, *arrays: np.ndarray) -> str:
+        hasher = hashlib.sha256(t2s_fingerprint.encode('utf-8'))
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            hasher.update(f'{array.dtype.str}{array.shape}'.encode('utf-8'))
+            hasher.update(array.data)
+        return hasher.hexdigest()
+
+    def clear_semantic_cache(self) -> None:
+        self._semantic_cache.clear()
+
+    def _should_stop(self, cancel_token: Optional[CancellationToken]) -> bool:
+        return self.stop_event.is_set() or (cancel_token is not None and cancel_token.is_cancelled())
 
     def tts(
             self,
             text: str,
             prompt_audio: ReferenceAudio,
-            encoder: ort.InferenceSession,
+            encoder: Optional[ort.InferenceSession],
             first_stage_decoder: ort.InferenceSession,
             stage_decoder: ort.InferenceSession,
-            vocoder: ort.InferenceSession,
+            vocoder: Optional[ort.InferenceSession],
             language: str = "ja",
+            cancel_token: Optional[CancellationToken] = None,
+            model_fingerprint: Optional[str] = None,
+            t2s_fingerprint: Optional[str] = None,
+            timbre_audio: Optional[ReferenceAudio] = None,
+            prompt_encoder: Optional[ort.InferenceSession] = None,
+            text_encoder: Optional[ort.InferenceSession] = None,
+            vocoder_ref_encoder: Optional[ort.InferenceSession] = None,
+            vocoder_decoder: Optional[ort.InferenceSession] = None,
+            stage_decoder_loop: Optional[ort.InferenceSession] = None,
+            reuse_semantic_tokens: bool = False,
     ) -> Optional[np.ndarray]:
-        if language == "en":
-            ids = english_to_phones(text)
-            text_seq: np.ndarray = np.array([ids], dtype=np.int64)
-            text_bert = np.zeros((text_seq.shape[1], BERT_FEATURE_DIM), dtype=np.float32)
-        elif language == "zh":
-            ids, word2ph, norm_text = chinese_clean_g2p_and_norm(text)
-            text_seq: np.ndarray = np.array([ids], dtype=np.int64)
+        """
+        合成一句文本。
+
+        prompt_audio 决定 T2S 的输入（参考文本与 SSL 特征）；timbre_audio 只作为声码器的音色参考，
+        未指定时与 prompt_audio 相同。
+        同时提供拆分后的 prompt_encoder 与 text_encoder 时，参考音频一侧的 prompts 缓存在 prompt_audio 上，
+        逐句只运行 text_encoder，encoder 可以为 None；否则使用完整的 encoder。
+        同样地，提供拆分后的 vocoder_ref_encoder 与 vocoder_decoder 时，timbre_audio 的音色条件只计算一次，
+        逐句只运行 vocoder_decoder；否则使用完整的 vocoder。
+        提供 stage_decoder_loop 时，自回归解码在一次 run 中完成，stage_decoder 可以为 None。
+        提供 model_fingerprint 且启用了结果缓存时，相同 (模型, 参考音频, 文本, 语言) 的请求直接返回缓存的音频；
+        reuse_semantic_tokens 为 True 且提供 t2s_fingerprint 时，语义 token 按 T2S 输入缓存：命中时只重新运行声码器
+        (只换音色、只更新声码器、重新渲染)，未命中时把这次生成的 token 存入缓存。T2S 的采样是随机的，复用会固定第一次的结果，
+        因此默认关闭，普通请求既不计算缓存键也不写入缓存。
+        """
+        timbre_audio = timbre_audio or prompt_audio
+        cache_key: Optional[str] = None
+        if model_fingerprint and result_cache.enabled:
+            reference_fingerprint = prompt_audio.fingerprint
+            if timbre_audio is not prompt_audio:
+                reference_fingerprint += timbre_audio.fingerprint
+            cache_key = result_cache.make_key(model_fingerprint, reference_fingerprint, text, language)
+            cached_audio = result_cache.get(cache_key)
+            if cached_audio is not None:
+                return cached_audio
+
+        audio = self._synthesize(text, prompt_audio, timbre_audio, encoder, first_stage_decoder, stage_decoder,
+                                 vocoder, language, cancel_token, t2s_fingerprint, prompt_encoder, text_encoder,
+                                 vocoder_ref_encoder, vocoder_decoder, stage_decoder_loop, reuse_semantic_tokens)
+        if cache_key is not None and audio is not None:
+            result_cache.put(cache_key, audio)
+        return audio
+
+    @staticmethod
+    def text_features(text: str, language: str) -> tuple[np.ndarray, np.ndarray]:
+        """文本前端：返回 T2S 的 text_seq (1, n) 与 text_bert (n, 1024)。"""
+        # G2P 可能在前端进程池中运行 (Frontend_Workers)；BERT 是 ONNX 推理，不受 GIL 限制，留在本进程。
+        ids, word2ph, norm_text = text_to_phonemes(text, language)
+        text_seq: np.ndarray = np.expand_dims(ids, axis=0)
+        text_bert = np.zeros((text_seq.shape[1], BERT_FEATURE_DIM), dtype=np.float32)
+        if language == "zh":
             # Full zh-BERT parity: compute 1024-d features and align to phones
             bert_phone = compute_bert_phone_features(norm_text, word2ph)  # (len_phones, 1024)
-            if bert_phone.shape[0] != text_seq.shape[1]:
-                text_bert = np.zeros((text_seq.shape[1], BERT_FEATURE_DIM), dtype=np.float32)
-            else:
+            if bert_phone.shape[0] == text_seq.shape[1]:
                 text_bert = bert_phone
-        else:
-            text_seq: np.ndarray = np.array([japanese_to_phones(text)], dtype=np.int64)
-            text_bert = np.zeros((text_seq.shape[1], BERT_FEATURE_DIM), dtype=np.float32)
+        return text_seq, text_bert
+
+    def _synthesize(
+            self,
+            text: str,
+            prompt_audio: ReferenceAudio,
+            timbre_audio: ReferenceAudio,
+            encoder: Optional[ort.InferenceSession],
+            first_stage_decoder: ort.InferenceSession,
+            stage_decoder: Optional[ort.InferenceSession],
+            vocoder: Optional[ort.InferenceSession],
+            language: str,
+            cancel_token: Optional[CancellationToken],
+            t2s_fingerprint: Optional[str],
+            prompt_encoder: Optional[ort.InferenceSession] = None,
+            text_encoder: Optional[ort.InferenceSession] = None,
+            vocoder_ref_encoder: Optional[ort.InferenceSession] = None,
+            vocoder_decoder: Optional[ort.InferenceSession] = None,
+            stage_decoder_loop: Optional[ort.InferenceSession] = None,
+            reuse_semantic_tokens: bool = False,
+    ) -> Optional[np.ndarray]:
+        text_seq, text_bert = self.text_features(text, language)
         ref_seq = prompt_audio.phonemes_seq
         if ref_seq is None:
             return None
@@ -48,17 +191,36 @@ class LunaVoxEngine:
         if ref_bert is None or ref_bert.shape[0] != ref_seq.shape[1]:
             ref_bert = np.zeros((ref_seq.shape[1], BERT_FEATURE_DIM), dtype=np.float32)
 
-        semantic_tokens: np.ndarray = self.t2s_cpu(
-            ref_seq=ref_seq,
-            ref_bert=ref_bert,
-            text_seq=text_seq,
-            text_bert=text_bert,
-            ssl_content=prompt_audio.ssl_content,
-            encoder=encoder,
-            first_stage_decoder=first_stage_decoder,
-            stage_decoder=stage_decoder,
-        )
-        if self.stop_event.is_set():
+        semantic_key: Optional[str] = None
+        semantic_tokens: Optional[np.ndarray] = None
+        if reuse_semantic_tokens and t2s_fingerprint and MAX_CACHED_SEMANTIC_TOKENS > 0:
+            semantic_key = self._semantic_cache_key(t2s_fingerprint, ref_seq, ref_bert, text_seq, text_bert,
+                                                    prompt_audio.ssl_content)
+            semantic_tokens = self._semantic_cache.get(semantic_key)
+
+        if semantic_tokens is None:
+            prompts: Optional[np.ndarray] = None
+            if prompt_encoder is not None and text_encoder is not None:
+                prompts = prompt_audio.get_prompts(prompt_encoder)
+            semantic_tokens = self.t2s_cpu(
+                ref_seq=ref_seq,
+                ref_bert=ref_bert,
+                text_seq=text_seq,
+                text_bert=text_bert,
+                ssl_content=prompt_audio.ssl_content,
+                encoder=encoder,
+                first_stage_decoder=first_stage_decoder,
+                stage_decoder=stage_decoder,
+                cancel_token=cancel_token,
+                prompts=prompts,
+                text_encoder=text_encoder,
+                stage_decoder_loop=stage_decoder_loop,
+            )
+            if semantic_tokens is None:
+                return None
+            if semantic_key is not None:
+                self._semantic_cache.put(semantic_key, semantic_tokens)
+        if self._should_stop(cancel_token):
             return None
 
         eos_indices = np.where(semantic_tokens >= 1024)  # 剔除不合法的元素，例如 EOS Token。
@@ -66,7 +228,11 @@ class LunaVoxEngine:
             first_eos_index = eos_indices[-1][0]
             semantic_tokens = semantic_tokens[..., :first_eos_index]
 
-        audio_32k = np.expand_dims(prompt_audio.audio_32k, axis=0)  # 增加 Batch_Size 维度
+        if vocoder_ref_encoder is not None and vocoder_decoder is not None:
+            feed = {"text_seq": text_seq, "pred_semantic": semantic_tokens}
+            feed.update(timbre_audio.get_vits_reference(vocoder_ref_encoder))
+            return vocoder_decoder.run(None, feed)[0]
+        audio_32k = np.expand_dims(timbre_audio.audio_32k, axis=0)  # 增加 Batch_Size 维度
         return vocoder.run(None, {
             "text_seq": text_seq,
             "pred_semantic": semantic_tokens,
@@ -80,26 +246,44 @@ class LunaVoxEngine:
             text_seq: np.ndarray,
             text_bert: np.ndarray,
             ssl_content: np.ndarray,
-            encoder: ort.InferenceSession,
+            encoder: Optional[ort.InferenceSession],
             first_stage_decoder: ort.InferenceSession,
-            stage_decoder: ort.InferenceSession,
+            stage_decoder: Optional[ort.InferenceSession],
+            cancel_token: Optional[CancellationToken] = None,
+            prompts: Optional[np.ndarray] = None,
+            text_encoder: Optional[ort.InferenceSession] = None,
+            stage_decoder_loop: Optional[ort.InferenceSession] = None,
     ) -> Optional[np.ndarray]:
         """在CPU上运行T2S模型"""
         # Encoder
-        x, prompts = encoder.run(
-            None,
-            {
-                "ref_seq": ref_seq,
-                "text_seq": text_seq,
-                "ref_bert": ref_bert,
-                "text_bert": text_bert,
-                "ssl_content": ssl_content,
-            },
-        )
+        if prompts is not None and text_encoder is not None:
+            # prompts 已由参考音频缓存，只需计算 x
+            x = text_encoder.run(
+                None,
+                {
+                    "ref_seq": ref_seq,
+                    "text_seq": text_seq,
+                    "ref_bert": ref_bert,
+                    "text_bert": text_bert,
+                },
+            )[0]
+        else:
+            x, prompts = encoder.run(
+                None,
+                {
+                    "ref_seq": ref_seq,
+                    "text_seq": text_seq,
+                    "ref_bert": ref_bert,
+                    "text_bert": text_bert,
+                    "ssl_content": ssl_content,
+                },
+            )
         # First Stage Decoder
+        # 注意：参考音频部分的 K/V 不能跨句复用。prompts 的位置编码 (ar_audio_position) 虽然从 0 开始、
+        # 与目标文本无关，但 x 内部是双向注意力，prompts 也会注意到整个 x：第 1 层之后，参考音素与 prompts
+        # 的 K/V 都已经混入了目标文本。
         fs_outputs = first_stage_decoder.run(None, {"x": x, "prompts": prompts})
-        fs_out_info = first_stage_decoder.get_outputs()
-        fs_out_names: List[str] = [o.name for o in fs_out_info]
+        _, fs_out_names = self._session_io_names(first_stage_decoder)
 
         # Expected (variant A): aggregated outputs [y, k, v, y_emb, x_example]
         def _fs_get(name: str, default_idx: int):
@@ -135,10 +319,7 @@ class LunaVoxEngine:
             v_layers = None
 
         # Stage Decoder
-        stage_in_info = stage_decoder.get_inputs()
-        stage_in_names: List[str] = [i.name for i in stage_in_info]
-        stage_out_info = stage_decoder.get_outputs()
-        stage_out_names: List[str] = [o.name for o in stage_out_info]
+        stage_in_names, stage_out_names = self._session_io_names(stage_decoder_loop or stage_decoder)
 
         # Determine number of per-layer cache inputs expected
         n_past_k = sum(1 for n in stage_in_names if n.startswith("past_k_layer_"))
@@ -214,9 +395,25 @@ class LunaVoxEngine:
             _samples = out_map.get("samples", None)
             return _y, _y_emb, pres_k_layers, pres_v_layers, _k_agg, _v_agg, _logits, _samples
 
+        if stage_decoder_loop is not None:
+            # 整段解码在图内完成：Loop 在采样到 EOS 或达到 max_steps 后停止。
+            input_feed = _build_stage_feed(y, y_emb, k_layers, v_layers, k_agg, v_agg, x_example)
+            input_feed["max_steps"] = np.array(T2S_MAX_DECODE_STEPS, dtype=np.int64)
+            prefix_len = y.shape[1]
+            outputs_list = self._run_interruptible(stage_decoder_loop, input_feed, cancel_token)
+            if outputs_list is None:
+                return None
+            y = outputs_list[stage_out_names.index("y")]
+            idx = y.shape[1] - prefix_len - 1  # 与 Python 循环结束时的 idx 相同
+            y[0, -1] = 0
+            return np.expand_dims(y[:, -idx:], axis=0)
+
+        if KV_POSITION_INPUT in stage_in_names and k_layers is not None and v_layers is not None:
+            return self._decode_static_kv(stage_decoder, y, y_emb, k_layers, v_layers, x_example, cancel_token)
+
         idx: int = 0
-        for idx in range(0, 500):
-            if self.stop_event.is_set():
+        for idx in range(0, T2S_MAX_DECODE_STEPS):
+            if self._should_stop(cancel_token):
                 return None
 
             input_feed = _build_stage_feed(y, y_emb, k_layers, v_layers, k_agg, v_agg, x_example)
@@ -230,31 +427,90 @@ class LunaVoxEngine:
             else:
                 k_agg, v_agg = new_k_agg if new_k_agg is not None else k_agg, new_v_agg if new_v_agg is not None else v_agg
 
-            # EOS/停机判定：优先使用 samples，其次用 logits argmax，最后用 y 值范围
-            stop = False
+            if self._reached_eos(samples, logits, y):
+                break
+
+        y[0, -1] = 0
+        return np.expand_dims(y[:, -idx:], axis=0)
+
+    @staticmethod
+    def _reached_eos(samples: Optional[np.ndarray], logits: Optional[np.ndarray], y: np.ndarray) -> bool:
+        """EOS/停机判定：优先使用 samples，其次用 logits argmax，最后用 y 值范围"""
+        try:
             if samples is not None:
-                try:
-                    val = int(samples.flat[0])
-                    if val >= 1024:
-                        stop = True
-                except Exception:
-                    pass
-            elif logits is not None:
-                try:
-                    last = logits[..., -1, :]
-                    val = int(np.argmax(last))
-                    if val >= 1024:
-                        stop = True
-                except Exception:
-                    pass
-            else:
-                try:
-                    if int(y.flat[-1]) >= 1024:
-                        stop = True
-                except Exception:
-                    pass
+                return int(samples.flat[0]) >= 1024
+            if logits is not None:
+                return int(np.argmax(logits[..., -1, :])) >= 1024
+            return int(y.flat[-1]) >= 1024
+        except Exception:
+            return False
 
-            if stop:
+    def _decode_static_kv(
+            self,
+            stage_decoder: ort.InferenceSession,
+            y: np.ndarray,
+            y_emb: np.ndarray,
+            k_layers: list[np.ndarray],
+            v_layers: list[np.ndarray],
+            x_example: Optional[np.ndarray],
+            cancel_token: Optional[CancellationToken],
+    ) -> Optional[np.ndarray]:
+        """
+        使用固定容量 KV 解码器 (见 GraphSurgery.build_static_kv_decoder) 逐步解码。
+        每层的 K/V 缓冲区通过 IOBinding 同时绑定为输入 past_* 与输出 present_*，图内的写入就地完成，
+        每步不再复制整个缓存；缓冲区写满时按 T2S_KV_BLOCK_SIZE 扩容一次。
+        """
+        binding = stage_decoder.io_binding()
+        buffers: dict[str, np.ndarray] = {}
+        axes: dict[str, int] = {}
+        for value in stage_decoder.get_inputs():
+            if KV_CAPACITY_DIM not in value.shape:
+                continue
+            layer = int(value.name.rsplit('_', 1)[-1])
+            cache = (k_layers if value.name.startswith('past_k_') else v_layers)[layer]
+            buffers[value.name] = cache.reshape(cache.shape[cache.ndim - len(value.shape):])  # 去掉 np.split 留下的层维
+            axes[value.name] = value.shape.index(KV_CAPACITY_DIM)
+        first = next(iter(buffers))
+        kv_pos: int = buffers[first].shape[axes[first]]  # 已写入的长度，即 first stage decoder 输出的缓存长度
+        capacity: int = kv_pos
+        ort_values: dict[str, ort.OrtValue] = {}
+
+        def _grow() -> None:
+            for name, cache in buffers.items():
+                padding = [(0, 0)] * cache.ndim
+                padding[axes[name]] = (0, T2S_KV_BLOCK_SIZE)
+                buffers[name] = np.pad(cache, padding)
+                ort_values[name] = ort.OrtValue.ortvalue_from_numpy(buffers[name])
+                binding.bind_ortvalue_input(name, ort_values[name])
+
+        input_names = {value.name for value in stage_decoder.get_inputs()}
+        output_names = [value.name for value in stage_decoder.get_outputs() if not value.name.startswith('present_')]
+
+        idx: int = 0
+        for idx in range(0, T2S_MAX_DECODE_STEPS):
+            if self._should_stop(cancel_token):
+                return None
+            if kv_pos >= capacity:
+                _grow()
+                capacity += T2S_KV_BLOCK_SIZE
+            binding.bind_cpu_input('iy', y)
+            binding.bind_cpu_input('iy_emb', y_emb)
+            if 'ix_example' in input_names and x_example is not None:
+                binding.bind_cpu_input('ix_example', x_example)
+            binding.bind_cpu_input(KV_POSITION_INPUT, np.array(kv_pos, dtype=np.int64))
+            # y / y_emb 的长度每步都变，输出需要重新绑定；缓存输出与输入共用同一块内存，由图内就地写入。
+            binding.clear_binding_outputs()
+            for name in output_names:
+                binding.bind_output(name)
+            for name, value in ort_values.items():
+                binding.bind_ortvalue_output('present_' + name[len('past_'):], value)
+            stage_decoder.run_with_iobinding(binding)
+            results = binding.get_outputs()
+            outputs = {name: results[i].numpy() for i, name in enumerate(output_names)}
+            kv_pos += 1
+            y = outputs['y']
+            y_emb = outputs.get('y_emb', y_emb)
+            if self._reached_eos(outputs.get('samples'), outputs.get('logits'), y):
                 break
 
         y[0, -1] = 0
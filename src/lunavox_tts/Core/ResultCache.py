@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+from typing import Optional
+
+import numpy as np
+import soundfile as sf
+
+from ..Utils.Cache import LRUCache
+
+logger = logging.getLogger(__name__)
+
+# 内存层的字节预算 (MB)，0 表示关闭内存层。
+RESULT_CACHE_MEMORY_MB: float = float(os.getenv('Result_Cache_Memory_MB', '0'))
+# 磁盘层目录，留空表示关闭磁盘层。
+RESULT_CACHE_DIR: str = os.getenv('Result_Cache_Dir', '')
+# 磁盘层的字节预算 (MB)，0 表示不限制。超出后按修改时间从旧到新删除，直到降到预算的 90%。
+RESULT_CACHE_DISK_MB: float = float(os.getenv('Result_Cache_Disk_MB', '1024'))
+_DISK_EVICT_TARGET_RATIO: float = 0.9
+RESULT_CACHE_SAMPLE_RATE: int = 32000
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """只做不改变发音的规范化：Unicode NFC 与空白折叠。"""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+class ResultCache:
+    """
+    合成结果缓存，位于 LunaVoxEngine.tts 之前。
+
+    键由角色模型指纹、参考音频指纹、规范化后的文本与语言组成。
+    内存层是按字节预算淘汰的 LRU；磁盘层把音频存为 FLAC (24-bit PCM)，跨进程、跨重启共享，
+    同样有字节预算，读取命中时更新文件的修改时间，按修改时间淘汰即近似 LRU。
+    """
+
+    def __init__(self, memory_budget_bytes: int = 0, cache_dir: str = '', disk_budget_bytes: int = 0):
+        self.memory_budget_bytes: int = max(0, memory_budget_bytes)
+        self.cache_dir: str = cache_dir
+        self.disk_budget_bytes: int = max(0, disk_budget_bytes)
+        # 磁盘层大小的估计：首次写入时扫描目录得到，之后累加本进程的写入；其他进程的写入在下次淘汰扫描时计入。
+        self._disk_bytes: Optional[int] = None
+        self._disk_lock: threading.Lock = threading.Lock()
+        self._memory: LRUCache[str, np.ndarray] = LRUCache(
+            max_bytes=self.memory_budget_bytes, sizer=lambda audio: audio.nbytes, name='result cache')
+        self._lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory_budget_bytes > 0 or bool(self.cache_dir)
+
+    @staticmethod
+    def make_key(model_fingerprint: str, reference_fingerprint: str, text: str, language: str) -> str:
+        raw = '\x1f'.join((model_fingerprint, reference_fingerprint, normalize_text(text), language))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        audio = self._memory.get(key)
+        if audio is not None:
+            with self._lock:
+                self.hits += 1
+            return audio
+
+        audio = self._read_disk(key)
+        with self._lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        self._put_memory(key, audio)
+        return audio
+
+    def put(self, key: str, audio: np.ndarray) -> None:
+        audio = np.ascontiguousarray(audio, dtype=np.float32)
+        audio.setflags(write=False)  # 同一数组会被多个请求共享
+        self._put_memory(key, audio)
+        self._write_disk(key, audio)
+
+    def clear(self, include_disk: bool = False) -> None:
+        self._memory.clear()
+        if include_disk and self.cache_dir and os.path.isdir(self.cache_dir):
+            for _, _, path in self._scan_disk():
+                os.remove(path)
+            self._disk_bytes = None
+
+    def _put_memory(self, key: str, audio: np.ndarray) -> None:
+        # LRUCache 的 max_bytes 为 0 表示不限制，这里为 0 表示关闭内存层，需要单独判断。
+        if self.memory_budget_bytes <= 0 or audio.nbytes > self.memory_budget_bytes:
+            return
+        self._memory.put(key, audio)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.flac')
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            audio, _ = sf.read(path, dtype='float32')
+        except Exception as e:
+            logger.warning(f"Failed to read cached audio {path}: {e}")
+            return None
+        try:
+            os.utime(path)  # 记录最近使用时间，磁盘层按修改时间淘汰
+        except OSError:
+            pass
+        audio = audio.reshape(1, 1, -1)  # 与声码器输出的形状保持一致
+        audio.setflags(write=False)
+        return audio
+
+    def _write_disk(self, key: str, audio: np.ndarray) -> None:
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        # 先写临时文件再原子替换，避免并发读取到半个文件。
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            sf.write(tmp_path, np.clip(audio.reshape(-1), -1.0, 1.0), RESULT_CACHE_SAMPLE_RATE,
+                     format='FLAC', subtype='PCM_24')
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Failed to write cached audio {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._account_disk(os.path.getsize(path))
+
+    def _scan_disk(self) -> list[tuple[float, int, str]]:
+        """磁盘层的全部条目 (修改时间, 大小, 路径)。"""
+        entries: list[tuple[float, int, str]] = []
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if not filename.endswith('.flac'):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # 已被其他进程删除
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _account_disk(self, size: int) -> None:
+        if self.disk_budget_bytes <= 0:
+            return
+        with self._lock:
+            if self._disk_bytes is not None:
+                self._disk_bytes += size
+                if self._disk_bytes <= self.disk_budget_bytes:
+                    return
+        self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """重新扫描目录得到实际大小；超出预算时按修改时间从旧到新删除，直到降到预算的 90%，避免每次写入都扫描。"""
+        with self._disk_lock:
+            entries = sorted(self._scan_disk())
+            total = sum(size for _, size, _ in entries)
+            if total > self.disk_budget_bytes:
+                target = int(self.disk_budget_bytes * _DISK_EVICT_TARGET_RATIO)
+                for _, size, path in entries:
+                    if total <= target:
+                        break
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    total -= size
+            with self._lock:
+                self._disk_bytes = total
+
+
+result_cache: ResultCache = ResultCache(
+    memory_budget_bytes=int(RESULT_CACHE_MEMORY_MB * 1024 * 1024),
+    cache_dir=RESULT_CACHE_DIR,
+    disk_budget_bytes=int(RESULT_CACHE_DISK_MB * 1024 * 1024),
+)
@@ -1,39 +1,44 @@
 # 文件: .../Core/TTSPlayer.py
 
 import queue
-import re
 import os
 import threading
 import time
 
-import numpy as np
-import wave
-from typing import Optional, List, Callable
+from typing import Optional, Callable, TYPE_CHECKING
 try:
     import pyaudio
 except Exception:  # optional dependency for playback
     pyaudio = None
 import logging
 
-from ..Japanese.Split import split_japanese_text
+from ..Audio.Audio import PCMConverter, StreamingWavWriter
+from ..Core.Cancellation import CancellationToken
 from ..Core.Inference import tts_client
+from ..Core.TextSplitter import split_sentences
 from ..ModelManager import model_manager
 from ..Utils.Shared import context
-from ..Utils.Utils import clear_queue
+from ..Utils.Utils import clear_queue, put_with_backpressure
+
+if TYPE_CHECKING:
+    from ..Audio.ReferenceAudio import ReferenceAudio
 
 logger = logging.getLogger(__name__)
 
 STREAM_END = 'STREAM_END'  # 这是一个特殊的标记，表示文本流结束
+# 音频队列的高水位线（块数）。消费者落后时，生产者在此处阻塞，从而暂停 T2S/声码器的计算。
+AUDIO_QUEUE_MAX_CHUNKS: int = int(os.getenv('Max_Queued_Audio_Chunks', '8'))
 
 
 class TTSPlayer:
-    def __init__(self, sample_rate: int = 32000):
+    def __init__(self, sample_rate: int = 32000, max_queued_chunks: int = AUDIO_QUEUE_MAX_CHUNKS):
         self.sample_rate: int = sample_rate
         self.channels: int = 1
         self.bytes_per_sample: int = 2  # 16-bit audio
 
+        self._pcm_converter: PCMConverter = PCMConverter()  # 只在 TTS 工作线程中使用
         self._text_queue: queue.Queue = queue.Queue()
-        self._audio_queue: queue.Queue = queue.Queue()
+        self._audio_queue: queue.Queue = queue.Queue(maxsize=max(1, max_queued_chunks))
 
         self._stop_event: threading.Event = threading.Event()
         self._tts_done_event: threading.Event = threading.Event()
@@ -44,17 +49,20 @@ class TTSPlayer:
 
         self._play: bool = False
         self._current_save_path: Optional[str] = None
-        self._session_audio_chunks: List[np.ndarray] = []
+        self._wav_writer: Optional[StreamingWavWriter] = None
         self._start_time: Optional[float] = None
         self._end_time: Optional[float] = None
         self._split: bool = False
 
         self._chunk_callback: Optional[Callable[[Optional[bytes]], None]] = None
+        self._cancel_token: CancellationToken = CancellationToken()
 
-    @staticmethod
-    def _preprocess_for_playback(audio_float: np.ndarray) -> bytes:
-        audio_int16 = (audio_float.squeeze() * 32767).astype(np.int16)
-        return audio_int16.tobytes()
+        # 会话开始时固定下来的说话人、参考音频与语言，使多个 TTSPlayer 实例可以并发工作。
+        self._speaker: str = ""
+        self._prompt_audio: Optional["ReferenceAudio"] = None
+        self._timbre_audio: Optional["ReferenceAudio"] = None  # 仅用于声码器的音色参考，为空时使用 _prompt_audio
+        self._reuse_semantic_tokens: bool = False
+        self._language: str = "ja"
 
     def _tts_worker_loop(self):
         """从文本队列取句子，生成音频，并通过回调函数或音频队列分发。"""
@@ -68,8 +76,7 @@ class TTSPlayer:
 
             try:
                 if sentence is STREAM_END:
-                    if self._current_save_path and self._session_audio_chunks:
-                        self._save_session_audio()
+                    self._save_session_audio()
 
                     # 在TTS工作线程完成时，通过回调发送结束信号
                     if self._chunk_callback:
@@ -78,20 +85,34 @@ class TTSPlayer:
                     self._tts_done_event.set()
                     continue
 
-                gsv_model = model_manager.get(context.current_speaker)
-                if not gsv_model or not context.current_prompt_audio:
+                if self._cancel_token.is_cancelled():
+                    continue  # 请求已被取消：跳过剩余句子，直到 STREAM_END 收尾
+
+                gsv_model = model_manager.get(self._speaker)
+                if not gsv_model or not self._prompt_audio:
                     logger.error("Missing model or reference audio.")
                     continue
 
                 tts_client.stop_event.clear()
                 audio_chunk = tts_client.tts(
                     text=sentence,
-                    prompt_audio=context.current_prompt_audio,
+                    prompt_audio=self._prompt_audio,
                     encoder=gsv_model.T2S_ENCODER,
                     first_stage_decoder=gsv_model.T2S_FIRST_STAGE_DECODER,
                     stage_decoder=gsv_model.T2S_STAGE_DECODER,
                     vocoder=gsv_model.VITS,
-                    language=context.current_language,
+                    language=self._language,
+                    cancel_token=self._cancel_token,
+                    model_fingerprint=gsv_model.FINGERPRINT,
+                    t2s_fingerprint=gsv_model.T2S_FINGERPRINT,
+                    timbre_audio=self._timbre_audio,
+                    prompt_encoder=gsv_model.T2S_PROMPT_ENCODER,
+                    text_encoder=gsv_model.T2S_TEXT_ENCODER,
+                    vocoder_ref_encoder=gsv_model.VITS_REF_ENCODER,
+                    vocoder_decoder=gsv_model.VITS_DECODER,
+                    stage_decoder_loop=gsv_model.T2S_STAGE_DECODER_LOOP,
+                    # 只换音色时沿用同一文本已生成的语义 token，使不同音色的韵律一致。
+                    reuse_semantic_tokens=self._reuse_semantic_tokens or self._timbre_audio is not None,
                 )
 
                 if audio_chunk is not None:
@@ -101,15 +122,18 @@ class TTSPlayer:
                             duration: float = self._end_time - self._start_time
                             logger.info(f"First packet latency: {duration:.3f} seconds.")
 
-                    if self._play:
-                        self._audio_queue.put(audio_chunk)
+                    # 每个块只转换一次：写文件同步进行，可以直接使用转换缓冲区；
+                    # 播放与回调在其他线程中异步消费，共享同一份 bytes 快照。
+                    pcm = self._pcm_converter.convert(audio_chunk)
                     if self._current_save_path:
-                        self._session_audio_chunks.append(audio_chunk)
-
-                    # 使用回调函数处理流式数据
-                    if self._chunk_callback:
-                        audio_data = self._preprocess_for_playback(audio_chunk)
-                        self._chunk_callback(audio_data)
+                        self._append_session_audio(pcm)
+                    if self._play or self._chunk_callback:
+                        audio_data = bytes(pcm)
+                        if self._play:
+                            put_with_backpressure(self._audio_queue, audio_data, self.is_stopped)
+                        # 使用回调函数处理流式数据
+                        if self._chunk_callback:
+                            self._chunk_callback(audio_data)
 
             except Exception as e:
                 logger.error(f"A critical error occurred while processing the TTS task: {e}", exc_info=True)
@@ -126,15 +150,14 @@ class TTSPlayer:
                 p = pyaudio.PyAudio()
             while not self._stop_event.is_set():
                 try:
-                    audio_chunk = self._audio_queue.get(timeout=1)
-                    if audio_chunk is None:
+                    audio_data = self._audio_queue.get(timeout=1)
+                    if audio_data is None:
                         break
                     if stream is None and p is not None:
                         stream = p.open(format=p.get_format_from_width(self.bytes_per_sample),
                                         channels=self.channels,
                                         rate=self.sample_rate,
                                         output=True)
-                    audio_data = self._preprocess_for_playback(audio_chunk)
                     if stream is not None:
                         stream.write(audio_data)
                 except queue.Empty:
@@ -155,30 +178,66 @@ class TTSPlayer:
             if p:
                 p.terminate()
 
+    def _append_session_audio(self, pcm: memoryview):
+        try:
+            if self._wav_writer is None:
+                self._wav_writer = StreamingWavWriter(
+                    self._current_save_path,
+                    sample_rate=self.sample_rate,
+                    channels=self.channels,
+                    sample_width=self.bytes_per_sample,
+                )
+            self._wav_writer.write(pcm)
+        except Exception as e:
+            logger.error(f"Failed to save audio: {e}")
+            self._close_wav_writer()
+            self._current_save_path = None
+
+    def _close_wav_writer(self):
+        if self._wav_writer is None:
+            return
+        try:
+            self._wav_writer.close()
+        finally:
+            self._wav_writer = None
+
     def _save_session_audio(self):
+        writer = self._wav_writer
         try:
-            full_audio = np.concatenate(self._session_audio_chunks, axis=0)
-            with wave.open(self._current_save_path, 'wb') as wf:
-                wf.setnchannels(self.channels)
-                wf.setsampwidth(self.bytes_per_sample)
-                wf.setframerate(self.sample_rate)
-                wf.writeframes(self._preprocess_for_playback(full_audio))
-            logger.info(f"Audio successfully saved to {os.path.abspath(self._current_save_path)}")
+            self._close_wav_writer()
+            if writer is not None:
+                logger.info(f"Audio successfully saved to {os.path.abspath(writer.path)}")
         except Exception as e:
             logger.error(f"Failed to save audio: {e}")
         finally:
-            self._session_audio_chunks = []
             self._current_save_path = None
 
     def start_session(self,
                       play: bool = False,
                       split: bool = False,
                       save_path: Optional[str] = None,
-                      chunk_callback: Optional[Callable[[Optional[bytes]], None]] = None
+                      chunk_callback: Optional[Callable[[Optional[bytes]], None]] = None,
+                      cancel_token: Optional[CancellationToken] = None,
+                      speaker: Optional[str] = None,
+                      prompt_audio: Optional["ReferenceAudio"] = None,
+                      language: Optional[str] = None,
+                      timbre_audio: Optional["ReferenceAudio"] = None,
+                      reuse_semantic_tokens: bool = False,
                       ):
+        """
+        未指定 speaker / prompt_audio / language 时，使用全局 context 中的当前值。
+        timbre_audio 只替换声码器的音色参考；T2S 仍以 prompt_audio 为条件，因此语义 token 可以命中缓存。
+        reuse_semantic_tokens 为 True 时，同一文本复用 (并缓存) 已生成的语义 token；指定 timbre_audio 时总是如此。
+        """
         with self._api_lock:
             self._tts_done_event.clear()
             self._chunk_callback = chunk_callback
+            self._cancel_token = cancel_token or CancellationToken()
+            self._speaker = speaker or context.current_speaker
+            self._prompt_audio = prompt_audio or context.current_prompt_audio
+            self._language = language or context.current_language
+            self._timbre_audio = timbre_audio
+            self._reuse_semantic_tokens = reuse_semantic_tokens
             self._stop_event.clear()
 
             if self._tts_worker is None or not self._tts_worker.is_alive():
@@ -191,11 +250,11 @@ class TTSPlayer:
 
             clear_queue(self._text_queue)
             clear_queue(self._audio_queue)
+            self._close_wav_writer()
 
             self._play = play
             self._split = split
             self._current_save_path = save_path
-            self._session_audio_chunks = []
             self._start_time = None
             self._end_time = None
 
@@ -207,11 +266,7 @@ class TTSPlayer:
                 self._start_time = time.time()
 
             if self._split:
-                if context.current_language == 'en':
-                    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+', text_chunk.strip()) if s.strip()]
-                else:
-                    sentences = split_japanese_text(text_chunk.strip())
-                for sentence in sentences:
+                for sentence in split_sentences(text_chunk, self._language):
                     self._text_queue.put(sentence)
             else:
                 self._text_queue.put(text_chunk)
@@ -221,22 +276,48 @@ class TTSPlayer:
             self._text_queue.put(STREAM_END)
 
     def stop(self):
+        """停止本播放器，并通过全局 stop_event 中止所有正在进行的合成。"""
         with self._api_lock:
             if self._tts_worker is None and self._playback_worker is None:
                 return
             if self._stop_event.is_set():
                 return
-            tts_client.stop_event.set()
-            self._stop_event.set()
-            self._tts_done_event.set()
-            self._text_queue.put(None)
-            self._audio_queue.put(None)
-            if self._tts_worker and self._tts_worker.is_alive():
-                self._tts_worker.join()
-            if self._playback_worker and self._playback_worker.is_alive():
-                self._playback_worker.join()
-            self._tts_worker = None
-            self._playback_worker = None
+            tts_client.stop()
+            self._shutdown_workers()
+
+    def close(self):
+        """只取消本播放器的会话并结束其工作线程，不影响其他播放器。"""
+        with self._api_lock:
+            self._cancel_token.cancel()
+            if self._tts_worker is None and self._playback_worker is None:
+                return
+            if self._stop_event.is_set():
+                return
+            self._shutdown_workers()
+
+    def _shutdown_workers(self):
+        self._stop_event.set()
+        self._tts_done_event.set()
+        self._text_queue.put(None)
+        clear_queue(self._audio_queue)  # 有界队列可能已满，先清空再放入结束标记
+        try:
+            self._audio_queue.put_nowait(None)
+        except queue.Full:
+            pass
+        if self._tts_worker and self._tts_worker.is_alive():
+            self._tts_worker.join()
+        if self._playback_worker and self._playback_worker.is_alive():
+            self._playback_worker.join()
+        self._tts_worker = None
+        self._playback_worker = None
+        self._close_wav_writer()
+
+    def cancel_session(self):
+        """只取消当前会话，不影响全局的 stop_event。"""
+        self._cancel_token.cancel()
+
+    def is_stopped(self) -> bool:
+        return self._stop_event.is_set() or self._cancel_token.is_cancelled()
 
     def wait_for_tts_completion(self):
         if self._tts_done_event.is_set():
@@ -0,0 +1,63 @@
+import re
+
+from ..Japanese.Split import split_japanese_text, get_valid_text_length, MIN_SENTENCE_LENGTH
+
+_ENGLISH_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+')
+# 流式输入时用于切句的强终止符（不含顿号，避免切得过碎）
+_CJK_SENTENCE_END_RE = re.compile(r'(?<=[。！？!?…\n])')
+
+
+def split_sentences(text: str, language: str) -> list[str]:
+    """把完整文本切分为句子列表。"""
+    if language == 'en':
+        return [s.strip() for s in _ENGLISH_SENTENCE_END_RE.split(text.strip()) if s.strip()]
+    return split_japanese_text(text.strip())
+
+
+class IncrementalSentenceSplitter:
+    """
+    把逐 token 到达的文本（例如 LLM 的流式输出）缓冲起来，只在句子完整时才吐出。
+
+    过短的句子会与下一句合并，规则与 split_japanese_text 相同。
+    """
+
+    def __init__(self, language: str = 'ja'):
+        self.language: str = language
+        self._buffer: str = ''
+        self._pending: str = ''  # 已完整但过短、等待与下一句合并的句子
+
+    def push(self, text: str) -> list[str]:
+        self._buffer += text
+        if self.language == 'en':
+            # 英文句号后必须跟空白才算句末，否则 "3.14" 之类会被截断。
+            parts = _ENGLISH_SENTENCE_END_RE.split(self._buffer)
+        else:
+            parts = _CJK_SENTENCE_END_RE.split(self._buffer)
+        self._buffer = parts.pop()  # 最后一段尚未结束
+        sentences: list[str] = []
+        for part in parts:
+            sentence = self._merge_short(part)
+            if sentence:
+                sentences.append(sentence)
+        return sentences
+
+    def flush(self) -> list[str]:
+        """强制吐出缓冲区中剩余的全部文本（用于句中 flush 与结束）。"""
+        rest = (self._pending + self._buffer).strip()
+        self._pending = ''
+        self._buffer = ''
+        return [rest] if rest else []
+
+    def clear(self) -> None:
+        self._pending = ''
+        self._buffer = ''
+
+    def _merge_short(self, part: str) -> str:
+        sentence = (self._pending + part).strip()
+        if not sentence:
+            return ''
+        if get_valid_text_length(sentence) < MIN_SENTENCE_LENGTH:
+            self._pending = sentence + (' ' if self.language == 'en' else '')
+            return ''
+        self._pending = ''
+        return sentence
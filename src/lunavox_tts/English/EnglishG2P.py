@@ -7,8 +7,10 @@ from nltk.tokenize import TweetTokenizer
 from nltk import pos_tag
 from ..Utils.NltkResources import ensure_nltk_data
 
+import numpy as np
+
 # Reuse symbols_v2 from Japanese module for now (it already includes ARPAbet)
-from ..Japanese.SymbolsV2 import symbols_v2, symbol_to_id_v2
+from ..Japanese.SymbolsV2 import symbols_to_ids, symbol_to_id_v2
 
 
 _word_tokenize = TweetTokenizer().tokenize
@@ -57,18 +59,19 @@ class _EN_G2P:
 
 
 _g2p = _EN_G2P()
+_IGNORED_PHONES = frozenset((" ", "<pad>", "UW", "</s>", "<s>"))
 
 
-def english_to_phones(text: str) -> List[int]:
+def english_to_phones(text: str) -> np.ndarray:
     text = text_normalize(text)
     text = normalize(text)
     phone_list = _g2p(text)
     # Filter unknowns and non-symbols. Map to IDs via symbols_v2.
-    phones = [ph if ph != "<unk>" else "UNK" for ph in phone_list if ph not in [" ", "<pad>", "UW", "</s>", "<s>"]]
-    phones = [ph for ph in phones if ph in symbols_v2]
+    phones = ["UNK" if ph == "<unk>" else ph for ph in phone_list if ph not in _IGNORED_PHONES]
+    ids = symbols_to_ids(phones, drop_unknown=True)
     # Stability: if too short, prepend comma
-    if len(phones) < 4:
-        phones = [","] + phones
-    return [symbol_to_id_v2[ph] for ph in phones]
+    if len(ids) < 4:
+        ids = np.concatenate(([symbol_to_id_v2[","]], ids))
+    return ids
 
 
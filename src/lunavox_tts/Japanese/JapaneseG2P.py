@@ -8,7 +8,9 @@
 import re
 import pyopenjtalk
 from typing import List
-from .SymbolsV2 import symbols_v2, symbol_to_id_v2
+import numpy as np
+
+from .SymbolsV2 import symbols_to_ids
 
 # 匹配连续的标点符号
 _CONSECUTIVE_PUNCTUATION_RE = re.compile(r"([,./?!~…・])\1+")
@@ -145,8 +147,5 @@ class JapaneseG2P:
         return processed_phonemes
 
 
-def japanese_to_phones(text: str) -> list[int]:
-    phones = JapaneseG2P.g2p(text)
-    phones = ["UNK" if ph not in symbols_v2 else ph for ph in phones]
-    phones = [symbol_to_id_v2[ph] for ph in phones]
-    return phones
+def japanese_to_phones(text: str) -> np.ndarray:
+    return symbols_to_ids(JapaneseG2P.g2p(text))
@@ -1,7 +1,26 @@
 from __future__ import annotations
 
+from types import MappingProxyType
+from typing import Iterable, Mapping
+
+import numpy as np
+
 # Use vendored exact replica of GPT-SoVITS symbols to avoid external dependency
-from ..Symbols.symbols2_exact import symbols_v2_exact as symbols_v2  # type: ignore
+from ..Symbols.symbols2_exact import symbols_v2_exact as _symbols_v2  # type: ignore
+
+# 只读的音素表，日语、英语、中文前端与 ReferenceAudio 共用同一份。
+symbols_v2: tuple[str, ...] = tuple(_symbols_v2)
+symbol_to_id_v2: Mapping[str, int] = MappingProxyType({symbol: idx for idx, symbol in enumerate(symbols_v2)})
+UNK_ID: int = symbol_to_id_v2["UNK"]
+
 
-symbol_to_id_v2: dict[str, int] = {symbol: idx for idx, symbol in enumerate(symbols_v2)}
+def symbols_to_ids(phones: Iterable[str], drop_unknown: bool = False) -> np.ndarray:
+    """
+    把整个音素列表一次性映射为 int64 数组。
 
+    不在表中的音素映射为 UNK；drop_unknown 为 True 时直接丢弃。
+    """
+    lookup = symbol_to_id_v2.get
+    if drop_unknown:
+        return np.fromiter((i for i in map(lookup, phones) if i is not None), dtype=np.int64)
+    return np.fromiter((lookup(ph, UNK_ID) for ph in phones), dtype=np.int64)
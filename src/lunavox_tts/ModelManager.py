@@ -1,18 +1,29 @@
 import atexit
 import gc
+import hashlib
+import mmap
 from dataclasses import dataclass
 import os
 import logging
+import threading
+import time
+import onnx
 import onnxruntime
 from onnxruntime import InferenceSession
 from typing import Optional
 import numpy as np
 # from importlib.resources import files
 from huggingface_hub import hf_hub_download
-
+try:
+    import psutil
+except Exception:  # optional dependency, only used to measure resident memory
+    psutil = None
+
+from .Converter.v2.GraphSurgery import (build_stage_decoder_loop, build_static_kv_decoder, split_t2s_encoder,
+                                       split_vits)
+from .Utils.Cache import LRUCache
 from .Utils.Shared import context
 # from .Utils.Constants import PACKAGE_NAME
-from .Utils.Utils import LRUCacheDict
 
 logger = logging.getLogger(__name__)
 
@@ -25,26 +36,190 @@ class _GSVModelFile:
     T2S_FIRST_STAGE_DECODER: str = 't2s_first_stage_decoder_fp32.onnx'
     T2S_STAGE_DECODER: str = 't2s_stage_decoder_fp32.onnx'
     VITS: str = 'vits_fp32.onnx'
+    T2S_ENCODER_WEIGHT_FP32: str = 't2s_encoder_fp32.bin'
     T2S_DECODER_WEIGHT_FP32: str = 't2s_shared_fp32.bin'
     T2S_DECODER_WEIGHT_FP16: str = 't2s_shared_fp16.bin'
     VITS_WEIGHT_FP32: str = 'vits_fp32.bin'
     VITS_WEIGHT_FP16: str = 'vits_fp16.bin'
+    # 可选的动态 INT8 量化模型，由 Converter.v2.Quantizer 生成，权重内嵌。
+    T2S_FIRST_STAGE_DECODER_INT8: str = 't2s_first_stage_decoder_int8.onnx'
+    T2S_STAGE_DECODER_INT8: str = 't2s_stage_decoder_int8.onnx'
+    VITS_INT8: str = 'vits_int8.onnx'
+    # 由 t2s_encoder 拆出的两个子图（链接 t2s_encoder 的权重文件），见 GraphSurgery.split_t2s_encoder。
+    T2S_PROMPT_ENCODER: str = 't2s_prompt_encoder_fp32.onnx'
+    T2S_TEXT_ENCODER: str = 't2s_text_encoder_fp32.onnx'
+    # 由 VITS 拆出的参考编码器 (ref_audio -> 音色条件) 与解码器，见 GraphSurgery.split_vits。
+    VITS_REF_ENCODER: str = 'vits_ref_encoder_fp32.onnx'
+    VITS_DECODER: str = 'vits_decoder_fp32.onnx'
+    VITS_REF_ENCODER_INT8: str = 'vits_ref_encoder_int8.onnx'
+    VITS_DECODER_INT8: str = 'vits_decoder_int8.onnx'
+    # 把 stage decoder 包进 ONNX Loop 的单图自回归解码器，见 GraphSurgery.build_stage_decoder_loop。
+    T2S_STAGE_DECODER_LOOP: str = 't2s_stage_decoder_loop_fp32.onnx'
+    T2S_STAGE_DECODER_LOOP_INT8: str = 't2s_stage_decoder_loop_int8.onnx'
+    # KV 缓存写入固定容量缓冲区的 stage decoder，见 GraphSurgery.build_static_kv_decoder。
+    T2S_STAGE_DECODER_STATIC: str = 't2s_stage_decoder_static_fp32.onnx'
+    T2S_STAGE_DECODER_STATIC_INT8: str = 't2s_stage_decoder_static_int8.onnx'
+
+
+SUPPORTED_PRECISIONS: tuple[str, ...] = ('fp32', 'int8')
+# T2S 自回归解码方式：python 为逐步调用 stage decoder；loop 为整段解码在一次 run 中完成；
+# static 仍逐步调用，但 KV 缓存使用固定容量的缓冲区，不再每步拼接增长。
+T2S_DECODE_MODE: str = os.getenv('T2S_Decode_Mode', 'python').lower()
+# 未指定精度时加载角色所用的默认精度。
+DEFAULT_MODEL_PRECISION: str = os.getenv('Model_Precision', 'fp32').lower()
+# 所有驻留角色模型的内存预算 (MB，按各角色的 _CharacterStats.size_bytes 计算)，0 表示不限制。
+# 设置后 Max_Cached_Character_Models 默认不再限制角色数量，由预算决定淘汰。
+MAX_CHARACTER_MODELS_MB: float = float(os.getenv('Max_Character_Models_MB', '0'))
+# 角色计入预算的大小 = 按文件估算的权重大小 × 该系数，用于覆盖预打包的权重副本与 ORT 的内部缓冲区。
+# 不测量进程内存：并发推理时 arena 的增长会被记到正在加载的角色上。共享权重 (关闭预打包) 时可调低。
+MODEL_MEMORY_OVERHEAD_FACTOR: float = float(os.getenv('Model_Memory_Overhead_Factor', '1.25'))
+# 完整 VITS -> (参考编码器, 解码器)。
+_VITS_SPLIT_FILES: dict[str, tuple[str, str]] = {
+    _GSVModelFile.VITS: (_GSVModelFile.VITS_REF_ENCODER, _GSVModelFile.VITS_DECODER),
+    _GSVModelFile.VITS_INT8: (_GSVModelFile.VITS_REF_ENCODER_INT8, _GSVModelFile.VITS_DECODER_INT8),
+}
+_STAGE_DECODER_LOOP_FILES: dict[str, str] = {
+    _GSVModelFile.T2S_STAGE_DECODER: _GSVModelFile.T2S_STAGE_DECODER_LOOP,
+    _GSVModelFile.T2S_STAGE_DECODER_INT8: _GSVModelFile.T2S_STAGE_DECODER_LOOP_INT8,
+}
+_STAGE_DECODER_STATIC_FILES: dict[str, str] = {
+    _GSVModelFile.T2S_STAGE_DECODER: _GSVModelFile.T2S_STAGE_DECODER_STATIC,
+    _GSVModelFile.T2S_STAGE_DECODER_INT8: _GSVModelFile.T2S_STAGE_DECODER_STATIC_INT8,
+}
+# 各精度下实际读取的文件：角色模型中的键 -> 文件名。
+_PRECISION_MODEL_FILES: dict[str, dict[str, str]] = {
+    'fp32': {
+        _GSVModelFile.T2S_ENCODER: _GSVModelFile.T2S_ENCODER,
+        _GSVModelFile.T2S_FIRST_STAGE_DECODER: _GSVModelFile.T2S_FIRST_STAGE_DECODER,
+        _GSVModelFile.T2S_STAGE_DECODER: _GSVModelFile.T2S_STAGE_DECODER,
+        _GSVModelFile.VITS: _GSVModelFile.VITS,
+    },
+    'int8': {
+        _GSVModelFile.T2S_ENCODER: _GSVModelFile.T2S_ENCODER,
+        _GSVModelFile.T2S_FIRST_STAGE_DECODER: _GSVModelFile.T2S_FIRST_STAGE_DECODER_INT8,
+        _GSVModelFile.T2S_STAGE_DECODER: _GSVModelFile.T2S_STAGE_DECODER_INT8,
+        _GSVModelFile.VITS: _GSVModelFile.VITS_INT8,
+    },
+}
 
 
 @dataclass
 class GSVModel:
-    T2S_ENCODER: InferenceSession
+    T2S_ENCODER: Optional[InferenceSession]  # 拆分成功时为 None，改用 T2S_PROMPT_ENCODER + T2S_TEXT_ENCODER
     T2S_FIRST_STAGE_DECODER: InferenceSession
-    T2S_STAGE_DECODER: InferenceSession
-    VITS: InferenceSession
+    T2S_STAGE_DECODER: Optional[InferenceSession]  # Loop 模式下为 None，改用 T2S_STAGE_DECODER_LOOP
+    VITS: Optional[InferenceSession]  # 拆分成功时为 None，改用 VITS_REF_ENCODER + VITS_DECODER
+    FINGERPRINT: str = ''  # 模型文件指纹，用于结果缓存等需要区分模型版本的场合
+    T2S_FINGERPRINT: str = ''  # 只覆盖 T2S 部分；仅更新声码器时保持不变
+    # 拆分后的编码器。存在时参考音频一侧的 prompts 只计算一次，缓存在 ReferenceAudio 上。
+    T2S_PROMPT_ENCODER: Optional[InferenceSession] = None
+    T2S_TEXT_ENCODER: Optional[InferenceSession] = None
+    # 拆分后的声码器。参考音频的音色条件只计算一次，缓存在 ReferenceAudio 上。
+    VITS_REF_ENCODER: Optional[InferenceSession] = None
+    VITS_DECODER: Optional[InferenceSession] = None
+    T2S_STAGE_DECODER_LOOP: Optional[InferenceSession] = None
+
+
+@dataclass
+class _CharacterStats:
+    size_bytes: int = 0  # 计入预算的大小：estimated_bytes × MODEL_MEMORY_OVERHEAD_FACTOR
+    estimated_bytes: int = 0  # estimate_model_bytes 按实际加载的文件估算的大小
+    load_seconds: float = 0.0  # 最近一次加载的耗时
+    loads: int = 0  # 加载次数，明显大于 1 说明预算不足、角色被反复淘汰后重新加载
+    hits: int = 0  # get() 直接命中驻留模型的次数
+    last_used: float = 0.0  # time.time()
 
 
 def convert_bin_to_fp32(
-        fp16_bin_path: str, output_fp32_bin_path: str
+        fp16_bin_path: str, output_fp32_bin_path: str, chunk_elements: int = 1 << 24
 ) -> None:
-    fp16_array = np.fromfile(fp16_bin_path, dtype=np.float16)
-    fp32_array = fp16_array.astype(np.float32)
-    fp32_array.tofile(output_fp32_bin_path)
+    # 分块转换，内存占用与权重文件大小无关。
+    fp16_array = np.memmap(fp16_bin_path, dtype=np.float16, mode='r')
+    with open(output_fp32_bin_path, 'wb') as f:
+        for start in range(0, fp16_array.shape[0], chunk_elements):
+            f.write(memoryview(fp16_array[start:start + chunk_elements].astype(np.float32)).cast('B'))
+    del fp16_array
+
+
+_T2S_MODEL_FILES: tuple[str, ...] = (_GSVModelFile.T2S_ENCODER,
+                                     _GSVModelFile.T2S_ENCODER_WEIGHT_FP32,
+                                     _GSVModelFile.T2S_FIRST_STAGE_DECODER,
+                                     _GSVModelFile.T2S_STAGE_DECODER,
+                                     _GSVModelFile.T2S_DECODER_WEIGHT_FP16)
+_VITS_MODEL_FILES: tuple[str, ...] = (_GSVModelFile.VITS,
+                                      _GSVModelFile.VITS_WEIGHT_FP16)
+_T2S_INT8_MODEL_FILES: tuple[str, ...] = (_GSVModelFile.T2S_ENCODER,
+                                          _GSVModelFile.T2S_ENCODER_WEIGHT_FP32,
+                                          _GSVModelFile.T2S_FIRST_STAGE_DECODER_INT8,
+                                          _GSVModelFile.T2S_STAGE_DECODER_INT8,
+                                          _GSVModelFile.T2S_DECODER_WEIGHT_FP16)
+_VITS_INT8_MODEL_FILES: tuple[str, ...] = (_GSVModelFile.VITS_INT8,)
+
+
+def fingerprint_model_dir(model_dir: str,
+                          filenames: tuple[str, ...] = _T2S_MODEL_FILES + _VITS_MODEL_FILES,
+                          head_bytes: int = 1 << 20) -> str:
+    """
+    计算模型目录的指纹。
+
+    对每个模型文件取 (文件名, 大小, 开头 head_bytes 字节) 做哈希，不读取整个权重文件，
+    转换器重新导出或替换任一文件都会改变指纹。运行时生成的 fp32 权重由 fp16 文件决定，因此不参与计算。
+    """
+    hasher = hashlib.sha256()
+    for filename in filenames:
+        path = os.path.join(model_dir, filename)
+        if not os.path.exists(path):
+            continue
+        hasher.update(filename.encode('utf-8'))
+        hasher.update(str(os.path.getsize(path)).encode('utf-8'))
+        with open(path, 'rb') as f:
+            hasher.update(f.read(head_bytes))
+    return hasher.hexdigest()
+
+
+def _external_data_locations(graph: onnx.GraphProto) -> set[str]:
+    locations: set[str] = set()
+    for tensor in graph.initializer:
+        if tensor.data_location == onnx.TensorProto.EXTERNAL:
+            locations.update(entry.value for entry in tensor.external_data if entry.key == 'location')
+    for node in graph.node:
+        for attribute in node.attribute:
+            subgraphs = [attribute.g] if attribute.type == onnx.AttributeProto.GRAPH else list(attribute.graphs)
+            for subgraph in subgraphs:
+                locations |= _external_data_locations(subgraph)
+    return locations
+
+
+def estimate_model_bytes(model_dir: str, filenames: list[str]) -> int:
+    """
+    估算加载这些模型后会话占用的内存：各 .onnx 文件与其引用的外部权重文件的大小之和，
+    多个模型共用的权重文件 (如 t2s_shared_fp32.bin) 只计一次。不包括推理时的中间张量。
+    """
+    paths: set[str] = set()
+    for filename in filenames:
+        path = os.path.normpath(os.path.join(model_dir, filename))
+        paths.add(path)
+        try:
+            model = onnx.load(path, load_external_data=False)
+        except Exception:
+            continue
+        paths.update(os.path.normpath(os.path.join(os.path.dirname(path), location))
+                     for location in _external_data_locations(model.graph))
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+def process_memory_bytes() -> Optional[int]:
+    """当前进程的常驻内存 (RSS)，仅用于报告。优先使用 psutil，其次读取 /proc/self/statm；都不可用时返回 None。"""
+    if psutil is not None:
+        try:
+            return psutil.Process().memory_info().rss
+        except Exception:
+            pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
 
 
 def download_model(filename: str, repo_id: str = 'Lux-Luna/LunaVox') -> Optional[str]:
@@ -82,16 +257,93 @@ def convert_bins_to_fp32(model_dir: str) -> None:
     logger.info("Successfully generated temporary FP32 weights to improve inference speed.")
 
 
+def _split_t2s_encoder(model_dir: str) -> bool:
+    """由转换器生成；旧版本转换器生成的模型目录中没有时，在加载时补上。"""
+    return split_t2s_encoder(os.path.join(model_dir, _GSVModelFile.T2S_ENCODER),
+                             os.path.join(model_dir, _GSVModelFile.T2S_PROMPT_ENCODER),
+                             os.path.join(model_dir, _GSVModelFile.T2S_TEXT_ENCODER))
+
+
+def _split_vits(model_dir: str, vits_filename: str = _GSVModelFile.VITS) -> bool:
+    """由转换器生成；旧版本转换器生成的模型目录中没有时，在加载时补上。"""
+    ref_encoder_filename, decoder_filename = _VITS_SPLIT_FILES[vits_filename]
+    return split_vits(os.path.join(model_dir, vits_filename),
+                      os.path.join(model_dir, ref_encoder_filename),
+                      os.path.join(model_dir, decoder_filename))
+
+
+def _build_stage_decoder_loop(model_dir: str, stage_filename: str = _GSVModelFile.T2S_STAGE_DECODER) -> bool:
+    """由转换器生成；旧版本转换器生成的模型目录中没有时，在加载时补上。"""
+    return build_stage_decoder_loop(os.path.join(model_dir, stage_filename),
+                                    os.path.join(model_dir, _STAGE_DECODER_LOOP_FILES[stage_filename]))
+
+
+def _build_static_kv_decoder(model_dir: str, stage_filename: str = _GSVModelFile.T2S_STAGE_DECODER) -> bool:
+    """由转换器生成；旧版本转换器生成的模型目录中没有时，在加载时补上。"""
+    return build_static_kv_decoder(os.path.join(model_dir, stage_filename),
+                                   os.path.join(model_dir, _STAGE_DECODER_STATIC_FILES[stage_filename]))
+
+
 class ModelManager:
     def __init__(self):
-        capacity_str = os.getenv('Max_Cached_Character_Models', '3')
-        self.character_to_model: dict[str, dict[str, InferenceSession]] = LRUCacheDict(
-            capacity=int(capacity_str))
+        capacity_str = os.getenv('Max_Cached_Character_Models', '0' if MAX_CHARACTER_MODELS_MB > 0 else '3')
+        # 条目大小见 _CharacterStats.size_bytes。淘汰或移除时释放该角色的会话；固定的角色不会被淘汰。
+        self.character_to_model: LRUCache[str, dict[str, InferenceSession]] = LRUCache(
+            capacity=int(capacity_str),
+            max_bytes=int(MAX_CHARACTER_MODELS_MB * (1 << 20)),
+            on_remove=self._release_sessions,
+            name='Character model cache',
+        )
+        # 每个角色一把加载锁：同一角色不会被并发加载两次，不同角色的加载 (含图手术) 可以并行。
+        self._load_locks: dict[str, threading.RLock] = {}
+        self._load_locks_guard: threading.Lock = threading.Lock()
+        self.character_stats: dict[str, _CharacterStats] = {}
         self.character_model_paths: dict[str, str] = {}  # 创建一个持久化字典来存储角色模型路径
+        self.character_fingerprints: dict[str, tuple[str, str]] = {}  # (完整模型指纹, T2S 指纹)
+        self.character_precisions: dict[str, str] = {}  # 实际加载的精度，重新加载时沿用
         self.providers = ["CPUExecutionProvider"]
 
         self.cn_hubert: Optional[InferenceSession] = None
 
+        self.sess_options: onnxruntime.SessionOptions = SESS_OPTIONS
+        self._shared_weight_maps: dict[str, mmap.mmap] = {}
+
+    def configure_sessions(self, share_weights: bool = False, intra_op_num_threads: int = 0) -> None:
+        """
+        设置之后创建的所有 InferenceSession 的选项。
+
+        share_weights 为 True 时关闭权重预打包 (prepacking)。预打包会把矩阵权重复制到进程私有内存中；
+        关闭后 ORT 直接使用 mmap 映射的外部权重文件 (.bin)，同一台机器上的多个进程共享同一份物理内存页。
+        """
+        options = onnxruntime.SessionOptions()
+        options.log_severity_level = 3
+        if intra_op_num_threads > 0:
+            options.intra_op_num_threads = intra_op_num_threads
+        if share_weights:
+            options.add_session_config_entry('session.disable_prepacking', '1')
+        self.sess_options = options
+
+    def prepare_shared_weights(self, model_dir: str) -> None:
+        """
+        在派生工作进程之前于父进程中调用：生成 fp32 权重文件，并将其映射进页缓存。
+        子进程随后加载同一目录时，外部权重直接命中这些共享页，不会按进程数成倍占用内存。
+        """
+        convert_bins_to_fp32(model_dir)
+        _split_t2s_encoder(model_dir)
+        _split_vits(model_dir)
+        for filename in (_GSVModelFile.T2S_ENCODER_WEIGHT_FP32,
+                         _GSVModelFile.T2S_DECODER_WEIGHT_FP32,
+                         _GSVModelFile.VITS_WEIGHT_FP32):
+            path = os.path.normpath(os.path.join(model_dir, filename))
+            if path in self._shared_weight_maps or not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                weight_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(weight_map, 'madvise') and hasattr(mmap, 'MADV_WILLNEED'):
+                weight_map.madvise(mmap.MADV_WILLNEED)  # 预读入页缓存
+            self._shared_weight_maps[path] = weight_map
+        logger.info(f"Shared weights prepared for: {os.path.abspath(model_dir)}")
+
     def load_cn_hubert(self) -> bool:
         model_path: Optional[str] = os.getenv("HUBERT_MODEL_PATH")
         if not (model_path and os.path.isfile(model_path)):
@@ -105,7 +357,7 @@ class ModelManager:
         try:
             self.cn_hubert = onnxruntime.InferenceSession(model_path,
                                                           providers=self.providers,
-                                                          sess_options=SESS_OPTIONS)
+                                                          sess_options=self.sess_options)
             logger.info("Successfully loaded CN_HuBERT model.")
             return True
         except Exception as e:
@@ -115,50 +367,146 @@ class ModelManager:
             )
         return False
 
+    @staticmethod
+    def _release_sessions(character_name: str, model_dict: dict[str, InferenceSession]) -> None:
+        # 不清空 model_dict：get() 可能刚取到它、正在构建 GSVModel。缓存不再引用它之后，
+        # 会话在最后一个使用它的请求 (GSVModel) 结束时随之释放。
+        gc.collect()
+        logger.info(f"Models of character '{character_name}' released from memory.")
+
     def get(self, character_name: str) -> Optional[GSVModel]:
-        if character_name in self.character_to_model:
-            model_map = self.character_to_model[character_name]
-            return GSVModel(
-                T2S_ENCODER=model_map[_GSVModelFile.T2S_ENCODER],
-                T2S_FIRST_STAGE_DECODER=model_map[_GSVModelFile.T2S_FIRST_STAGE_DECODER],
-                T2S_STAGE_DECODER=model_map[_GSVModelFile.T2S_STAGE_DECODER],
-                VITS=model_map[_GSVModelFile.VITS]
-            )
+        model_map = self.character_to_model.get(character_name)
+        if model_map is not None:
+            stats = self.character_stats.get(character_name)
+            if stats is not None:
+                stats.hits += 1
+                stats.last_used = time.time()
+            return self._gsv_model(character_name, model_map)
         if character_name in self.character_model_paths:
             model_dir = self.character_model_paths[character_name]
-            if self.load_character(character_name, model_dir):
-                return self.get(character_name)
+            precision = self.character_precisions.get(character_name)
+            if self.load_character(character_name, model_dir, precision):
+                model_map = self.character_to_model.peek(character_name)
+                return self._gsv_model(character_name, model_map) if model_map is not None else None
             else:
                 del self.character_model_paths[character_name]  # 如果重载失败，可以考虑从路径记录中移除，防止反复失败
                 return None
         return None
 
+    def _gsv_model(self, character_name: str, model_map: dict[str, InferenceSession]) -> GSVModel:
+        fingerprint, t2s_fingerprint = self.character_fingerprints.get(character_name, ('', ''))
+        return GSVModel(
+            T2S_ENCODER=model_map.get(_GSVModelFile.T2S_ENCODER),
+            T2S_FIRST_STAGE_DECODER=model_map[_GSVModelFile.T2S_FIRST_STAGE_DECODER],
+            T2S_STAGE_DECODER=model_map.get(_GSVModelFile.T2S_STAGE_DECODER),
+            VITS=model_map.get(_GSVModelFile.VITS),
+            FINGERPRINT=fingerprint,
+            T2S_FINGERPRINT=t2s_fingerprint,
+            T2S_PROMPT_ENCODER=model_map.get(_GSVModelFile.T2S_PROMPT_ENCODER),
+            T2S_TEXT_ENCODER=model_map.get(_GSVModelFile.T2S_TEXT_ENCODER),
+            VITS_REF_ENCODER=model_map.get(_GSVModelFile.VITS_REF_ENCODER),
+            VITS_DECODER=model_map.get(_GSVModelFile.VITS_DECODER),
+            T2S_STAGE_DECODER_LOOP=model_map.get(_GSVModelFile.T2S_STAGE_DECODER_LOOP),
+        )
+
     def has_character(self, character_name: str) -> bool:
         character_name = character_name.lower()
         return character_name in self.character_model_paths
 
-    def load_character(self, character_name: str, model_dir: str) -> bool:
-        character_name = character_name.lower()
-        if character_name in self.character_to_model:
-            logger.info(f"Character '{character_name}' is already in cache; no need to reload.")
-            _ = self.character_to_model[character_name]  # 访问一次以更新其在LRU缓存中的位置
-            return True
+    @staticmethod
+    def _resolve_precision(model_dir: str, precision: Optional[str]) -> str:
+        precision = (precision or DEFAULT_MODEL_PRECISION).lower()
+        if precision not in SUPPORTED_PRECISIONS:
+            raise ValueError(f"Unsupported model precision '{precision}'. Expected one of {SUPPORTED_PRECISIONS}.")
+        if precision == 'int8':
+            missing = [name for name in _PRECISION_MODEL_FILES['int8'].values()
+                       if not os.path.exists(os.path.join(model_dir, name))]
+            if missing:
+                logger.warning(f"INT8 models not found in {model_dir} ({', '.join(missing)}); falling back to FP32. "
+                               f"Run convert_to_onnx(..., quantize=True) to generate them.")
+                return 'fp32'
+        return precision
+
+    def _load_optional_sessions(self, model_dir: str, model_dict: dict[str, InferenceSession],
+                                loaded_files: dict[str, str], *entries: tuple[str, str]) -> bool:
+        """加载一组由原模型派生的可选模型 (拆分子图 / Loop 解码器)，全部成功才写入 model_dict。"""
+        sessions: dict[str, InferenceSession] = {}
+        for model_key, model_file in entries:
+            model_path = os.path.normpath(os.path.join(model_dir, model_file))
+            try:
+                sessions[model_key] = onnxruntime.InferenceSession(model_path,
+                                                                   providers=self.providers,
+                                                                   sess_options=self.sess_options)
+            except Exception as e:
+                logger.warning(f"Failed to load derived model '{model_path}'; using the original model instead. "
+                               f"Details: {e}")
+                return False
+        model_dict.update(sessions)
+        loaded_files.update(entries)
+        logger.info(f"Derived models loaded successfully: {', '.join(file for _, file in entries)}")
+        return True
 
+    def load_character(self, character_name: str, model_dir: str, precision: Optional[str] = None,
+                       pinned: bool = False) -> bool:
+        """
+        precision 为 'fp32' 或 'int8'，未指定时使用环境变量 Model_Precision (默认 fp32)。
+        INT8 模型不存在时回退到 FP32。pinned 为 True 时固定该角色，不会因内存预算被淘汰。
+        """
+        character_name = character_name.lower()
+        with self._load_lock(character_name):
+            if character_name in self.character_to_model:
+                logger.info(f"Character '{character_name}' is already in cache; no need to reload.")
+                self.character_to_model.get(character_name)  # 访问一次以更新其在LRU缓存中的位置
+                if pinned:
+                    self.pin_character(character_name)
+                return True
+            return self._load_character(character_name, model_dir, precision, pinned)
+
+    def _load_lock(self, character_name: str) -> threading.RLock:
+        with self._load_locks_guard:
+            return self._load_locks.setdefault(character_name, threading.RLock())
+
+    def _load_character(self, character_name: str, model_dir: str, precision: Optional[str], pinned: bool) -> bool:
+        start_time = time.perf_counter()
+        precision = self._resolve_precision(model_dir, precision)
+        # 编码器始终使用 fp32 外部权重；INT8 的解码器与声码器权重内嵌在 .onnx 中。
         convert_bins_to_fp32(model_dir)
 
+        model_files: dict[str, str] = dict(_PRECISION_MODEL_FILES[precision])
+        # 由原模型派生的可选模型：(被替换的键, 成组加载的 (键, 文件))。拆分后的子图成组加载，任一失败都退回完整模型。
+        derived: list[tuple[str, tuple[tuple[str, str], ...]]] = []
+        if _split_t2s_encoder(model_dir):
+            derived.append((_GSVModelFile.T2S_ENCODER,
+                            ((_GSVModelFile.T2S_PROMPT_ENCODER, _GSVModelFile.T2S_PROMPT_ENCODER),
+                             (_GSVModelFile.T2S_TEXT_ENCODER, _GSVModelFile.T2S_TEXT_ENCODER))))
+        vits_filename = model_files[_GSVModelFile.VITS]
+        if _split_vits(model_dir, vits_filename):
+            ref_encoder_filename, decoder_filename = _VITS_SPLIT_FILES[vits_filename]
+            derived.append((_GSVModelFile.VITS,
+                            ((_GSVModelFile.VITS_REF_ENCODER, ref_encoder_filename),
+                             (_GSVModelFile.VITS_DECODER, decoder_filename))))
+        stage_filename = model_files[_GSVModelFile.T2S_STAGE_DECODER]
+        if T2S_DECODE_MODE == 'loop' and _build_stage_decoder_loop(model_dir, stage_filename):
+            derived.append((_GSVModelFile.T2S_STAGE_DECODER,
+                            ((_GSVModelFile.T2S_STAGE_DECODER_LOOP, _STAGE_DECODER_LOOP_FILES[stage_filename]),)))
+        elif T2S_DECODE_MODE == 'static' and _build_static_kv_decoder(model_dir, stage_filename):
+            # 接口与 stage decoder 兼容 (多一个 kv_pos 输入)，直接替换它；推理引擎根据输入名识别。
+            derived.append((_GSVModelFile.T2S_STAGE_DECODER,
+                            ((_GSVModelFile.T2S_STAGE_DECODER, _STAGE_DECODER_STATIC_FILES[stage_filename]),)))
+
         model_dict: dict[str, InferenceSession] = {}
-        model_filename: list[str] = [_GSVModelFile.T2S_ENCODER,
-                                     _GSVModelFile.T2S_FIRST_STAGE_DECODER,
-                                     _GSVModelFile.T2S_STAGE_DECODER,
-                                     _GSVModelFile.VITS]
+        loaded_files: dict[str, str] = {}  # 实际加载的文件，用于估算内存占用
+        for replaced_key, entries in derived:
+            if self._load_optional_sessions(model_dir, model_dict, loaded_files, *entries):
+                del model_files[replaced_key]  # 不再需要原模型
 
-        for model_file in model_filename:
+        for model_key, model_file in model_files.items():
             model_path: str = os.path.join(model_dir, model_file)
             model_path = os.path.normpath(model_path)
             try:
-                model_dict[model_file] = onnxruntime.InferenceSession(model_path,
+                model_dict[model_key] = onnxruntime.InferenceSession(model_path,
                                                                       providers=self.providers,
-                                                                      sess_options=SESS_OPTIONS)
+                                                                      sess_options=self.sess_options)
                 logger.info(f"Model loaded successfully: {model_path}")
             except Exception as e:
                 logger.error(
@@ -167,19 +515,82 @@ class ModelManager:
                 )
                 return False
 
-        self.character_to_model[character_name] = model_dict
+        loaded_files.update(model_files)
+        estimated_bytes = estimate_model_bytes(model_dir, list(loaded_files.values()))
+        size_bytes = int(estimated_bytes * MODEL_MEMORY_OVERHEAD_FACTOR)
+        # 会话全部创建成功后才写入缓存，超出预算的旧角色在此时被淘汰；加载失败不会淘汰任何角色。
+        self.character_to_model.put(character_name, model_dict, size=size_bytes)
+        if pinned:
+            self.character_to_model.pin(character_name)
+        stats = self.character_stats.setdefault(character_name, _CharacterStats())
+        stats.size_bytes = size_bytes
+        stats.estimated_bytes = estimated_bytes
+        stats.load_seconds = time.perf_counter() - start_time
+        stats.loads += 1
+        stats.last_used = time.time()
         self.character_model_paths[character_name] = model_dir
+        self.character_precisions[character_name] = precision
+        if precision == 'int8':
+            t2s_files, vits_files = _T2S_INT8_MODEL_FILES, _VITS_INT8_MODEL_FILES
+        else:
+            t2s_files, vits_files = _T2S_MODEL_FILES, _VITS_MODEL_FILES
+        self.character_fingerprints[character_name] = (fingerprint_model_dir(model_dir, t2s_files + vits_files),
+                                                       fingerprint_model_dir(model_dir, t2s_files))
+        logger.info(f"Character '{character_name}' loaded with {precision.upper()} models "
+                    f"(~{size_bytes / (1 << 20):.0f} MB, {stats.load_seconds:.1f} s).")
 
         if not context.current_speaker:
             context.current_speaker = character_name
 
         return True
 
+    def pin_character(self, character_name: str, pinned: bool = True) -> bool:
+        """固定或取消固定一个角色。固定时若该角色已被淘汰则重新加载；角色从未加载过时返回 False。"""
+        character_name = character_name.lower()
+        if not pinned:
+            if self.character_to_model.is_pinned(character_name):
+                self.character_to_model.unpin(character_name)
+            return True
+        if character_name not in self.character_to_model and self.get(character_name) is None:
+            return False
+        if not self.character_to_model.is_pinned(character_name):
+            self.character_to_model.pin(character_name)
+        return True
+
+    def residency(self) -> dict:
+        """已知角色的驻留情况 (是否在内存中、是否固定、计入预算与估算的大小、加载耗时、命中次数)、整体预算与进程内存。"""
+        cache_stats = self.character_to_model.stats()
+        characters: list[dict] = []
+        for character_name, model_dir in list(self.character_model_paths.items()):
+            stats = self.character_stats.get(character_name, _CharacterStats())
+            characters.append({
+                'character_name': character_name,
+                'model_dir': model_dir,
+                'precision': self.character_precisions.get(character_name),
+                'resident': character_name in self.character_to_model,
+                'pinned': self.character_to_model.is_pinned(character_name),
+                'size_mb': round(stats.size_bytes / (1 << 20), 1),
+                'estimated_mb': round(stats.estimated_bytes / (1 << 20), 1),
+                'load_seconds': round(stats.load_seconds, 3),
+                'loads': stats.loads,
+                'hits': stats.hits,
+                'last_used': stats.last_used,
+            })
+        process_bytes = process_memory_bytes()
+        return {
+            'budget_mb': MAX_CHARACTER_MODELS_MB,
+            'resident_mb': round(cache_stats['bytes'] / (1 << 20), 1),
+            'process_rss_mb': round(process_bytes / (1 << 20), 1) if process_bytes is not None else None,
+            'max_characters': self.character_to_model.capacity,
+            'hits': cache_stats['hits'],
+            'misses': cache_stats['misses'],
+            'evictions': cache_stats['evictions'],
+            'characters': characters,
+        }
+
     def remove_character(self, character_name: str) -> None:
         character_name = character_name.lower()
-        if character_name in self.character_to_model:
-            del self.character_to_model[character_name]
-            gc.collect()
+        if self.character_to_model.pop(character_name) is not None:
             logger.info(f"Character {character_name.capitalize()} removed successfully.")
 
     def clean_cache(self) -> None:
@@ -1,22 +1,39 @@
 import asyncio
+import json
 import os
+import signal
+import socket
+import threading
 from typing import AsyncIterator, Optional, Callable, Union
 import logging
 
 import uvicorn
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from .Audio.ReferenceAudio import ReferenceAudio
-from .Core.TTSPlayer import tts_player
+from .Audio.StreamEncoder import StreamEncoder, create_stream_encoder, encoder_pool
+from .Core.Cancellation import CancellationToken
+from .Core.TextSplitter import IncrementalSentenceSplitter
+from .Core.TTSPlayer import TTSPlayer, tts_player, AUDIO_QUEUE_MAX_CHUNKS
 from .ModelManager import model_manager
 from .Utils.Shared import context
+from .Utils.Utils import put_threadsafe_with_backpressure
 
 logger = logging.getLogger(__name__)
 
 _reference_audios: dict[str, dict] = {}
 SUPPORTED_AUDIO_EXTS = {'.wav', '.flac', '.ogg', '.aiff', '.aif'}
+# 客户端断开检测的轮询间隔 (秒)
+DISCONNECT_POLL_INTERVAL_S = 0.5
+# /tts 返回响应后，若服务器在这段时间内仍未开始发送它 (秒)，视为没有消费者，取消合成。
+CONSUMER_ATTACH_TIMEOUT_S = 30.0
+
+# 正在进行或排队中的 /tts 请求：request_id -> 取消令牌
+_active_requests: dict[str, CancellationToken] = {}
+# tts_player 同一时间只能服务一个会话，并发请求在此排队
+_tts_session_lock = threading.Lock()
 
 app = FastAPI()
 
@@ -24,23 +41,44 @@ app = FastAPI()
 class CharacterPayload(BaseModel):
     character_name: str
     onnx_model_dir: str
+    precision: Optional[str] = None  # fp32 / int8
+    pinned: bool = False
 
 
 class UnloadCharacterPayload(BaseModel):
     character_name: str
 
 
+class PinCharacterPayload(BaseModel):
+    character_name: str
+    pinned: bool = True
+
+
 class ReferenceAudioPayload(BaseModel):
     character_name: str
     audio_path: str
     audio_text: str
 
 
+class ReferenceClip(BaseModel):
+    audio_path: str
+    audio_text: str
+    audio_language: Optional[str] = None
+
+
+class RegisterReferenceAudiosPayload(BaseModel):
+    clips: list[ReferenceClip]
+    decode_workers: int = 0
+
+
 class TTSPayload(BaseModel):
     character_name: str
     text: str
     split_sentence: bool = False
     save_path: Optional[str] = None
+    request_id: Optional[str] = None
+    format: str = "wav"  # pcm / wav / opus / mp3
+    reuse_semantic_tokens: bool = False  # 复用 (并缓存) 同一文本已生成的语义 token，只重新运行声码器
 
 
 @app.post("/load_character")
@@ -49,6 +87,8 @@ def load_character_endpoint(payload: CharacterPayload):
         model_manager.load_character(
             character_name=payload.character_name,
             model_dir=payload.onnx_model_dir,
+            precision=payload.precision,
+            pinned=payload.pinned,
         )
         return {"status": "success", "message": f"Character '{payload.character_name}' loaded."}
     except Exception as e:
@@ -64,6 +104,19 @@ def unload_character_endpoint(payload: UnloadCharacterPayload):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/pin_character")
+def pin_character_endpoint(payload: PinCharacterPayload):
+    if not model_manager.pin_character(payload.character_name, payload.pinned):
+        raise HTTPException(status_code=404, detail=f"Character '{payload.character_name}' has not been loaded.")
+    state = "pinned" if payload.pinned else "unpinned"
+    return {"status": "success", "message": f"Character '{payload.character_name}' {state}."}
+
+
+@app.get("/models")
+def models_endpoint():
+    return model_manager.residency()
+
+
 @app.post("/set_reference_audio")
 def set_reference_audio_endpoint(payload: ReferenceAudioPayload):
     ext = os.path.splitext(payload.audio_path)[1].lower()
@@ -79,50 +132,150 @@ def set_reference_audio_endpoint(payload: ReferenceAudioPayload):
     return {"status": "success", "message": f"Reference audio for '{payload.character_name}' set."}
 
 
+@app.post("/register_reference_audios")
+def register_reference_audios_endpoint(payload: RegisterReferenceAudiosPayload):
+    clips: list[tuple[str, str, str]] = []
+    for clip in payload.clips:
+        ext = os.path.splitext(clip.audio_path)[1].lower()
+        if ext not in SUPPORTED_AUDIO_EXTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Audio format '{ext}' of '{clip.audio_path}' is not supported. "
+                       f"Supported formats: {SUPPORTED_AUDIO_EXTS}",
+            )
+        clips.append((clip.audio_path, clip.audio_text, clip.audio_language or 'auto'))
+    try:
+        registered = ReferenceAudio.register_many(clips, decode_workers=payload.decode_workers)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "success", "registered": len(registered), "failed": len(clips) - len(registered)}
+
+
 def run_tts_in_background(
         character_name: str,
         text: str,
         split_sentence: bool,
         save_path: Optional[str],
-        chunk_callback: Callable[[Optional[bytes]], None]
+        chunk_callback: Callable[[Optional[bytes]], None],
+        cancel_token: CancellationToken,
+        reuse_semantic_tokens: bool = False,
 ):
-    try:
-        context.current_speaker = character_name
-        context.current_prompt_audio = ReferenceAudio(
-            prompt_wav=_reference_audios[character_name]['audio_path'],
-            prompt_text=_reference_audios[character_name]['audio_text'],
-        )
-        tts_player.start_session(
-            play=False,
-            split=split_sentence,
-            save_path=save_path,
-            chunk_callback=chunk_callback,
-        )
-        tts_player.feed(text)
-        tts_player.end_session()
-        tts_player.wait_for_tts_completion()
-    except Exception as e:
-        logger.error(f"Error in TTS background task: {e}", exc_info=True)
-
-
-async def audio_stream_generator(queue: asyncio.Queue) -> AsyncIterator[bytes]:
-    while True:
-        chunk = await queue.get()
-        if chunk is None:
-            break
-        yield chunk
+    with _tts_session_lock:
+        if cancel_token.is_cancelled():  # 排队期间已被取消或客户端已断开
+            chunk_callback(None)
+            return
+        try:
+            context.current_speaker = character_name
+            context.current_prompt_audio = ReferenceAudio(
+                prompt_wav=_reference_audios[character_name]['audio_path'],
+                prompt_text=_reference_audios[character_name]['audio_text'],
+            )
+            tts_player.start_session(
+                play=False,
+                split=split_sentence,
+                save_path=save_path,
+                chunk_callback=chunk_callback,
+                cancel_token=cancel_token,
+                reuse_semantic_tokens=reuse_semantic_tokens,
+            )
+            tts_player.feed(text)
+            tts_player.end_session()
+            tts_player.wait_for_tts_completion()
+        except Exception as e:
+            logger.error(f"Error in TTS background task: {e}", exc_info=True)
+            chunk_callback(None)
+
+
+async def _encode(encoder: StreamEncoder, method: Callable[..., bytes], *args) -> bytes:
+    if encoder.needs_worker:
+        return await asyncio.get_running_loop().run_in_executor(encoder_pool, method, *args)
+    return method(*args)
+
+
+class _TTSStreamingResponse(StreamingResponse):
+    """
+    /tts 的流式响应，同时负责请求结束后的清理。
+
+    清理放在 __call__ 的 finally 中而不是生成器里：发送响应头失败或客户端先断开时，Starlette 不会开始迭代
+    生成器，生成器的 finally 也就不会执行。响应迟迟没有被发送时 (见 CONSUMER_ATTACH_TIMEOUT_S)，同样会清理。
+    """
+
+    def __init__(self, queue: asyncio.Queue, request: Request, cancel_token: CancellationToken,
+                 encoder: StreamEncoder, **kwargs):
+        super().__init__(self._stream(queue, request), media_type=encoder.media_type, **kwargs)
+        self.cancel_token: CancellationToken = cancel_token
+        self.encoder: StreamEncoder = encoder
+        self.attached: bool = False  # 服务器已开始发送本响应
+        self.completed: bool = False  # 音频已全部发送
+
+    async def __call__(self, scope, receive, send) -> None:
+        self.attached = True
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.release()
+
+    def release_if_unattached(self) -> None:
+        if not self.attached:
+            logger.warning(f"Response of request '{self.cancel_token.request_id}' was never sent; cancelling it.")
+            self.release()
+
+    def release(self) -> None:
+        # 未完整发送时立即取消合成：TTS 工作线程在背压等待中看到取消后放弃投递，并释放 _tts_session_lock。
+        if not self.completed:
+            self.cancel_token.cancel()
+        _active_requests.pop(self.cancel_token.request_id, None)
+        self.encoder.close()
+
+    async def _stream(self, queue: asyncio.Queue, request: Request) -> AsyncIterator[bytes]:
+        while True:
+            try:
+                chunk = await asyncio.wait_for(queue.get(), timeout=DISCONNECT_POLL_INTERVAL_S)
+            except asyncio.TimeoutError:
+                if self.cancel_token.is_cancelled() or await request.is_disconnected():
+                    return
+                continue
+            if chunk is None:
+                break
+            data = await _encode(self.encoder, self.encoder.encode, chunk)
+            if data:
+                yield data
+        tail = await _encode(self.encoder, self.encoder.flush)
+        self.completed = True
+        if tail:
+            yield tail
 
 
 @app.post("/tts")
-async def tts_endpoint(payload: TTSPayload):
+async def tts_endpoint(payload: TTSPayload, request: Request):
     if payload.character_name not in _reference_audios:
         raise HTTPException(status_code=404, detail="Character not found or reference audio not set.")
+    if payload.request_id and payload.request_id in _active_requests:
+        raise HTTPException(status_code=409, detail=f"Request '{payload.request_id}' is already in progress.")
+    try:
+        encoder = create_stream_encoder(payload.format, sample_rate=tts_player.sample_rate,
+                                        channels=tts_player.channels)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    cancel_token = CancellationToken(payload.request_id)
+    _active_requests[cancel_token.request_id] = cancel_token
 
     loop = asyncio.get_running_loop()
-    stream_queue: asyncio.Queue[Union[bytes, None]] = asyncio.Queue()
+    stream_queue: asyncio.Queue[Union[bytes, None]] = asyncio.Queue(maxsize=AUDIO_QUEUE_MAX_CHUNKS)
+    response = _TTSStreamingResponse(
+        stream_queue, request, cancel_token, encoder,
+        headers={
+            "X-Request-ID": cancel_token.request_id,
+            "X-Sample-Rate": str(encoder.output_sample_rate),
+            "X-Channels": str(tts_player.channels),
+        },
+    )
+    loop.call_later(CONSUMER_ATTACH_TIMEOUT_S, response.release_if_unattached)
 
     def tts_chunk_callback(chunk: Optional[bytes]):
-        loop.call_soon_threadsafe(stream_queue.put_nowait, chunk)
+        # 队列满时阻塞 TTS 工作线程，客户端读取变慢时合成也随之暂停；响应结束 (含从未发送) 时取消令牌，随即放弃。
+        put_threadsafe_with_backpressure(loop, stream_queue, chunk, cancel_token.is_cancelled)
 
     loop.run_in_executor(
         None,
@@ -131,15 +284,207 @@ async def tts_endpoint(payload: TTSPayload):
         payload.text,
         payload.split_sentence,
         payload.save_path,
-        tts_chunk_callback
+        tts_chunk_callback,
+        cancel_token,
+        payload.reuse_semantic_tokens,
     )
-
-    return StreamingResponse(audio_stream_generator(stream_queue), media_type="audio/wav")
+    return response
+
+
+class _WebSocketTTSSession:
+    """
+    一个 WebSocket 连接上的双向流式会话：客户端逐段发送文本，服务器在同一连接上回传音频块。
+
+    客户端消息（JSON 文本帧）：
+        {"type": "start", "character_name": ..., "language": ..., "format": ..., "request_id": ...,
+         "reuse_semantic_tokens": false}
+        {"type": "text", "text": ...}   增量文本，句子完整后才送入合成
+        {"type": "flush"}               立即合成缓冲区中尚未成句的文本
+        {"type": "end"}                 结束当前语句
+        {"type": "cancel"}              取消当前语句，丢弃尚未发送的音频
+    服务器消息：音频为二进制帧；状态为 JSON 文本帧，type 为 started / done / cancelled / error。
+    每个连接拥有独立的 TTSPlayer，因此不同连接之间互不影响。
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket: WebSocket = websocket
+        self.loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        self.player: TTSPlayer = TTSPlayer()
+        self.audio_queue: asyncio.Queue = asyncio.Queue(maxsize=AUDIO_QUEUE_MAX_CHUNKS)
+        self.splitter: Optional[IncrementalSentenceSplitter] = None
+        self.encoder: Optional[StreamEncoder] = None
+        self.cancel_token: Optional[CancellationToken] = None
+        self.utterance_open: bool = False
+        self.idle: asyncio.Event = asyncio.Event()  # 上一条语句的音频全部发送完毕后置位
+        self.idle.set()
+        self.closed: bool = False
+
+    async def run(self) -> None:
+        sender = asyncio.create_task(self._send_audio())
+        try:
+            while True:
+                frame = await self.websocket.receive()
+                if frame["type"] == "websocket.disconnect":
+                    break
+                raw = frame.get("text")
+                if raw is None:  # 二进制帧
+                    await self._send_error("Messages must be JSON text frames, not binary frames.")
+                    continue
+                try:
+                    message = json.loads(raw)
+                except ValueError:
+                    await self._send_error("Messages must be JSON objects.")
+                    continue
+                await self._handle(message)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self.closed = True
+            if self.cancel_token is not None:
+                self.cancel_token.cancel()
+                _active_requests.pop(self.cancel_token.request_id, None)
+            sender.cancel()
+            if self.encoder is not None:
+                self.encoder.close()
+            await self.loop.run_in_executor(None, self.player.close)
+
+    async def _handle(self, message: dict) -> None:
+        message_type = message.get("type") if isinstance(message, dict) else None
+        if message_type == "start":
+            await self._start(message)
+        elif message_type in ("text", "flush", "end", "cancel"):
+            if not self.utterance_open:
+                await self._send_error("No utterance in progress. Send a 'start' message first.")
+                return
+            if message_type == "text":
+                self._feed(self.splitter.push(str(message.get("text", ""))))
+            elif message_type == "flush":
+                self._feed(self.splitter.flush())
+            elif message_type == "end":
+                self._feed(self.splitter.flush())
+                self.player.end_session()
+                self.utterance_open = False
+            else:
+                self.cancel_token.cancel()
+                self.splitter.clear()
+                self.player.end_session()
+                self.utterance_open = False
+        else:
+            await self._send_error(f"Unknown message type '{message_type}'.")
+
+    async def _start(self, message: dict) -> None:
+        if self.utterance_open:
+            await self._send_error("An utterance is already in progress. Send 'end' or 'cancel' first.")
+            return
+        character_name = message.get("character_name")
+        if character_name not in _reference_audios:
+            await self._send_error("Character not found or reference audio not set.")
+            return
+        request_id = message.get("request_id")
+        if request_id and request_id in _active_requests:
+            await self._send_error(f"Request '{request_id}' is already in progress.")
+            return
+        try:
+            encoder = create_stream_encoder(message.get("format", "pcm"), sample_rate=self.player.sample_rate,
+                                            channels=self.player.channels)
+        except (ValueError, RuntimeError) as e:
+            await self._send_error(str(e))
+            return
+
+        await self.idle.wait()  # 等待上一条语句（例如刚被取消的）收尾
+        language = message.get("language") or context.current_language
+        prompt_audio = await self.loop.run_in_executor(
+            None,
+            ReferenceAudio,
+            _reference_audios[character_name]['audio_path'],
+            _reference_audios[character_name]['audio_text'],
+        )
+        cancel_token = CancellationToken(request_id)
+        _active_requests[cancel_token.request_id] = cancel_token
+        self.cancel_token = cancel_token
+        self.encoder = encoder
+        self.splitter = IncrementalSentenceSplitter(language)
+        self.idle.clear()
+        self.player.start_session(
+            play=False,
+            split=False,
+            chunk_callback=self._make_chunk_callback(cancel_token),
+            cancel_token=cancel_token,
+            speaker=character_name,
+            prompt_audio=prompt_audio,
+            language=language,
+            reuse_semantic_tokens=bool(message.get("reuse_semantic_tokens", False)),
+        )
+        self.utterance_open = True
+        await self.websocket.send_json({
+            "type": "started",
+            "request_id": cancel_token.request_id,
+            "media_type": encoder.media_type,
+            "sample_rate": encoder.output_sample_rate,
+            "channels": self.player.channels,
+        })
+
+    def _feed(self, sentences: list[str]) -> None:
+        for sentence in sentences:
+            self.player.feed(sentence)
+
+    def _make_chunk_callback(self, cancel_token: CancellationToken) -> Callable[[Optional[bytes]], None]:
+        def chunk_callback(chunk: Optional[bytes]):
+            # 结束标记必须送达发送协程，否则 idle 永远不会置位；音频块在取消后可以直接丢弃。
+            if chunk is None:
+                put_threadsafe_with_backpressure(self.loop, self.audio_queue, (cancel_token, None),
+                                                 lambda: self.closed)
+            else:
+                put_threadsafe_with_backpressure(self.loop, self.audio_queue, (cancel_token, chunk),
+                                                 lambda: self.closed or cancel_token.is_cancelled())
+
+        return chunk_callback
+
+    async def _send_audio(self) -> None:
+        while True:
+            cancel_token, chunk = await self.audio_queue.get()
+            if chunk is not None:
+                if not cancel_token.is_cancelled():
+                    data = await _encode(self.encoder, self.encoder.encode, chunk)
+                    if data:
+                        await self.websocket.send_bytes(data)
+                continue
+
+            if cancel_token.is_cancelled():
+                self.encoder.close()
+                await self.websocket.send_json({"type": "cancelled", "request_id": cancel_token.request_id})
+            else:
+                tail = await _encode(self.encoder, self.encoder.flush)
+                if tail:
+                    await self.websocket.send_bytes(tail)
+                await self.websocket.send_json({"type": "done", "request_id": cancel_token.request_id})
+            _active_requests.pop(cancel_token.request_id, None)
+            self.idle.set()
+
+    async def _send_error(self, detail: str) -> None:
+        await self.websocket.send_json({"type": "error", "message": detail})
+
+
+@app.websocket("/ws/tts")
+async def tts_websocket_endpoint(websocket: WebSocket):
+    await websocket.accept()
+    await _WebSocketTTSSession(websocket).run()
+
+
+@app.post("/cancel/{request_id}")
+def cancel_endpoint(request_id: str):
+    cancel_token = _active_requests.get(request_id)
+    if cancel_token is None:
+        raise HTTPException(status_code=404, detail=f"Request '{request_id}' not found or already finished.")
+    cancel_token.cancel()
+    return {"status": "success", "message": f"Request '{request_id}' cancelled."}
 
 
 @app.post("/stop")
 def stop_endpoint():
     try:
+        for cancel_token in list(_active_requests.values()):
+            cancel_token.cancel()
         tts_player.stop()
         return {"status": "success", "message": "TTS stopped."}
     except Exception as e:
@@ -155,8 +500,125 @@ def clear_reference_audio_cache_endpoint():
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def start_server(host: str = "127.0.0.1", port: int = 8000, workers: int = 1):
-    uvicorn.run(app, host=host, port=port, workers=workers)
+def _split_cores(workers: int) -> list[list[int]]:
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    if workers >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(workers)]
+    # 每个工作进程分到一段连续的核心，尽量保持缓存局部性。
+    base, extra = divmod(len(cores), workers)
+    groups, start = [], 0
+    for i in range(workers):
+        size = base + (1 if i < extra else 0)
+        groups.append(cores[start:start + size])
+        start += size
+    return groups
+
+
+def _preload_reference_audios() -> None:
+    # 启动时批量完成参考音频的解码与 HuBERT 特征提取，首个请求不必再等待。
+    if _reference_audios:
+        ReferenceAudio.register_many(
+            [(reference['audio_path'], reference['audio_text'], 'auto') for reference in _reference_audios.values()])
+
+
+def _run_worker(sock: socket.socket, cores: list[int], preload_characters: dict[str, str]) -> None:
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    model_manager.configure_sessions(share_weights=True, intra_op_num_threads=len(cores))
+    for character_name, model_dir in preload_characters.items():
+        model_manager.load_character(character_name=character_name, model_dir=model_dir)
+    _preload_reference_audios()
+    server = uvicorn.Server(uvicorn.Config(app))
+    server.run(sockets=[sock])
+
+
+def _serve_prefork(host: str, port: int, workers: int, preload_characters: dict[str, str]) -> None:
+    # 父进程只负责准备共享权重与监听套接字；ORT 会话必须在 fork 之后于子进程中创建。
+    for model_dir in preload_characters.values():
+        model_manager.prepare_shared_weights(model_dir)
+
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children: list[int] = []
+    for cores in _split_cores(workers):
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                _run_worker(sock, cores, preload_characters)
+            except BaseException as e:
+                logger.error(f"Worker process {os.getpid()} exited with an error: {e}", exc_info=True)
+                exit_code = 1
+            finally:
+                os._exit(exit_code)  # 跳过 atexit，避免子进程删除其他进程仍在映射的权重文件
+        children.append(pid)
+        logger.info(f"Started worker process {pid} on cores {cores}.")
+
+    def _forward_signal(signum, _frame):
+        for child_pid in children:
+            try:
+                os.kill(child_pid, signum)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, _forward_signal)
+    signal.signal(signal.SIGTERM, _forward_signal)
+    for pid in children:
+        os.waitpid(pid, 0)
+    sock.close()
+
+
+def start_server(
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        workers: int = 1,
+        preload_characters: Optional[dict[str, str]] = None,
+        reference_audios: Optional[dict[str, dict]] = None,
+):
+    """
+    Starts the API server.
+
+    Args:
+        host (str): Host address to bind.
+        port (int): Port to bind.
+        workers (int): Number of worker processes. Values above 1 use a pre-fork mode (POSIX only):
+            every worker is pinned to its own subset of CPU cores, and model weights are memory-mapped
+            once and shared by all workers instead of being copied into each one.
+        preload_characters (dict[str, str] | None): {character_name: onnx_model_dir} loaded in every worker at startup.
+        reference_audios (dict[str, dict] | None): {character_name: {"audio_path": ..., "audio_text": ...}}
+            registered in every worker at startup.
+
+    Note:
+        In multi-process mode, requests that change server state (/load_character, /set_reference_audio, ...)
+        only reach the worker that handles them, so characters and reference audios should be passed
+        through 'preload_characters' and 'reference_audios' instead.
+    """
+    preload_characters = preload_characters or {}
+    for character_name, reference in (reference_audios or {}).items():
+        _reference_audios[character_name] = {
+            'audio_path': reference['audio_path'],
+            'audio_text': reference['audio_text'],
+        }
+
+    if workers > 1 and not hasattr(os, 'fork'):
+        logger.warning("Multi-process mode requires os.fork, which is unavailable on this platform. "
+                       "Falling back to a single worker.")
+        workers = 1
+    if workers > 1:
+        _serve_prefork(host, port, workers, preload_characters)
+        return
+
+    for character_name, model_dir in preload_characters.items():
+        model_manager.load_character(character_name=character_name, model_dir=model_dir)
+    _preload_reference_audios()
+    uvicorn.run(app, host=host, port=port)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,199 @@
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Iterator, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class LRUCache(Generic[K, V]):
+    """
+    线程安全的 LRU 缓存，可同时按条目数与字节数限制容量。
+
+    - 每个条目的字节数由 sizer 计算，或在 put 时直接给出；条目大小相差几个数量级的缓存 (角色模型、参考音频)
+      也能按实际占用淘汰。
+    - 被 pin 的条目不会被淘汰，pin 可以嵌套，需要同样次数的 unpin。
+    - 条目离开缓存时 (淘汰、替换、删除、清空) 调用 on_remove(key, value)，可用于释放 ORT 会话等资源；
+      回调在锁外执行。
+    - 只有 get 计入命中 / 未命中并更新最近使用顺序；peek 与 `in` 不改变任何状态。
+    """
+
+    def __init__(
+            self,
+            capacity: int = 0,
+            max_bytes: int = 0,
+            sizer: Optional[Callable[[V], int]] = None,
+            on_remove: Optional[Callable[[K, V], None]] = None,
+            name: str = 'cache',
+    ):
+        """capacity / max_bytes 为 0 表示不限制该项。"""
+        self.capacity: int = max(0, capacity)
+        self.max_bytes: int = max(0, max_bytes)
+        self.name: str = name
+        self._sizer: Optional[Callable[[V], int]] = sizer
+        self._on_remove: Optional[Callable[[K, V], None]] = on_remove
+        self._entries: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._pins: dict[K, int] = {}
+        self._bytes: int = 0
+        self._lock: threading.RLock = threading.RLock()
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            self._hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def peek(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return default if entry is None else entry[0]
+
+    def put(self, key: K, value: V, size: Optional[int] = None) -> None:
+        """写入条目；size 未给出时由 sizer 计算 (没有 sizer 时记为 0 字节)。"""
+        with self._lock:
+            removed = self._insert(key, value, size)
+        self._notify(removed)
+
+    def setdefault(self, key: K, value: V, size: Optional[int] = None) -> V:
+        """key 已存在时返回已有的值，否则写入 value 并返回它。并发构建同一条目时，所有调用方拿到同一个对象。"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+            removed = self._insert(key, value, size)
+        self._notify(removed)
+        return value
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        """删除条目 (即使被 pin) 并返回其值。"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            self._pins.pop(key, None)
+            if entry is None:
+                return default
+            self._bytes -= entry[1]
+        self._notify([(key, entry[0])])
+        return entry[0]
+
+    def clear(self) -> None:
+        with self._lock:
+            removed = [(key, value) for key, (value, _) in self._entries.items()]
+            self._entries.clear()
+            self._pins.clear()
+            self._bytes = 0
+        self._notify(removed)
+
+    def pin(self, key: K) -> bool:
+        """固定条目使其不被淘汰；条目不存在时返回 False。"""
+        with self._lock:
+            if key not in self._entries:
+                return False
+            self._pins[key] = self._pins.get(key, 0) + 1
+            return True
+
+    def unpin(self, key: K) -> None:
+        with self._lock:
+            count = self._pins.get(key, 0) - 1
+            if count > 0:
+                self._pins[key] = count
+                return
+            self._pins.pop(key, None)
+            removed = self._evict()  # 解除固定后可能已超出预算
+        self._notify(removed)
+
+    def is_pinned(self, key: K) -> bool:
+        with self._lock:
+            return key in self._pins
+
+    def size_of(self, key: K) -> int:
+        with self._lock:
+            entry = self._entries.get(key)
+            return 0 if entry is None else entry[1]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'pinned': len(self._pins),
+                'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+            }
+
+    def keys(self) -> list[K]:
+        """按从最久未使用到最近使用的顺序返回所有 key 的快照。"""
+        with self._lock:
+            return list(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self) -> Iterator[K]:
+        return iter(self.keys())
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def _insert(self, key: K, value: V, size: Optional[int]) -> list[tuple[K, V]]:
+        if size is None:
+            size = self._sizer(value) if self._sizer is not None else 0
+        removed: list[tuple[K, V]] = []
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+            if old[0] is not value:
+                removed.append((key, old[0]))
+        self._entries[key] = (value, size)
+        self._bytes += size
+        removed.extend(self._evict(keep=key))
+        return removed
+
+    def _over_budget(self) -> bool:
+        return ((self.capacity > 0 and len(self._entries) > self.capacity)
+                or (self.max_bytes > 0 and self._bytes > self.max_bytes))
+
+    def _evict(self, keep: Optional[K] = None) -> list[tuple[K, V]]:
+        """从最久未使用的一端淘汰未固定的条目，直到回到预算之内。刚写入的条目 (keep) 不会被淘汰。"""
+        removed: list[tuple[K, V]] = []
+        if not self._over_budget():
+            return removed
+        for key in list(self._entries):
+            if not self._over_budget():
+                break
+            if key == keep or key in self._pins:
+                continue
+            value, size = self._entries.pop(key)
+            self._bytes -= size
+            self._evictions += 1
+            removed.append((key, value))
+        if self._over_budget():
+            logger.warning(f"{self.name}: pinned or newly added entries exceed the budget "
+                           f"({len(self._entries)} entries, {self._bytes / (1 << 20):.1f} MiB).")
+        return removed
+
+    def _notify(self, removed: list[tuple[K, V]]) -> None:
+        if self._on_remove is None:
+            return
+        for key, value in removed:
+            try:
+                self._on_remove(key, value)
+            except Exception as e:
+                logger.error(f"{self.name}: removal callback failed for {key!r}: {e}")
@@ -1,23 +1,7 @@
-from collections import OrderedDict
+import asyncio
+import concurrent.futures
 import queue
-
-
-class LRUCacheDict(OrderedDict):
-    def __init__(self, capacity):
-        super().__init__()
-        self.capacity = capacity
-
-    def __getitem__(self, key):
-        value = super().__getitem__(key)
-        self.move_to_end(key)  # 访问后移到末尾
-        return value
-
-    def __setitem__(self, key, value):
-        if key in self:
-            self.move_to_end(key)
-        super().__setitem__(key, value)
-        if len(self) > self.capacity:
-            self.popitem(last=False)  # 删除最旧的（第一个）
+from typing import Any, Callable
 
 
 def clear_queue(q: queue.Queue) -> None:
@@ -26,3 +10,47 @@ def clear_queue(q: queue.Queue) -> None:
             q.get_nowait()
         except queue.Empty:
             break
+
+
+def put_with_backpressure(
+        q: queue.Queue,
+        item: Any,
+        should_abort: Callable[[], bool],
+        poll_interval: float = 0.1,
+) -> bool:
+    """
+    向有界队列投递数据。队列已满时阻塞生产者（即暂停合成），直到消费者腾出空位。
+    期间若 should_abort() 为真则放弃投递并返回 False，避免消费者消失后生产者永久阻塞。
+    """
+    while not should_abort():
+        try:
+            q.put(item, timeout=poll_interval)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def put_threadsafe_with_backpressure(
+        loop: asyncio.AbstractEventLoop,
+        q: asyncio.Queue,
+        item: Any,
+        should_abort: Callable[[], bool],
+        poll_interval: float = 0.1,
+) -> bool:
+    """
+    从工作线程向 asyncio 有界队列投递数据，语义与 put_with_backpressure 相同。
+    """
+    if loop.is_closed():
+        return False
+    future = asyncio.run_coroutine_threadsafe(q.put(item), loop)
+    while True:
+        try:
+            future.result(timeout=poll_interval)
+            return True
+        except concurrent.futures.CancelledError:
+            return False
+        except concurrent.futures.TimeoutError:
+            if should_abort() or loop.is_closed():
+                future.cancel()
+                return False
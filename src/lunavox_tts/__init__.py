@@ -1,6 +1,8 @@
 from ._internal import (load_character, unload_character, set_reference_audio, tts_async, tts, stop, convert_to_onnx,
-                        clear_reference_audio_cache, launch_command_line_client, load_predefined_character)
+                        clear_reference_audio_cache, launch_command_line_client, load_predefined_character,
+                        register_reference_audios, pin_character)
 from .Server import start_server
+from .Batch import run_batch
 
 __all__ = [
     "load_character",
@@ -14,4 +16,7 @@ __all__ = [
     "launch_command_line_client",
     "start_server",
     "load_predefined_character",
+    "run_batch",
+    "register_reference_audios",
+    "pin_character",
 ]
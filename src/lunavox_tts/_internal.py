@@ -27,9 +27,10 @@ import asyncio
 from typing import AsyncIterator, Optional, Union
 
 from .Audio.ReferenceAudio import ReferenceAudio
-from .Core.TTSPlayer import tts_player
+from .Core.TTSPlayer import tts_player, AUDIO_QUEUE_MAX_CHUNKS
 from .ModelManager import model_manager
 from .Utils.Shared import context
+from .Utils.Utils import put_threadsafe_with_backpressure
 from .Client import Client
 from .PredefinedCharacter import download_predefined_character_model
 
@@ -38,9 +39,24 @@ _reference_audios: dict[str, dict] = {}
 SUPPORTED_AUDIO_EXTS = {'.wav', '.flac', '.ogg', '.aiff', '.aif'}
 
 
+def _get_timbre_audio(timbre_character: Optional[str]) -> Optional[ReferenceAudio]:
+    if not timbre_character:
+        return None
+    if timbre_character not in _reference_audios:
+        raise ValueError(f"No reference audio set for timbre character '{timbre_character}'.")
+    ref_info = _reference_audios[timbre_character]
+    return ReferenceAudio(
+        prompt_wav=ref_info['audio_path'],
+        prompt_text=ref_info['audio_text'],
+        language=ref_info.get('audio_lang') or 'auto',
+    )
+
+
 def load_character(
         character_name: str,
         onnx_model_dir: Union[str, PathLike],
+        precision: Optional[str] = None,
+        pinned: bool = False,
 ) -> None:
     """
     Loads a character model from an ONNX model directory.
@@ -48,14 +64,35 @@ def load_character(
     Args:
         character_name (str): The name to assign to the loaded character.
         onnx_model_dir (str | PathLike): The directory path containing the ONNX model files.
+        precision (str | None): 'fp32' or 'int8'. Defaults to the 'Model_Precision' environment variable (fp32).
+            Falls back to FP32 if the directory has no INT8 models.
+        pinned (bool): Keep the character in memory even when the 'Max_Character_Models_MB' budget
+            or the 'Max_Cached_Character_Models' limit is exceeded.
     """
     model_path: str = os.fspath(onnx_model_dir)
     model_manager.load_character(
         character_name=character_name,
         model_dir=model_path,
+        precision=precision,
+        pinned=pinned,
     )
 
 
+def pin_character(
+        character_name: str,
+        pinned: bool = True,
+) -> None:
+    """
+    Pins a loaded character so that it is never evicted from memory, or unpins it.
+
+    Args:
+        character_name (str): The name of a previously loaded character.
+        pinned (bool): True to pin, False to make the character evictable again.
+    """
+    if not model_manager.pin_character(character_name, pinned):
+        raise ValueError(f"Character '{character_name}' has not been loaded.")
+
+
 def unload_character(
         character_name: str,
 ) -> None:
@@ -108,12 +145,43 @@ def set_reference_audio(
     )
 
 
+def register_reference_audios(
+        clips: list[dict],
+        decode_workers: int = 0,
+) -> int:
+    """
+    Pre-registers many reference audios at once, e.g. a whole emotion set of a new character pack.
+
+    Audio is decoded in a thread pool and Chinese HuBERT runs on padded batches, so a later
+    'set_reference_audio' call for any of these clips returns immediately from the cache.
+
+    Args:
+        clips (list[dict]): Items of the form {"audio_path": ..., "audio_text": ..., "audio_language": ...};
+            "audio_language" is optional and defaults to "auto".
+        decode_workers (int, optional): Number of decoding threads. Defaults to min(8, CPU cores).
+
+    Returns:
+        int: The number of reference audios that were registered successfully.
+    """
+    valid_clips: list[tuple[str, str, str]] = []
+    for clip in clips:
+        audio_path: str = os.fspath(clip['audio_path'])
+        ext = os.path.splitext(audio_path)[1].lower()
+        if ext not in SUPPORTED_AUDIO_EXTS:
+            logger.error(f"Skipping '{audio_path}': audio format '{ext}' is not supported.")
+            continue
+        valid_clips.append((audio_path, clip['audio_text'], clip.get('audio_language') or 'auto'))
+    return len(ReferenceAudio.register_many(valid_clips, decode_workers=decode_workers))
+
+
 async def tts_async(
         character_name: str,
         text: str,
         play: bool = False,
         split_sentence: bool = False,
         save_path: Union[str, PathLike, None] = None,
+        timbre_character: Optional[str] = None,
+        reuse_semantic_tokens: bool = False,
 ) -> AsyncIterator[bytes]:
     """
     Asynchronously generates speech from text and yields audio chunks.
@@ -127,6 +195,13 @@ async def tts_async(
         play (bool, optional): If True, plays the audio as it's generated. Defaults to False.
         split_sentence (bool, optional): If True, splits the text into sentences for synthesis. Defaults to False.
         save_path (str | PathLike | None, optional): If provided, saves the generated audio to this file path. Defaults to None.
+        timbre_character (str | None, optional): If provided, the reference audio set for this name is used only as the
+            vocoder's timbre reference. Re-rendering the same text with different timbres reuses the cached semantic
+            tokens, so only the vocoder runs again. Defaults to None.
+        reuse_semantic_tokens (bool, optional): If True, sentences whose semantic tokens are already cached (from an
+            earlier call with this option or with timbre_character) skip the autoregressive T2S stage and keep the
+            same prosody; new tokens are cached for later re-renders, e.g. after a vocoder-only model update.
+            Defaults to False, which samples a new take every time.
 
     Yields:
         bytes: A chunk of the generated audio data.
@@ -136,6 +211,7 @@ async def tts_async(
     """
     if character_name not in _reference_audios:
         raise ValueError("Please call 'set_reference_audio' first to set the reference audio.")
+    timbre_audio = _get_timbre_audio(timbre_character)
 
     if save_path:
         save_path = os.fspath(save_path)
@@ -144,13 +220,13 @@ async def tts_async(
             os.makedirs(parent_dir, exist_ok=True)
 
     # 1. 创建 asyncio 队列和获取当前事件循环
-    stream_queue: asyncio.Queue[Union[bytes, None]] = asyncio.Queue()
+    stream_queue: asyncio.Queue[Union[bytes, None]] = asyncio.Queue(maxsize=AUDIO_QUEUE_MAX_CHUNKS)
     loop = asyncio.get_running_loop()
 
     # 2. 定义回调函数，用于在线程和 asyncio 之间安全地传递数据
     def tts_chunk_callback(chunk: Optional[bytes]):
-        """This callback is called from the TTS worker thread."""
-        loop.call_soon_threadsafe(stream_queue.put_nowait, chunk)
+        """This callback is called from the TTS worker thread and blocks while the queue is full."""
+        put_threadsafe_with_backpressure(loop, stream_queue, chunk, tts_player.is_stopped)
 
     # 设置 TTS 上下文
     context.current_speaker = character_name
@@ -166,6 +242,8 @@ async def tts_async(
         split=split_sentence,
         save_path=save_path,
         chunk_callback=tts_chunk_callback,
+        timbre_audio=timbre_audio,
+        reuse_semantic_tokens=reuse_semantic_tokens,
     )
 
     # 馈送文本并通知会话结束
@@ -173,11 +251,18 @@ async def tts_async(
     tts_player.end_session()
 
     # 4. 从队列中异步读取数据并产生
-    while True:
-        chunk = await stream_queue.get()
-        if chunk is None:
-            break
-        yield chunk
+    # 消费方提前退出 (break、aclose() 或任务被取消) 时取消会话，否则工作线程会一直阻塞在已满的队列上。
+    finished: bool = False
+    try:
+        while True:
+            chunk = await stream_queue.get()
+            if chunk is None:
+                finished = True
+                break
+            yield chunk
+    finally:
+        if not finished:
+            tts_player.cancel_session()
 
 
 def tts(
@@ -187,6 +272,8 @@ def tts(
         split_sentence: bool = True,
         save_path: Union[str, PathLike, None] = None,
         language: str = "ja",
+        timbre_character: Optional[str] = None,
+        reuse_semantic_tokens: bool = False,
 ) -> None:
     """
     Synchronously generates speech from text.
@@ -200,10 +287,17 @@ def tts(
         play (bool, optional): If True, plays the audio.
         split_sentence (bool, optional): If True, splits the text into sentences for synthesis.
         save_path (str | PathLike | None, optional): If provided, saves the generated audio to this file path. Defaults to None.
+        timbre_character (str | None, optional): If provided, the reference audio set for this name is used only as the
+            vocoder's timbre reference. Defaults to None.
+        reuse_semantic_tokens (bool, optional): If True, reuses (and caches) the semantic tokens of sentences rendered
+            before with this option or with timbre_character, so only the vocoder runs again. Defaults to False.
     """
     if character_name not in _reference_audios:
         logger.error("Please call 'set_reference_audio' first to set the reference audio.")
         return
+    if timbre_character and timbre_character not in _reference_audios:
+        logger.error(f"Please call 'set_reference_audio' for timbre character '{timbre_character}' first.")
+        return
 
     if save_path:
         save_path = os.fspath(save_path)
@@ -225,6 +319,8 @@ def tts(
         play=play,
         split=split_sentence,
         save_path=save_path,
+        timbre_audio=_get_timbre_audio(timbre_character),
+        reuse_semantic_tokens=reuse_semantic_tokens,
     )
     tts_player.feed(text)
     tts_player.end_session()
@@ -242,6 +338,7 @@ def convert_to_onnx(
         torch_ckpt_path: Union[str, PathLike],
         torch_pth_path: Union[str, PathLike],
         output_dir: Union[str, PathLike],
+        quantize: bool = False,
 ) -> None:
     """
     Converts PyTorch model checkpoints to the ONNX format.
@@ -252,6 +349,8 @@ def convert_to_onnx(
         torch_ckpt_path (str | PathLike): The path to the T2S model (.ckpt) file.
         torch_pth_path (str | PathLike): The path to the VITS model (.pth) file.
         output_dir (str | PathLike): The directory where the ONNX models will be saved.
+        quantize (bool): Also generate dynamic INT8 variants of the T2S decoders and VITS,
+            loadable with load_character(..., precision='int8').
     """
     try:
         import torch
@@ -269,6 +368,7 @@ def convert_to_onnx(
         torch_pth_path=torch_pth_path,
         torch_ckpt_path=torch_ckpt_path,
         output_dir=output_dir,
+        quantize=quantize,
     )
 
 
@@ -94,6 +94,76 @@ def prepare_onnx_input(
     return outputs
 
 
+def prepare_shared_onnx_input(
+    tokenizer,
+    labels: List[str],
+    char2phonemes: Dict[str, List[int]],
+    chars: List[str],
+    texts: List[str],
+    query_ids: List[int],
+    use_mask: bool = False,
+    max_len: int = 512,
+) -> Tuple[Dict[str, np.array], np.array]:
+    """
+    Same features as prepare_onnx_input, but each distinct sentence is tokenized once and each distinct
+    (sentence, truncation window) becomes a single row of input_ids / token_type_ids / attention_masks,
+    padded to the longest row. phoneme_masks / char_ids / position_ids stay one entry per query, and the
+    returned row_ids maps every query to its row.
+    """
+    tokenized = {}
+    rows = {}
+    input_ids = []
+    phoneme_masks = []
+    char_ids = []
+    position_ids = []
+    row_ids = []
+
+    for text, query_id in zip(texts, query_ids):
+        text = text.lower()
+        if text not in tokenized:
+            try:
+                tokenized[text] = tokenize_and_map(tokenizer=tokenizer, text=text)
+            except Exception:
+                print(f'warning: text "{text}" is invalid')
+                return {}, np.zeros((0,), dtype=np.int64)
+        tokens, text2token, token2text = tokenized[text]
+
+        window_text, window_query_id, window_tokens, window_text2token, _ = _truncate(
+            max_len=max_len, text=text, query_id=query_id, tokens=tokens, text2token=text2token, token2text=token2text
+        )
+        # Queries far apart in a sentence longer than max_len get different windows, hence different rows.
+        row_key = (text, query_id - window_query_id, len(window_text))
+        if row_key not in rows:
+            rows[row_key] = len(input_ids)
+            input_ids.append(tokenizer.convert_tokens_to_ids(["[CLS]"] + window_tokens + ["[SEP]"]))
+        row_ids.append(rows[row_key])
+
+        query_char = window_text[window_query_id]
+        phoneme_masks.append(
+            [1 if i in char2phonemes[query_char] else 0 for i in range(len(labels))] if use_mask else [1] * len(labels)
+        )
+        char_ids.append(chars.index(query_char))
+        position_ids.append(window_text2token[window_query_id] + 1)  # [CLS] token locate at first place
+
+    # Padded positions are excluded by the attention mask.
+    row_len = max((len(input_id) for input_id in input_ids), default=0)
+    padded_input_ids = np.full((len(input_ids), row_len), tokenizer.pad_token_id or 0, dtype=np.int64)
+    attention_masks = np.zeros((len(input_ids), row_len), dtype=np.int64)
+    for row, input_id in enumerate(input_ids):
+        padded_input_ids[row, : len(input_id)] = input_id
+        attention_masks[row, : len(input_id)] = 1
+
+    outputs = {
+        "input_ids": padded_input_ids,
+        "token_type_ids": np.zeros((len(input_ids), row_len), dtype=np.int64),
+        "attention_masks": attention_masks,
+        "phoneme_masks": np.array(phoneme_masks).astype(np.float32),
+        "char_ids": np.array(char_ids).astype(np.int64),
+        "position_ids": np.array(position_ids).astype(np.int64),
+    }
+    return outputs, np.array(row_ids, dtype=np.int64)
+
+
 def _truncate_texts(window_size: int, texts: List[str], query_ids: List[int]) -> Tuple[List[str], List[int]]:
     truncated_texts = []
     truncated_query_ids = []
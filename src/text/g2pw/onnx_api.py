@@ -8,6 +8,7 @@ import zipfile
 from typing import Any, Dict, List, Tuple
 
 import numpy as np
+import onnx
 import onnxruntime
 import requests
 import torch
@@ -16,7 +17,7 @@ from pypinyin import Style, pinyin
 from transformers.models.auto.tokenization_auto import AutoTokenizer
 
 from ..zh_normalization.char_convert import tranditional_to_simplified
-from .dataset import get_char_phoneme_labels, get_phoneme_labels, prepare_onnx_input
+from .dataset import get_char_phoneme_labels, get_phoneme_labels, prepare_shared_onnx_input
 from .utils import load_config
 
 onnxruntime.set_default_logger_severity(3)
@@ -29,21 +30,51 @@ warnings.filterwarnings("ignore")
 
 model_version = "1.1"
 
-
-def predict(session, onnx_input: Dict[str, Any], labels: List[str]) -> Tuple[List[str], List[float]]:
+# g2pW.onnx input name -> prepare_shared_onnx_input key. The first three only depend on the sentence.
+SENTENCE_INPUTS = {
+    "input_ids": "input_ids",
+    "token_type_ids": "token_type_ids",
+    "attention_mask": "attention_masks",
+}
+QUERY_INPUTS = {
+    "phoneme_mask": "phoneme_masks",
+    "char_ids": "char_ids",
+    "position_ids": "position_ids",
+}
+ENCODER_MODEL_FILENAME = "g2pW_encoder.onnx"
+HEAD_MODEL_FILENAME = "g2pW_head.onnx"
+
+
+def _run_full_model(session, onnx_input: Dict[str, Any], row_ids: np.ndarray) -> np.ndarray:
+    # The full model needs one copy of the sentence per query.
+    feed = {name: onnx_input[key][row_ids] for name, key in SENTENCE_INPUTS.items()}
+    feed.update({name: onnx_input[key] for name, key in QUERY_INPUTS.items()})
+    return session.run([], feed)[0]
+
+
+def _run_split_model(encoder_session, head_session, onnx_input: Dict[str, Any], row_ids: np.ndarray) -> np.ndarray:
+    # BERT runs once per distinct sentence; only the small head runs once per query.
+    hidden = encoder_session.run([], {name: onnx_input[key] for name, key in SENTENCE_INPUTS.items()})[0]
+    feed = {}
+    for value in head_session.get_inputs():
+        feed[value.name] = onnx_input[QUERY_INPUTS[value.name]] if value.name in QUERY_INPUTS else hidden[row_ids]
+    return head_session.run([], feed)[0]
+
+
+def predict(session, onnx_input: Dict[str, Any], labels: List[str], row_ids: np.ndarray = None,
+            head_session=None) -> Tuple[List[str], List[float]]:
+    """
+    session is the full g2pW model, or the sentence encoder when head_session is given.
+    row_ids maps each query to its row of the sentence inputs (see prepare_shared_onnx_input).
+    """
     all_preds = []
     all_confidences = []
-    probs = session.run(
-        [],
-        {
-            "input_ids": onnx_input["input_ids"],
-            "token_type_ids": onnx_input["token_type_ids"],
-            "attention_mask": onnx_input["attention_masks"],
-            "phoneme_mask": onnx_input["phoneme_masks"],
-            "char_ids": onnx_input["char_ids"],
-            "position_ids": onnx_input["position_ids"],
-        },
-    )[0]
+    if row_ids is None:
+        row_ids = np.arange(len(onnx_input["char_ids"]))
+    if head_session is None:
+        probs = _run_full_model(session, onnx_input, row_ids)
+    else:
+        probs = _run_split_model(session, head_session, onnx_input, row_ids)
 
     preds = np.argmax(probs, axis=1).tolist()
     max_probs = []
@@ -79,6 +110,44 @@ def download_and_decompress(model_dir: str = "G2PWModel/"):
     return model_dir
 
 
+def _encoder_boundary(graph) -> List[str]:
+    """
+    Tensors computed only from the sentence inputs that are consumed by the query-dependent part of the graph.
+    Nodes are topologically sorted, so the input dependencies of every tensor can be propagated in one pass.
+    """
+    sentence_inputs = frozenset(SENTENCE_INPUTS)
+    dependencies = {value.name: frozenset((value.name,)) for value in graph.input}
+    boundary = []
+    for node in graph.node:
+        if any(attribute.type in (onnx.AttributeProto.GRAPH, onnx.AttributeProto.GRAPHS) for attribute in node.attribute):
+            raise ValueError(f"control-flow node {node.op_type} is not supported")
+        inputs = [name for name in node.input if name]
+        node_dependencies = frozenset().union(*(dependencies.get(name, frozenset()) for name in inputs))
+        for output in node.output:
+            dependencies[output] = node_dependencies
+        if not node_dependencies <= sentence_inputs:
+            boundary.extend(
+                name for name in inputs if dependencies.get(name) and dependencies[name] <= sentence_inputs and name not in boundary
+            )
+    return boundary
+
+
+def split_g2pw_model(model_path: str, encoder_path: str, head_path: str) -> None:
+    """
+    Splits g2pW.onnx into the BERT sentence encoder and the per-query classification head.
+    The split is only possible when the two parts meet at a single tensor (the BERT hidden states).
+    """
+    model = onnx.shape_inference.infer_shapes(onnx.load(model_path))
+    boundary = _encoder_boundary(model.graph)
+    if len(boundary) != 1:
+        raise ValueError(f"expected one hidden-state tensor between encoder and head, found {boundary}")
+    graph_inputs = [value.name for value in model.graph.input]
+    extractor = onnx.utils.Extractor(model)
+    onnx.save(extractor.extract_model(list(SENTENCE_INPUTS), boundary), encoder_path)
+    query_inputs = [name for name in graph_inputs if name not in SENTENCE_INPUTS]
+    onnx.save(extractor.extract_model(boundary + query_inputs, [value.name for value in model.graph.output]), head_path)
+
+
 class G2PWOnnxConverter:
     def __init__(
         self,
@@ -86,7 +155,13 @@ class G2PWOnnxConverter:
         style: str = "bopomofo",
         model_source: str = None,
         enable_non_tradional_chinese: bool = False,
+        share_sentence_encoding: bool = True,
     ):
+        """
+        share_sentence_encoding: run the BERT encoder once per sentence and only the classification head once
+        per polyphonic character (g2pW.onnx is split into g2pW_encoder.onnx / g2pW_head.onnx next to it).
+        Falls back to the full model, one row per polyphonic character, when the graph cannot be split.
+        """
         uncompress_path = download_and_decompress(model_dir)
 
         sess_options = onnxruntime.SessionOptions()
@@ -94,17 +169,10 @@ class G2PWOnnxConverter:
         sess_options.execution_mode = onnxruntime.ExecutionMode.ORT_SEQUENTIAL
         sess_options.intra_op_num_threads = 2 if torch.cuda.is_available() else 0
         if "CUDAExecutionProvider" in onnxruntime.get_available_providers():
-            self.session_g2pW = onnxruntime.InferenceSession(
-                os.path.join(uncompress_path, "g2pW.onnx"),
-                sess_options=sess_options,
-                providers=["CUDAExecutionProvider", "CPUExecutionProvider"],
-            )
+            self._providers = ["CUDAExecutionProvider", "CPUExecutionProvider"]
         else:
-            self.session_g2pW = onnxruntime.InferenceSession(
-                os.path.join(uncompress_path, "g2pW.onnx"),
-                sess_options=sess_options,
-                providers=["CPUExecutionProvider"],
-            )
+            self._providers = ["CPUExecutionProvider"]
+        self._sess_options = sess_options
         self.config = load_config(config_path=os.path.join(uncompress_path, "config.py"), use_default=True)
 
         self.model_source = model_source if model_source else self.config.model_source
@@ -175,6 +243,64 @@ class G2PWOnnxConverter:
         if self.enable_opencc:
             self.cc = OpenCC("s2tw")
 
+        # Sessions are created last: validating a split model needs the tokenizer and labels above.
+        self.session_g2pW = None
+        self.session_head = None
+        if share_sentence_encoding:
+            try:
+                self.session_g2pW, self.session_head = self._load_split_model(uncompress_path)
+            except Exception as e:
+                print(f"Warning: g2pW encoder sharing is disabled ({e}); using the full model.")
+        if self.session_head is None:
+            self.session_g2pW = self._create_session(os.path.join(uncompress_path, "g2pW.onnx"))
+
+    def _create_session(self, model_path: str):
+        return onnxruntime.InferenceSession(model_path, sess_options=self._sess_options, providers=self._providers)
+
+    def _load_split_model(self, model_dir: str):
+        model_path = os.path.join(model_dir, "g2pW.onnx")
+        encoder_path = os.path.join(model_dir, ENCODER_MODEL_FILENAME)
+        head_path = os.path.join(model_dir, HEAD_MODEL_FILENAME)
+        if all(
+            os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(model_path)
+            for path in (encoder_path, head_path)
+        ):
+            return self._create_session(encoder_path), self._create_session(head_path)
+
+        # Split into temporary files and only keep them if they reproduce the full model.
+        tmp_encoder_path, tmp_head_path = encoder_path + ".tmp", head_path + ".tmp"
+        try:
+            split_g2pw_model(model_path, tmp_encoder_path, tmp_head_path)
+            encoder_session = self._create_session(tmp_encoder_path)
+            head_session = self._create_session(tmp_head_path)
+            self._check_split_model(self._create_session(model_path), encoder_session, head_session)
+            os.replace(tmp_encoder_path, encoder_path)
+            os.replace(tmp_head_path, head_path)
+        finally:
+            for path in (tmp_encoder_path, tmp_head_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        return encoder_session, head_session
+
+    def _check_split_model(self, full_session, encoder_session, head_session) -> None:
+        # Two sentences of different lengths with several queries each: covers padding and the row gather.
+        probe_chars = sorted(self.polyphonic_chars_new)
+        probe_sentences = ["".join(probe_chars[:5]), "".join(probe_chars[5:8])]
+        texts, query_ids, _, _ = self._prepare_data(sentences=probe_sentences)
+        onnx_input, row_ids = prepare_shared_onnx_input(
+            tokenizer=self.tokenizer,
+            labels=self.labels,
+            char2phonemes=self.char2phonemes,
+            chars=self.chars,
+            texts=texts,
+            query_ids=query_ids,
+            use_mask=self.config.use_mask,
+        )
+        expected = _run_full_model(full_session, onnx_input, row_ids)
+        actual = _run_split_model(encoder_session, head_session, onnx_input, row_ids)
+        if not np.allclose(expected, actual, atol=1e-4):
+            raise ValueError("the split model does not reproduce g2pW.onnx")
+
     def _convert_bopomofo_to_pinyin(self, bopomofo: str) -> str:
         tone = bopomofo[-1]
         assert tone in "12345"
@@ -202,7 +328,8 @@ class G2PWOnnxConverter:
             # sentences no polyphonic words
             return partial_results
 
-        onnx_input = prepare_onnx_input(
+        # A sentence with k polyphonic characters is tokenized once and, with the split model, encoded once.
+        onnx_input, row_ids = prepare_shared_onnx_input(
             tokenizer=self.tokenizer,
             labels=self.labels,
             char2phonemes=self.char2phonemes,
@@ -210,10 +337,15 @@ class G2PWOnnxConverter:
             texts=texts,
             query_ids=query_ids,
             use_mask=self.config.use_mask,
-            window_size=None,
         )
 
-        preds, confidences = predict(session=self.session_g2pW, onnx_input=onnx_input, labels=self.labels)
+        preds, confidences = predict(
+            session=self.session_g2pW,
+            onnx_input=onnx_input,
+            labels=self.labels,
+            row_ids=row_ids,
+            head_session=self.session_head,
+        )
         if self.config.use_char_phoneme:
             preds = [pred.split(" ")[1] for pred in preds]
 